@@ -1,4 +1,13 @@
+from collections import deque
+from multiprocessing import Pool
+import os
+
+import numpy as np
 import pandas as pd
+import tables
+
+# File handle of the analysis worker processes, opened by init_worker
+worker_filehandle = None
 
 
 def generate_groupname_list(faultgroup):
@@ -23,12 +32,147 @@ def differenclists(list1, list2):
     return list(set(list1).difference(list2))
 
 
+def signed_bound(value):
+    """
+    Two's complement of an unsigned 64 bit value, as stored in the campaign
+    wide tables
+    """
+    value = int(value)
+    return value - 2**64 if value >= 2**63 else value
+
+
+def build_condition(table, predicates, condvars):
+    """
+    Build an in-kernel condition for the table from the predicates, which map
+    a column to a value or an inclusive (low, high) range
+    """
+    conditions = []
+    for column, value in predicates.items():
+        if column not in table.colnames:
+            raise ValueError(f"Unknown column {column}")
+        low, high = value if isinstance(value, tuple) else (value, value)
+        if high is None:
+            high = low
+        if table.coltypes[column] == "int64" and column != "index":
+            # Unsigned values are stored as two's complement, a range
+            # crossing 2**63 wraps around
+            wraps = low < 2**63 <= high
+            low, high = signed_bound(low), signed_bound(high)
+        else:
+            wraps = False
+        condvars[f"{column}_low"] = low
+        condvars[f"{column}_high"] = high
+        if low == high:
+            conditions.append(f"({column} == {column}_low)")
+        elif wraps:
+            conditions.append(
+                f"(({column} >= {column}_low) | ({column} <= {column}_high))"
+            )
+        else:
+            conditions.append(
+                f"({column} >= {column}_low) & ({column} <= {column}_high)"
+            )
+    return " & ".join(conditions)
+
+
+def query_experiments(filehandle, **predicates):
+    """
+    Return the indices of all experiments matching the predicates as sorted
+    numpy array. A predicate maps a column of the FaultParameters or Outcomes
+    table to a value or an inclusive (low, high) range, e.g.,
+    query_experiments(f, fault_type=1, fault_address=(0x800, 0x900), endpoint=0).
+    An experiment matches a fault parameter if any of its faults matches. All
+    predicates of a table are evaluated in one in-kernel query
+    """
+    faulttable = filehandle.root.FaultParameters
+    outcometable = filehandle.root.Outcomes
+
+    if "end_reason" in predicates:
+        end_reasons = list(outcometable.attrs.end_reasons)
+        if predicates["end_reason"] not in end_reasons:
+            return np.array([], dtype=np.int64)
+        predicates["end_reason"] = end_reasons.index(predicates["end_reason"])
+
+    fault_predicates = {
+        column: value
+        for column, value in predicates.items()
+        if column in faulttable.colnames and column != "index"
+    }
+    outcome_predicates = {
+        column: value
+        for column, value in predicates.items()
+        if column not in fault_predicates
+    }
+
+    condvars = {}
+    condition = build_condition(outcometable, outcome_predicates, condvars)
+    condition = " & ".join(filter(None, ["(index >= 0)", condition]))
+    indices = np.unique(outcometable.read_where(condition, condvars, field="index"))
+
+    if fault_predicates:
+        condvars = {}
+        condition = build_condition(faulttable, fault_predicates, condvars)
+        indices = np.intersect1d(
+            indices, faulttable.read_where(condition, condvars, field="index")
+        )
+    return indices
+
+
+def get_experiment_names(filehandle, indices):
+    """
+    Get the group names of the experiments with the given indices
+    """
+    outcomes = filehandle.root.Outcomes.read_where("index >= 0")
+    outcomes = outcomes[np.isin(outcomes["index"], indices)]
+    outcomes.sort(order="index")
+    return [name.decode("utf-8") for name in outcomes["experiment"]]
+
+
+def has_outcome_table(filehandle):
+    """
+    Files written by older versions do not contain the outcome table, or it
+    only covers the experiments appended later
+    """
+    if "Outcomes" not in filehandle.root:
+        return False
+    num_experiments = len(filehandle.root.Outcomes.get_where_list("index >= 0"))
+    return num_experiments == filehandle.root.fault._v_nchildren
+
+
+def has_query_tables(filehandle):
+    """
+    Same as has_outcome_table for all tables of query_experiments, which are
+    written together
+    """
+    return "FaultParameters" in filehandle.root and has_outcome_table(filehandle)
+
+
+def query_experiment_names(filehandle, interestlist=None, **predicates):
+    """
+    Same as query_experiments, but returns the group names. If interestlist is
+    given, only these experiments are returned in the same order
+    """
+    names = get_experiment_names(
+        filehandle, query_experiments(filehandle, **predicates)
+    )
+    if interestlist is None:
+        return names
+    names = set(names)
+    return [name for name in interestlist if name in names]
+
+
 def generic_filter_faults(
     faultgroup, columname, lowvalue, highvalue=None, interestlist=None
 ):
     """
     Access function to faults table and filter experiments
     """
+    filehandle = faultgroup._v_file
+    if has_query_tables(filehandle):
+        return query_experiment_names(
+            filehandle, interestlist, **{columname: (lowvalue, highvalue)}
+        )
+
     if interestlist is None:
         interestlist = generate_groupname_list(faultgroup)
     if highvalue is None:
@@ -44,10 +188,40 @@ def generic_filter_faults(
     return retgroups
 
 
+def get_outcomes(filehandle):
+    """
+    Get the outcome table of the campaign with the end reasons resolved
+    """
+    table = filehandle.root.Outcomes
+    outcomes = pd.DataFrame(table.read())
+    outcomes["experiment"] = outcomes["experiment"].str.decode("utf-8")
+    outcomes["end_reason"] = pd.Categorical.from_codes(
+        outcomes["end_reason"], categories=list(table.attrs.end_reasons)
+    )
+    return outcomes
+
+
+def get_outcome_summary(filehandle):
+    """
+    Number of experiments per end reason
+    """
+    outcomes = get_outcomes(filehandle)
+    return outcomes[outcomes["index"] >= 0]["end_reason"].value_counts()
+
+
 def filter_endstatus_status(faultgroup, interestlist=None):
     """
     Sort all Experiments into reached end point (success) or not (failed).
     """
+    filehandle = faultgroup._v_file
+    if has_query_tables(filehandle):
+        if interestlist is not None:
+            interestlist = list(interestlist)
+        return [
+            query_experiment_names(filehandle, interestlist, endpoint=(1, 2**31 - 1)),
+            query_experiment_names(filehandle, interestlist, endpoint=0),
+        ]
+
     success = []
     failed = []
     if interestlist is None:
@@ -116,9 +290,6 @@ def filter_experiment_faultmask(faultgroup, mask, interestlist=None):
     Filter for a certain fault maks. If interestlist is given only experiments
     in this list will be analysed.
     """
-    if interestlist is None:
-        interestlist = generate_groupname_list(faultgroup)
-
     return generic_filter_faults(faultgroup, "fault_mask", mask, None, interestlist)
 
 
@@ -212,27 +383,78 @@ def get_experiment_table(faultgroup, faultname, tablename):
     """
     node = faultgroup._f_get_child(faultname)
     table = node._f_get_child(tablename)
-    return pd.DataFrame(table.read())
+    data = pd.DataFrame(table.read())
+    if "assembler_id" in data:
+        data["assembler"] = get_assembler(table._v_file, data["assembler_id"])
+    return data
+
+
+def get_assembler(filehandle, ids):
+    """
+    Get the assembler strings of the given ids from /Assembler
+    """
+    index = filehandle.root.Assembler.index.read()
+    data = filehandle.root.Assembler.data
+    # The ids of the store are its row numbers
+    return [
+        data[index["offset"][i] : index["offset"][i] + index["length"][i]]
+        .tobytes()
+        .decode("utf-8")
+        for i in ids
+    ]
+
+
+def reconstruct_tables(golden_table, diff_table, keywords, experiments=None):
+    """
+    Rebuild the complete tables of experiments from their differences to the
+    goldenrun. diff_table contains the rows of all experiments with their name
+    in the column "experiment". Each experiment gets the rows of the goldenrun
+    whose keywords do not occur in its diff (anti-join), plus its diff. Rows
+    of the goldenrun that are missing in an experiment are not recorded in the
+    diff and therefore included as well. experiments lists all experiments,
+    including those without diff rows
+    """
+    if experiments is None:
+        experiments = diff_table["experiment"].unique()
+    keys = ["experiment"] + list(keywords)
+    golden = pd.DataFrame({"experiment": list(experiments)}).merge(
+        golden_table, how="cross"
+    )
+    golden = golden.merge(
+        diff_table[keys].drop_duplicates(), on=keys, how="left", indicator=True
+    )
+    golden = golden[golden["_merge"] == "left_only"].drop(columns="_merge")
+    if len(diff_table):
+        golden = pd.concat([diff_table[golden.columns], golden], ignore_index=True)
+    return golden.sort_values(keys, ignore_index=True, kind="stable")
+
+
+def get_experiments_table_expanded(filehandle, faultnames, tablename, keywords):
+    """
+    Get the complete tables of the experiments, reconstructed from their diffs
+    and the goldenrun in one batch. The experiment name is in the column
+    "experiment"
+    """
+    golden_table = get_experiment_table(filehandle.root, "Goldenrun", tablename)
+    diff_tables = [
+        get_experiment_table(filehandle.root.fault, faultname, tablename).assign(
+            experiment=faultname
+        )
+        for faultname in faultnames
+    ]
+    if diff_tables:
+        diff_table = pd.concat(diff_tables, ignore_index=True)
+    else:
+        diff_table = golden_table.iloc[:0].assign(experiment="")
+    return reconstruct_tables(golden_table, diff_table, keywords, faultnames)
 
 
 def get_experiment_table_expanded(filehandle, faultname, tablename, keywords):
     """
     Get the experiment table and recombine it with the goldenrun data
-    TODO: This data must be checked if not to much is included
     """
-    golden_table = get_experiment_table(filehandle.root, "Goldenrun", tablename)
-    exp_table = get_experiment_table(filehandle.root.fault, faultname, tablename)
-    idxs = pd.Index([])
-    for keyword in keywords:
-        tmp = exp_table[keyword]
-        idx = pd.Index([])
-        for t in tmp:
-            idt = golden_table.index[golden_table[keyword] == t]
-            idx.append(idt)
-        idxs.append(idx)
-    golden_table.drop(idxs, inplace=True)
-    data = [exp_table, golden_table]
-    return pd.concat(data).to_dict("records")
+    table = get_experiments_table_expanded(filehandle, [faultname], tablename, keywords)
+    return table.drop(columns="experiment").to_dict("records")
 
 
 def get_experiment_tbinfo(faultgroup, faultname):
@@ -259,3 +481,200 @@ def get_experiment_meminfo_expanded(filehandle, faultname):
     return get_experiment_table_expanded(
         filehandle, faultname, "meminfo", ["insaddr", "address"]
     )
+
+
+def location_name(address, length, numdumps):
+    return "location_{:08x}_{:d}_{:d}".format(address, length, numdumps)
+
+
+def get_group_memdumps(filehandle, group):
+    """
+    Get the memory dumps of an experiment group as dictionary of location name
+    to an array of shape (numdumps, length). Deduplicated memory dumps are
+    resolved from /Memdumps and delta encoded ones from the Goldenrun
+    """
+    memdumps = {}
+    if "memdumps" in group and "references" not in group.memdumps:
+        for array in group.memdumps._f_iter_nodes("Leaf"):
+            if array.name.startswith("location_"):
+                memdumps[array.name] = array.read()
+    elif "memdumps" in group:
+        locations = group.memdumps.memdumps.read()
+        references = group.memdumps.references.read()
+        # The ids of the store are its row numbers
+        store = filehandle.root.Memdumps.index.read_coordinates(references["id"])
+        data = filehandle.root.Memdumps.data
+        arrays = [
+            np.zeros((location["numdumps"], location["length"]), dtype=np.uint8)
+            for location in locations
+        ]
+        for reference, stored in zip(references, store):
+            arrays[reference["location"]][reference["dump"]] = data[
+                stored["offset"] : stored["offset"] + stored["length"]
+            ]
+        for location, array in zip(locations, arrays):
+            name = location_name(
+                location["address"], location["length"], location["numdumps"]
+            )
+            memdumps[name] = array
+
+    if "memdumpdeltas" in group:
+        golden = {}
+        for name, array in get_group_memdumps(
+            filehandle, filehandle.root.Goldenrun
+        ).items():
+            _, address, length, _ = name.split("_")
+            golden[(int(address, 16), int(length))] = array
+        deltas = group.memdumpdeltas.read()
+        for i, (address, length, numdumps) in enumerate(
+            group.memdumpdeltas.attrs.locations.tolist()
+        ):
+            golden_array = golden[(address, length)]
+            # Additional dumps are compared to the last goldenrun dump
+            rows = np.minimum(np.arange(numdumps), len(golden_array) - 1)
+            array = golden_array[rows].copy()
+            location_deltas = deltas[deltas["location"] == i]
+            array[location_deltas["dump"], location_deltas["offset"]] = location_deltas[
+                "value"
+            ]
+            memdumps[location_name(address, length, numdumps)] = array
+    return memdumps
+
+
+def get_experiment_memdumps(filehandle, faultname):
+    return get_group_memdumps(filehandle, filehandle.root.fault._f_get_child(faultname))
+
+
+def get_experiment_registers(filehandle, faultname):
+    """
+    Get the register dumps of an experiment, delta encoded registers are
+    reconstructed from the Goldenrun
+    """
+    return get_group_registers(
+        filehandle, filehandle.root.fault._f_get_child(faultname)
+    )
+
+
+def get_group_registers(filehandle, node):
+    """
+    Same as get_experiment_registers for an experiment group or the Goldenrun
+    """
+    if "registerdeltas" not in node:
+        for tablename in ["armregisters", "riscvregisters", "aarch64registers"]:
+            if tablename in node:
+                return pd.DataFrame(node._f_get_child(tablename).read())
+        return pd.DataFrame()
+
+    deltatable = node.registerdeltas
+    registers = list(deltatable.attrs.registers)
+    golden = get_experiment_table(
+        filehandle.root, "Goldenrun", f"{deltatable.attrs.architecture}registers"
+    )[registers].to_numpy(dtype=np.uint64)
+
+    rows = []
+    for delta in deltatable.read():
+        if delta["dump"] < len(golden):
+            row = golden[delta["dump"]].copy()
+        else:
+            row = np.zeros(len(registers), dtype=np.uint64)
+        changed = [
+            bit for bit in range(len(registers)) if int(delta["mask"]) >> bit & 1
+        ]
+        row[changed] = delta["values"][: len(changed)]
+        rows.append(row)
+    return pd.DataFrame(rows, columns=registers)
+
+
+def init_worker(hdf5path):
+    global worker_filehandle
+    worker_filehandle = tables.open_file(hdf5path, "r")
+
+
+def run_worker(function, faultnames):
+    return [function(worker_filehandle, faultname) for faultname in faultnames]
+
+
+def concat_results(faultnames, results):
+    """
+    Combine the results of the experiments, data frames are concatenated with
+    the experiment name as outer index level, numpy arrays and scalars are
+    stacked and all other results are returned as list
+    """
+    if not results:
+        return results
+    if all(isinstance(result, pd.DataFrame) for result in results):
+        return pd.concat(results, keys=faultnames, names=["experiment", None])
+    if all(isinstance(result, pd.Series) for result in results):
+        return pd.DataFrame(results, index=pd.Index(faultnames, name="experiment"))
+    if all(
+        isinstance(result, (np.ndarray, np.generic, int, float)) for result in results
+    ):
+        return np.stack(results)
+    return results
+
+
+def list_experiments(hdf5path):
+    """
+    Get the group names of all experiments ordered by their index
+    """
+    with tables.open_file(hdf5path, "r") as filehandle:
+        if has_outcome_table(filehandle):
+            outcomes = filehandle.root.Outcomes.read_where("index >= 0")
+            outcomes.sort(order="index")
+            return [name.decode("utf-8") for name in outcomes["experiment"]]
+        return list(generate_groupname_list(filehandle.root.fault))
+
+
+def map_experiments(
+    hdf5path, function, interestlist=None, processes=None, chunksize=256
+):
+    """
+    Run function(filehandle, faultname) for the experiments in a process pool
+    and yield (faultnames, results) per chunk of chunksize experiments, in the
+    order of interestlist. Every worker opens the file read-only. The results
+    of a chunk are combined by concat_results. Only twice the number of
+    processes chunks are in flight, so the memory usage stays bounded. The
+    function has to be picklable, i.e., defined at module level
+    """
+    if interestlist is None:
+        interestlist = list_experiments(hdf5path)
+    interestlist = list(interestlist)
+    chunks = (
+        interestlist[i : i + chunksize] for i in range(0, len(interestlist), chunksize)
+    )
+
+    processes = processes or os.cpu_count()
+    with Pool(processes, initializer=init_worker, initargs=(hdf5path,)) as pool:
+        max_pending = 2 * processes
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.apply_async(run_worker, (function, chunk))))
+            if len(pending) >= max_pending:
+                faultnames, result = pending.popleft()
+                yield faultnames, concat_results(faultnames, result.get())
+        while pending:
+            faultnames, result = pending.popleft()
+            yield faultnames, concat_results(faultnames, result.get())
+
+
+def collect_experiments(
+    hdf5path, function, interestlist=None, processes=None, chunksize=256
+):
+    """
+    Same as map_experiments, but returns the results of all experiments
+    combined by concat_results
+    """
+    faultnames = []
+    chunks = []
+    for chunk_faultnames, results in map_experiments(
+        hdf5path, function, interestlist, processes, chunksize
+    ):
+        faultnames.extend(chunk_faultnames)
+        chunks.append(results)
+    if not chunks:
+        return []
+    if isinstance(chunks[0], (pd.DataFrame, pd.Series)):
+        return pd.concat(chunks)
+    if isinstance(chunks[0], np.ndarray):
+        return np.concatenate(chunks)
+    return [result for chunk in chunks for result in chunk]
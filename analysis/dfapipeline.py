@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stream the output buffer of all experiments of an ARCHIE hdf5 file from its
+memory dumps, deduplicate the faulty outputs and run the tenth round skip and
+the Saha diagonal fault attack on them. Only the distinct outputs are kept in
+memory
+"""
+
+import argparse
+from functools import partial
+import logging
+
+import numpy as np
+import tables
+
+from analysisfunctions import get_experiment_memdumps, get_group_memdumps
+from analysisfunctions import map_experiments
+from sahadiagonalfault import keyCandidatesParallel
+from tenthRound import getTenthRoundKeys, rankRoundKeys
+
+logger = logging.getLogger(__name__)
+
+ATTACKS = ["tenthround", "saha"]
+
+
+def read_output(filehandle, faultname, location, dump):
+    """
+    Get a memory dump of an experiment, None if the experiment has none, e.g.,
+    because it crashed before the dump
+    """
+    memdumps = get_experiment_memdumps(filehandle, faultname)
+    if location not in memdumps or len(memdumps[location]) == 0:
+        return None
+    return memdumps[location][dump]
+
+
+def read_golden_output(hdf5path, location, dump):
+    with tables.open_file(hdf5path, "r") as filehandle:
+        memdumps = get_group_memdumps(filehandle, filehandle.root.Goldenrun)
+    if location not in memdumps:
+        raise ValueError(f"The Goldenrun has no memory dump {location}")
+    return memdumps[location][dump]
+
+
+def stream_outputs(
+    hdf5path, location, dump=-1, interestlist=None, processes=None, chunksize=256
+):
+    """
+    Yield (faultnames, outputs) per chunk of experiments, outputs is an array
+    of shape (experiments, length). Experiments without the dump are skipped
+    """
+    function = partial(read_output, location=location, dump=dump)
+    for faultnames, results in map_experiments(
+        hdf5path, function, interestlist, processes, chunksize
+    ):
+        found = [
+            (faultname, result)
+            for faultname, result in zip(faultnames, results)
+            if result is not None
+        ]
+        if found:
+            yield [name for name, _ in found], np.stack([out for _, out in found])
+
+
+def collect_faulty_outputs(
+    hdf5path, location, dump=-1, interestlist=None, processes=None, chunksize=256
+):
+    """
+    Deduplicate the outputs of all experiments and drop the ones equal to the
+    Goldenrun output. Returns the golden output, the distinct faulty outputs
+    with shape (outputs, length) and the experiment names of each output
+    """
+    golden = read_golden_output(hdf5path, location, dump)
+    golden_bytes = golden.tobytes()
+
+    outputs = {}
+    for faultnames, chunk in stream_outputs(
+        hdf5path, location, dump, interestlist, processes, chunksize
+    ):
+        for faultname, output in zip(faultnames, chunk):
+            key = output.tobytes()
+            if key != golden_bytes:
+                outputs.setdefault(key, []).append(faultname)
+
+    array = np.frombuffer(b"".join(outputs), dtype=np.uint8).reshape(-1, len(golden))
+    return golden, array, list(outputs.values())
+
+
+def tenth_round_attack(outputs, experiments, golden, top=5):
+    """
+    Rank the round keys derived from the faulty outputs, weighted by the
+    number of experiments which produced each output
+    """
+    keys = getTenthRoundKeys(outputs, golden)
+    counts = [len(names) for names in experiments]
+    return rankRoundKeys(np.repeat(keys, counts, axis=0), top)
+
+
+def saha_attack(outputs, golden, processes=None):
+    """
+    Run the Saha diagonal fault attack on all outputs differing from the
+    Goldenrun output in every byte. Returns the candidates of each key byte
+    suggested by most outputs and the number of used outputs
+    """
+    outputs = outputs[(outputs != golden).all(axis=1)]
+    if len(outputs) == 0:
+        return [[] for _ in range(16)], 0
+    bitmaps = keyCandidatesParallel(outputs, golden, processes)
+    # Count the outputs supporting each candidate instead of intersecting, so
+    # outputs of other fault effects do not empty the key set
+    votes = np.unpackbits(bitmaps, axis=2).sum(axis=0)
+    keyset = [
+        np.flatnonzero(byte_votes == byte_votes.max()).tolist() for byte_votes in votes
+    ]
+    return keyset, len(outputs)
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Run differential fault attacks on the outputs of a campaign"
+    )
+    parser.add_argument("hdf5file", help="ARCHIE hdf5 file")
+    parser.add_argument(
+        "location",
+        help="Memory dump holding the output, e.g., location_20000040_16_1",
+    )
+    parser.add_argument(
+        "--dump", type=int, default=-1, help="Index of the dump. Default last"
+    )
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="Offset of the 16 byte ciphertext inside the dump. Default 0",
+    )
+    parser.add_argument(
+        "--attack",
+        action="append",
+        choices=ATTACKS,
+        help=f"Attack to run, can be used multiple times. Default {', '.join(ATTACKS)}",
+    )
+    parser.add_argument(
+        "--processes", "-p", type=int, help="Number of processes. Default all cores"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=256,
+        help="Number of experiments per worker task. Default 256",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = get_argument_parser().parse_args()
+
+    golden, outputs, experiments = collect_faulty_outputs(
+        args.hdf5file, args.location, args.dump, None, args.processes, args.chunksize
+    )
+    logger.info(
+        f"{sum(len(names) for names in experiments)} experiments with "
+        f"{len(outputs)} distinct faulty outputs"
+    )
+    golden = golden[args.offset : args.offset + 16]
+    outputs = outputs[:, args.offset : args.offset + 16]
+
+    attacks = args.attack or ATTACKS
+    if "tenthround" in attacks and len(outputs):
+        keys, counts = tenth_round_attack(outputs, experiments, golden)
+        print("Tenth round skip: round keys ranked by number of experiments")
+        for key, count in zip(keys, counts):
+            print(f"{count:10d} {bytes(key).hex()}")
+    if "saha" in attacks:
+        keyset, used = saha_attack(outputs, golden, args.processes)
+        print(f"Saha diagonal fault attack: key candidates from {used} outputs")
+        for byte, candidates in enumerate(keyset):
+            print(f"{byte:2d} {[hex(candidate) for candidate in candidates]}")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Export an ARCHIE hdf5 file into a Parquet dataset with one directory per
+record type. Every directory contains one file per chunk of experiments, all
+rows are keyed by the experiment index. Already exported experiments are
+skipped, so the export can be repeated after experiments were appended
+"""
+
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+
+import pandas as pd
+import tables
+
+from analysisfunctions import (
+    get_experiment_table,
+    get_group_memdumps,
+    get_group_registers,
+    list_experiments,
+    map_experiments,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Tables of the experiment groups exported as they are
+EXPERIMENT_TABLES = {
+    "faults": "faults",
+    "tbexec": "tbexeclist",
+    "tbinfo": "tbinfo",
+    "meminfo": "meminfo",
+}
+
+GOLDENRUN_INDICES = {"Pregoldenrun": -2, "Goldenrun": -1}
+
+
+def experiment_index(name):
+    if name in GOLDENRUN_INDICES:
+        return GOLDENRUN_INDICES[name]
+    return int(name[len("experiment") :])
+
+
+def memdump_records(filehandle, group):
+    """
+    One row per memory dump with the content as binary column
+    """
+    rows = []
+    for name, array in get_group_memdumps(filehandle, group).items():
+        _, address, length, _ = name.split("_")
+        for dump, data in enumerate(array):
+            rows.append(
+                {
+                    "address": int(address, 16),
+                    "length": int(length),
+                    "dump": dump,
+                    "data": data.tobytes(),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def extract_records(filehandle, name):
+    """
+    Read all record types of an experiment or goldenrun group
+    """
+    if name in GOLDENRUN_INDICES:
+        parent = filehandle.root
+    else:
+        parent = filehandle.root.fault
+    group = parent._f_get_child(name)
+
+    records = {}
+    for record, tablename in EXPERIMENT_TABLES.items():
+        if tablename in group:
+            records[record] = get_experiment_table(parent, name, tablename)
+    records["registers"] = get_group_registers(filehandle, group)
+    records["memdumps"] = memdump_records(filehandle, group)
+    return records
+
+
+def read_outcomes(filehandle, indices):
+    if "Outcomes" not in filehandle.root:
+        return pd.DataFrame()
+    outcomes = filehandle.root.Outcomes.read_where(
+        "(index >= low) & (index <= high)",
+        {"low": min(indices), "high": max(indices)},
+    )
+    outcomes = pd.DataFrame(outcomes)
+    outcomes = outcomes[outcomes["index"].isin(indices)].copy()
+    outcomes["experiment"] = outcomes["experiment"].str.decode("utf-8")
+    end_reasons = list(filehandle.root.Outcomes.attrs.end_reasons)
+    outcomes["end_reason"] = [end_reasons[code] for code in outcomes["end_reason"]]
+    return outcomes
+
+
+def write_chunk(outdir, names, chunk_records, outcomes):
+    """
+    Concatenate the records of a chunk per record type and write them with the
+    experiment index as first column
+    """
+    indices = [experiment_index(name) for name in names]
+    frames = {}
+    for index, records in zip(indices, chunk_records):
+        for record, frame in records.items():
+            if len(frame):
+                frames.setdefault(record, []).append(
+                    frame.assign(experiment=index).reset_index(drop=True)
+                )
+    if len(outcomes):
+        frames["outcomes"] = [outcomes.rename(columns={"experiment": "group"})]
+
+    # Shifted by two, so that the goldenruns have non-negative file names
+    filename = f"part-{min(indices) + 2:09d}-{max(indices) + 2:09d}.parquet"
+    for record, record_frames in frames.items():
+        frame = pd.concat(record_frames, ignore_index=True)
+        if "index" in frame:
+            frame = frame.rename(columns={"index": "experiment"})
+        columns = ["experiment"] + [c for c in frame.columns if c != "experiment"]
+        recorddir = outdir / record
+        recorddir.mkdir(parents=True, exist_ok=True)
+        frame[columns].to_parquet(recorddir / filename, index=False)
+
+
+def read_manifest(outdir):
+    path = outdir / MANIFEST
+    if not path.exists():
+        return set()
+    with open(path) as f:
+        return set(json.load(f)["exported"])
+
+
+def write_manifest(outdir, exported):
+    # Replace the manifest atomically, so an interrupted export can be resumed
+    path = outdir / MANIFEST
+    tmppath = path.with_suffix(".tmp")
+    with open(tmppath, "w") as f:
+        json.dump({"exported": sorted(exported)}, f)
+    os.replace(tmppath, path)
+
+
+def export_parquet(hdf5path, outdir, processes=None, chunksize=256):
+    """
+    Export all experiments of the hdf5 file, which are not yet listed in the
+    manifest of outdir. Returns the number of exported groups
+    """
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    exported = read_manifest(outdir)
+
+    with tables.open_file(hdf5path, "r") as f:
+        names = [name for name in GOLDENRUN_INDICES if name in f.root]
+    names.extend(list_experiments(hdf5path))
+    names = [name for name in names if name not in exported]
+    if not names:
+        return 0
+
+    for chunk_names, chunk_records in map_experiments(
+        hdf5path, extract_records, names, processes, chunksize
+    ):
+        indices = [experiment_index(name) for name in chunk_names]
+        # The file is not kept open while the worker processes are forked
+        with tables.open_file(hdf5path, "r") as f:
+            outcomes = read_outcomes(f, indices)
+        write_chunk(outdir, chunk_names, chunk_records, outcomes)
+        exported.update(chunk_names)
+        write_manifest(outdir, exported)
+        logger.info(f"Exported {len(exported)} groups")
+    return len(names)
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Export an ARCHIE hdf5 file into a partitioned Parquet dataset"
+    )
+    parser.add_argument("hdf5file", help="ARCHIE hdf5 file")
+    parser.add_argument("outdir", help="Directory of the Parquet dataset")
+    parser.add_argument(
+        "--processes", "-p", type=int, help="Number of processes. Default all cores"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=256,
+        help="Number of experiments per Parquet file. Default 256",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = get_argument_parser().parse_args()
+    num_exported = export_parquet(
+        args.hdf5file, args.outdir, args.processes, args.chunksize
+    )
+    logger.info(f"Exported {num_exported} new groups to {args.outdir}")
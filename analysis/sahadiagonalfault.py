@@ -8,6 +8,11 @@
 # input: faulty cipher texts and correct cipher text after the 10th round
 # output: key set for round 10
 
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
 # fmt: off
 # inverse s-box
 invSBox = (
@@ -90,96 +95,93 @@ def mult(a, b):
             return e[r]
 
 
-# equations for the M0 fault model (see section 5.2 in the above-mentioned publication)
+# fmt: off
+# Factors of the fault differences of the four key bytes of each diagonal with
+# respect to a common difference (see section 5.2 in the above-mentioned
+# publication)
+DIAGONALS = (
+    {0: 2, 13: 1, 10: 1, 7: 3},
+    {12: 3, 6: 1, 9: 2, 3: 1},
+    {8: 1, 5: 3, 2: 2, 15: 1},
+    {4: 1, 1: 1, 14: 3, 11: 2},
+)
+# fmt: on
+
+INV_SBOX = np.array(invSBox, dtype=np.uint8)
+# Multiplication tables in GF(2^8) and their inverse permutations
+MULT = {factor: np.array([mult(factor, v) for v in range(256)]) for factor in (1, 2, 3)}
+DIV = {factor: np.argsort(table) for factor, table in MULT.items()}
+
+
+def keyCandidates(ciphers, x):
+    """
+    Evaluate the equations of the M0 fault model for all key bytes at once.
+    ciphers is an array of faulty ciphertexts with shape (n, 16), x the
+    correct ciphertext. Returns the candidates of each key byte of each
+    ciphertext as 256 bit bitmap, i.e., an array of shape (n, 16, 32)
+    """
+    ciphers = np.asarray(ciphers, dtype=np.uint8).reshape(-1, 16)
+    x = np.asarray(x, dtype=np.uint8)
+    n = len(ciphers)
+    keys = np.arange(256, dtype=np.uint8)
+
+    # Fault difference of each key byte guess, shape (n, 16, 256)
+    f = (
+        INV_SBOX[keys ^ x[:, None]][None, :, :]
+        ^ INV_SBOX[keys[None, None, :] ^ ciphers[:, :, None]]
+    )
+    # Fault differences reached by any key guess of a byte
+    reached = np.zeros((n, 16, 256), dtype=bool)
+    reached[np.arange(n)[:, None, None], np.arange(16)[None, :, None], f] = True
+
+    candidates = np.zeros((n, 16, 256), dtype=bool)
+    for diagonal in DIAGONALS:
+        # Common differences v, for which every byte reaches factor * v
+        common = np.ones((n, 256), dtype=bool)
+        for byte, factor in diagonal.items():
+            common &= reached[:, byte, MULT[factor]]
+        for byte, factor in diagonal.items():
+            candidates[:, byte] = np.take_along_axis(
+                common, DIV[factor][f[:, byte]], axis=1
+            )
+    return np.packbits(candidates, axis=2)
+
+
+def keyCandidatesParallel(ciphers, x, processes=None, chunksize=4096):
+    """
+    Same as keyCandidates, the ciphertexts are split into chunks, which are
+    evaluated in a process pool
+    """
+    ciphers = np.asarray(ciphers, dtype=np.uint8).reshape(-1, 16)
+    chunks = [ciphers[i : i + chunksize] for i in range(0, len(ciphers), chunksize)]
+    if len(chunks) <= 1:
+        return keyCandidates(ciphers, x)
+    with Pool(processes) as pool:
+        return np.concatenate(pool.map(partial(keyCandidates, x=x), chunks))
+
+
+def intersectCandidates(bitmaps):
+    """
+    Intersect the candidate bitmaps of several ciphertexts
+    """
+    return np.bitwise_and.reduce(np.asarray(bitmaps), axis=0)
+
+
+def candidatesToKeyset(bitmap):
+    """
+    Convert a candidate bitmap of shape (16, 32) into a list of the candidates
+    of each key byte
+    """
+    return [np.flatnonzero(np.unpackbits(byte)).tolist() for byte in bitmap]
+
+
 def differentialFaultAttack(c, keyset, x):
-    key = [0] * 16
-    # obtain set for key bytes 0, 7, 10 and 13
-    for k in range(0, 256):
-        key[0] = k
-        # print(k)
-        for j in range(0, 256):
-            key[13] = j
-            f1 = invSBox[key[0] ^ x[0]] ^ invSBox[key[0] ^ c[0]]
-            f2 = invSBox[key[13] ^ x[13]] ^ invSBox[key[13] ^ c[13]]
-            if f1 == mult(2, f2):
-                for i in range(0, 256):
-                    key[10] = i
-                    f3 = invSBox[key[10] ^ x[10]] ^ invSBox[key[10] ^ c[10]]
-                    if f3 == f2:
-                        for n in range(0, 256):
-                            key[7] = n
-                            f4 = invSBox[key[7] ^ x[7]] ^ invSBox[key[7] ^ c[7]]
-                            if mult(3, f3) == f4:
-                                keyset[0].append(key[0])
-                                keyset[13].append(key[13])
-                                keyset[10].append(key[10])
-                                keyset[7].append(key[7])
-
-    # obtain set for key bytes 3, 6, 9 and 12
-    for k in range(0, 256):
-        key[12] = k
-        # print(k)
-        for j in range(0, 256):
-            key[6] = j
-            f1 = invSBox[key[12] ^ x[12]] ^ invSBox[key[12] ^ c[12]]
-            f2 = invSBox[key[6] ^ x[6]] ^ invSBox[key[6] ^ c[6]]
-            if f1 == mult(3, f2):
-                for i in range(0, 256):
-                    key[9] = i
-                    f3 = invSBox[key[9] ^ x[9]] ^ invSBox[key[9] ^ c[9]]
-                    if f3 == mult(2, f2):
-                        for n in range(0, 256):
-                            key[3] = n
-                            f4 = invSBox[key[3] ^ x[3]] ^ invSBox[key[3] ^ c[3]]
-                            if f2 == f4:
-                                keyset[12].append(key[12])
-                                keyset[6].append(key[6])
-                                keyset[9].append(key[9])
-                                keyset[3].append(key[3])
-
-    # obtain set for key bytes 2, 5, 8 and 15
-    for k in range(0, 256):
-        key[8] = k
-        # print(k)
-        for j in range(0, 256):
-            key[5] = j
-            f1 = invSBox[key[8] ^ x[8]] ^ invSBox[key[8] ^ c[8]]
-            f2 = invSBox[key[5] ^ x[5]] ^ invSBox[key[5] ^ c[5]]
-            if mult(3, f1) == f2:
-                for i in range(0, 256):
-                    key[2] = i
-                    f3 = invSBox[key[2] ^ x[2]] ^ invSBox[key[2] ^ c[2]]
-                    if f3 == mult(2, f1):
-                        for n in range(0, 256):
-                            key[15] = n
-                            f4 = invSBox[key[15] ^ x[15]] ^ invSBox[key[15] ^ c[15]]
-                            if f1 == f4:
-                                keyset[8].append(key[8])
-                                keyset[5].append(key[5])
-                                keyset[2].append(key[2])
-                                keyset[15].append(key[15])
-
-    # obtain set for key bytes 1, 4, 11 and 14
-    for k in range(0, 256):
-        key[1] = k
-        # print(k)
-        for j in range(0, 256):
-            key[4] = j
-            f1 = invSBox[key[4] ^ x[4]] ^ invSBox[key[4] ^ c[4]]
-            f2 = invSBox[key[1] ^ x[1]] ^ invSBox[key[1] ^ c[1]]
-            if f1 == f2:
-                for i in range(0, 256):
-                    key[14] = i
-                    f3 = invSBox[key[14] ^ x[14]] ^ invSBox[key[14] ^ c[14]]
-                    if f3 == mult(3, f2):
-                        for n in range(0, 256):
-                            key[11] = n
-                            f4 = invSBox[key[11] ^ x[11]] ^ invSBox[key[11] ^ c[11]]
-                            if mult(2, f2) == f4:
-                                keyset[1].append(key[1])
-                                keyset[4].append(key[4])
-                                keyset[14].append(key[14])
-                                keyset[11].append(key[11])
+    """
+    Append the candidates of each key byte for the faulty ciphertext c and the
+    correct ciphertext x to the lists of keyset
+    """
+    for byte, candidates in enumerate(candidatesToKeyset(keyCandidates(c, x)[0])):
+        keyset[byte].extend(candidates)
 
 
 if __name__ == "__main__":
@@ -195,45 +197,11 @@ if __name__ == "__main__":
     cipher4 = (0xcd, 0xf2, 0x07, 0x0e, 0xe6, 0x58, 0xc9, 0x4e, 0x2d, 0x32, 0xb0, 0xd5, 0x43, 0xc4, 0x90, 0x33)
     # fmt: on
 
-    # cipher key sets
-    keysetCipher = [[] for i in range(0, 16)]
-    keysetCipher1 = [[] for i in range(0, 16)]
-    keysetCipher2 = [[] for i in range(0, 16)]
-    keysetCipher3 = [[] for i in range(0, 16)]
-    keysetCipher4 = [[] for i in range(0, 16)]
-    # test first ciphertext to obtain reduced keyset
-    differentialFaultAttack(cipher, keysetCipher, x)
-
-    # test second ciphertext to obtain reduced keyset
-    differentialFaultAttack(cipher1, keysetCipher1, x)
-
-    # test third ciphertext to obtain reduced keyset
-    differentialFaultAttack(cipher2, keysetCipher2, x)
-
-    # test fourth ciphertext to obtain reduced keyset
-    differentialFaultAttack(cipher3, keysetCipher3, x)
+    ciphers = [cipher, cipher1, cipher2, cipher3, cipher4]
 
-    # test fourth ciphertext to obtain reduced keyset
-    differentialFaultAttack(cipher4, keysetCipher4, x)
+    # test all ciphertexts and intersect the reduced keysets
+    bitmap = intersectCandidates(keyCandidates(ciphers, x))
 
-    # remove duplicates, sort lists and print intersection
     print("reduced key set of tenth round key")
-    for i in range(0, 16):
-        keysetCipher[i] = list(set(keysetCipher[i]))
-        keysetCipher[i].sort()
-        keysetCipher1[i] = list(set(keysetCipher1[i]))
-        keysetCipher1[i].sort()
-        keysetCipher2[i] = list(set(keysetCipher2[i]))
-        keysetCipher2[i].sort()
-        keysetCipher3[i] = list(set(keysetCipher3[i]))
-        keysetCipher3[i].sort()
-        keysetCipher4[i] = list(set(keysetCipher4[i]))
-        keysetCipher4[i].sort()
-        intersection = list(
-            set(keysetCipher[i])
-            & set(keysetCipher1[i])
-            & set(keysetCipher2[i])
-            & set(keysetCipher3[i])
-            & set(keysetCipher4[i])
-        )
-        print([hex(c) for c in intersection])
+    for candidates in candidatesToKeyset(bitmap):
+        print([hex(c) for c in candidates])
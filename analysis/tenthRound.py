@@ -357,6 +357,49 @@ def getTenthRoundKey(state10, cipher):
     return addRoundKey(subBytes(shiftRows(state10)), cipher)
 
 
+# fmt: off
+SBOX = np.array(sBox, dtype=np.uint8)
+# byte permutation of shiftRows, i.e., shiftRows(s)[i] = s[SHIFT_ROWS[i]]
+SHIFT_ROWS = np.array([0, 5, 10, 15, 4, 9, 14, 3, 8, 13, 2, 7, 12, 1, 6, 11])
+# fmt: on
+
+
+def getTenthRoundKeys(states, cipher):
+    """
+    Vectorized getTenthRoundKey for an array of 10th round states with shape
+    (n, 16), e.g., faulty ciphertexts of many experiments. Returns the round
+    key guesses as array of shape (n, 16)
+    """
+    states = np.asarray(states, dtype=np.uint8).reshape(-1, 16)
+    return SBOX[states[:, SHIFT_ROWS]] ^ np.asarray(cipher, dtype=np.uint8)
+
+
+def voteRoundKey(keys):
+    """
+    Majority vote of each key byte over round key guesses with shape (n, 16).
+    Returns the key and the votes of each byte value with shape (16, 256)
+    """
+    keys = np.asarray(keys, dtype=np.uint8).reshape(-1, 16)
+    votes = np.bincount(
+        (np.arange(16) * 256 + keys).ravel(), minlength=16 * 256
+    ).reshape(16, 256)
+    return votes.argmax(axis=1).astype(np.uint8), votes
+
+
+def rankRoundKeys(keys, top=10):
+    """
+    Rank the distinct round key guesses with shape (n, 16) by the number of
+    experiments they were derived from. Returns the top keys and their counts
+    """
+    keys = np.ascontiguousarray(keys, dtype=np.uint8).reshape(-1, 16)
+    # Compare whole keys as 16 byte records
+    unique, counts = np.unique(
+        keys.view(np.dtype((np.void, 16))).ravel(), return_counts=True
+    )
+    order = np.argsort(counts, kind="stable")[::-1][:top]
+    return unique[order].view(np.uint8).reshape(-1, 16), counts[order]
+
+
 if __name__ == "__main__":
     # get 10th round key
     tenthRndKey = getTenthRoundKey(stateNinthRound, cipherTenthRound)
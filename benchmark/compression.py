@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark the write and read throughput and the file size of the hdf5 output
+for different compression libraries on a synthetic campaign
+"""
+
+import argparse
+import io
+import json
+import os
+from pathlib import Path
+import queue
+import sys
+import tempfile
+import time
+
+import tables
+
+import synthetic
+from postprocessing import git_commit
+
+from faultclass import Fault, readout_data  # noqa: E402
+from hdf5logger import create_assembler_store, create_filters  # noqa: E402
+from hdf5logger import leaf_table_type  # noqa: E402
+from hdf5logger import process_experiment  # noqa: E402
+
+# blosc2 is not benchmarked by default, as it is orders of magnitude slower on
+# the many small tables of a campaign
+DEFAULT_COMPLIBS = ["zlib", "blosc:lz4", "blosc:zstd"]
+
+
+def generate_campaign(workload, num_distinct):
+    """
+    Generate the logger input of num_distinct faulted experiments
+    """
+    tbs = synthetic.generate_tbs(workload)
+    goldenrun_data = synthetic.build_goldenrun_data(
+        synthetic.generate_data(workload, tbs)
+    )
+    faultlist = [Fault(tbs[0][0], [], 0, 0, 0, 1, tbs[0][0], 1, 0, False)]
+    config_qemu = {"ring_buffer": False}
+
+    queue_output = queue.Queue()
+    experiments = []
+    for seed in range(1, num_distinct + 1):
+        message = synthetic.generate_data(workload, tbs, fault_seed=seed)
+        readout_data(
+            io.BytesIO(message.SerializeToString()),
+            seed,
+            queue_output,
+            faultlist,
+            goldenrun_data,
+            config_qemu,
+        )
+        experiments.append(queue_output.get())
+    return experiments
+
+
+def run_codec(experiments, num_experiments, compressionlevel, compression, tmpdir):
+    hdf5path = Path(tmpdir) / "compression.hdf5"
+    myfilter = create_filters(compressionlevel, compression)
+
+    t0 = time.perf_counter()
+    with tables.open_file(hdf5path, "w", max_group_width=65536) as f:
+        fault_group = f.create_group("/", "fault")
+        assembler_store = create_assembler_store(f, myfilter["default"])
+        for i in range(num_experiments):
+            exp_group = f.create_group(fault_group, f"experiment{i}")
+            process_experiment(
+                f,
+                exp_group,
+                experiments[i % len(experiments)],
+                myfilter,
+                assembler_store=assembler_store,
+            )
+    write_time = time.perf_counter() - t0
+
+    uncompressed = 0
+    table_sizes = {}
+    t0 = time.perf_counter()
+    with tables.open_file(hdf5path, "r") as f:
+        for node in f.walk_nodes("/", "Leaf"):
+            node.read()
+            uncompressed += int(node.size_in_memory)
+            name = leaf_table_type(node)
+            table_sizes[name] = table_sizes.get(name, 0) + int(node.size_on_disk)
+    read_time = time.perf_counter() - t0
+
+    file_size = os.path.getsize(hdf5path)
+    os.remove(hdf5path)
+
+    return {
+        "write_time": write_time,
+        "read_time": read_time,
+        "write_throughput": uncompressed / write_time,
+        "read_throughput": uncompressed / read_time,
+        "uncompressed": uncompressed,
+        "file_size": file_size,
+        "ratio": uncompressed / file_size,
+        "table_sizes": table_sizes,
+    }
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hdf5 compression libraries on synthetic data"
+    )
+    for key, value in synthetic.DEFAULT_WORKLOAD.items():
+        parser.add_argument(
+            f"--{key.replace('_', '-')}",
+            type=type(value),
+            default=value,
+            help=f"Default {value}",
+        )
+    parser.add_argument(
+        "--experiments",
+        type=int,
+        default=200,
+        help="Number of experiments written per codec. Default 200",
+    )
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=20,
+        help="Number of distinct experiments the campaign is built from. Default 20",
+    )
+    parser.add_argument(
+        "--complib",
+        action="append",
+        choices=tables.filters.all_complibs,
+        help=f"Compression library to benchmark, can be used multiple times. "
+        f"Default {', '.join(DEFAULT_COMPLIBS)}",
+    )
+    parser.add_argument("--compressionlevel", type=int, default=1, help="Default 1")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_argument_parser().parse_args()
+
+    workload = {key: getattr(args, key) for key in synthetic.DEFAULT_WORKLOAD}
+    experiments = generate_campaign(workload, args.distinct)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for complib in args.complib or DEFAULT_COMPLIBS:
+            results[complib] = run_codec(
+                experiments,
+                args.experiments,
+                args.compressionlevel,
+                {"default": complib},
+                tmpdir,
+            )
+
+    print(
+        f"{'complib':<16}{'write MiB/s':>12}{'read MiB/s':>12}"
+        f"{'size MiB':>10}{'ratio':>8}"
+    )
+    for complib, result in results.items():
+        print(
+            f"{complib:<16}{result['write_throughput'] / 2**20:12.1f}"
+            f"{result['read_throughput'] / 2**20:12.1f}"
+            f"{result['file_size'] / 2**20:10.2f}{result['ratio']:8.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": sys.version.split()[0],
+                    "workload": workload,
+                    "experiments": args.experiments,
+                    "distinct": args.distinct,
+                    "compressionlevel": args.compressionlevel,
+                    "complibs": results,
+                },
+                f,
+                indent=4,
+            )
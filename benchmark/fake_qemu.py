@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stand-in for QEMU with the faultplugin. It is started by run_qemu with the
+same arguments, speaks the control/config/data FIFO protocol and answers with
+a synthetic Data message. The workload is read from the JSON file given as
+plugin path in the qemu configuration.
+"""
+
+import json
+import random
+import sys
+import time
+
+import synthetic
+
+import protobuf.control_pb2 as control_pb2  # noqa: E402
+import protobuf.fault_pb2 as fault_pb2  # noqa: E402
+
+# Size of the ring buffer used by the faultplugin
+RING_BUFFER_SIZE = 100
+
+DEFAULT_FAKE_QEMU = {
+    # Time in seconds an experiment takes, including generating the data
+    "delay": 0.01,
+    # Uniformly distributed deviation from the delay in seconds
+    "delay_jitter": 0.0,
+}
+
+
+def parse_plugin_arguments(argv):
+    """
+    Return the plugin path and the fifo paths of the -plugin argument
+    """
+    plugin = argv[argv.index("-plugin") + 1].split(",")
+    fifos = dict(option.split("=", 1) for option in plugin[1:])
+    return plugin[0], fifos
+
+
+def read_message(fifo, message):
+    """
+    Read a size prefixed protobuf message as written by the python worker
+    """
+    size = int(fifo.readline())
+    message.ParseFromString(fifo.read(size))
+    return message
+
+
+def fault_seed(fault_pack):
+    """
+    Faults with an empty mask do not change the execution (e.g. the dummy
+    fault of the goldenrun), all other faults get a seed derived from the
+    fault, so that the same fault always results in the same data
+    """
+    seed = None
+    for fault in fault_pack.faults:
+        if fault.mask_upper == 0 and fault.mask_lower == 0:
+            continue
+        seed = (seed or "") + (
+            f"{fault.address}/{fault.type}/{fault.model}/{fault.trigger_address}/"
+            f"{fault.trigger_hitcounter}/{fault.mask_upper}/{fault.mask_lower};"
+        )
+    return seed
+
+
+def build_data(workload, control, fault_pack):
+    tbs = synthetic.generate_tbs(workload)
+    memorydumps = [(dump.address, dump.length) for dump in control.memorydumps]
+    data = synthetic.generate_data(
+        workload, tbs, fault_seed(fault_pack), memorydumps or None
+    )
+
+    # Apply the data collection options of the control message
+    if not control.tb_info:
+        del data.tb_informations[:]
+    if not control.tb_exec_list:
+        del data.tb_exec_orders[:]
+    elif control.tb_exec_list_ring_buffer:
+        # Newest entries are sent first
+        del data.tb_exec_orders[RING_BUFFER_SIZE:]
+    if not control.mem_info:
+        del data.mem_infos[:]
+    if control.memmap_dump:
+        mem_map_info = data.mem_map_infos.add()
+        mem_map_info.address = tbs[0][0]
+        mem_map_info.size = tbs[-1][0] + tbs[-1][1] - tbs[0][0]
+
+    return data
+
+
+if __name__ == "__main__":
+    t0 = time.time()
+
+    plugin, fifos = parse_plugin_arguments(sys.argv)
+    with open(plugin) as f:
+        config = json.load(f)
+    workload = {**synthetic.DEFAULT_WORKLOAD, **DEFAULT_FAKE_QEMU, **config}
+
+    # Same order as the faultplugin, otherwise the worker blocks
+    control_fifo = open(fifos["control"], "rb")
+    config_fifo = open(fifos["config"], "rb")
+    data_fifo = open(fifos["data"], "wb")
+
+    control = read_message(control_fifo, control_pb2.Control())
+    fault_pack = read_message(config_fifo, fault_pb2.FaultPack())
+
+    data = build_data(workload, control, fault_pack).SerializeToString()
+
+    delay = workload["delay"] + random.uniform(
+        -workload["delay_jitter"], workload["delay_jitter"]
+    )
+    time.sleep(max(0, delay - (time.time() - t0)))
+
+    data_fifo.write(data)
+    data_fifo.close()
+    control_fifo.close()
+    config_fifo.close()
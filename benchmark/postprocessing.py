@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark the python post processing of the workers and the hdf5 logger on
+synthetic data. Results are written as JSON, so that commits can be compared
+"""
+
+import argparse
+import io
+import json
+from pathlib import Path
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import tables
+
+import synthetic
+
+from faultclass import connect_meminfo_tb, filter_tb, Fault  # noqa: E402
+from faultclass import readout_data, readout_memdump  # noqa: E402
+from faultclass import readout_meminfo, readout_registers  # noqa: E402
+from faultclass import readout_tbexec, readout_tbinfo  # noqa: E402
+from faultclass import write_output_wrt_goldenrun  # noqa: E402
+from hdf5logger import create_assembler_store, process_experiment  # noqa: E402
+import protobuf.data_pb2 as data_pb2  # noqa: E402
+
+
+def time_stage(function, repeat):
+    """
+    Run function repeat times and return the durations and the last result
+    """
+    durations = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - t0)
+    return durations, result
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=Path(__file__).parent,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def run_benchmark(workload, config_qemu, repeat):
+    tbs = synthetic.generate_tbs(workload)
+    goldenrun = synthetic.generate_data(workload, tbs)
+    goldenrun_data = synthetic.build_goldenrun_data(goldenrun)
+    message = synthetic.generate_data(workload, tbs, fault_seed=1).SerializeToString()
+    faultlist = [Fault(tbs[0][0], [], 0, 0, 0, 1, tbs[0][0], 1, 0, False)]
+
+    stages = {}
+
+    def parse():
+        data = data_pb2.Data()
+        data.ParseFromString(message)
+        return data
+
+    stages["parse"], data = time_stage(parse, repeat)
+    stages["readout_tbinfo"], tbinfo = time_stage(lambda: readout_tbinfo(data), repeat)
+    stages["readout_tbexec"], tbexec = time_stage(lambda: readout_tbexec(data), repeat)
+    stages["readout_meminfo"], meminfo = time_stage(
+        lambda: readout_meminfo(data), repeat
+    )
+    stages["connect_meminfo_tb"], _ = time_stage(
+        lambda: connect_meminfo_tb(meminfo, tbinfo), repeat
+    )
+    stages["readout_registers"], _ = time_stage(lambda: readout_registers(data), repeat)
+    stages["readout_memdump"], _ = time_stage(lambda: readout_memdump(data), repeat)
+
+    tbexec = tbexec.sort_values(by="pos")
+    stages["filter_tb"], (tbexec, tbinfo) = time_stage(
+        lambda: filter_tb(
+            tbexec.copy(),
+            [dict(tb) for tb in tbinfo],
+            goldenrun_data["tbexec"],
+            goldenrun_data["filters"],
+            0,
+        ),
+        repeat,
+    )
+    stages["write_output_wrt_goldenrun"], _ = time_stage(
+        lambda: [
+            write_output_wrt_goldenrun(keyword, dataset, goldenrun_data)
+            for keyword, dataset in [
+                ("tbexec", tbexec),
+                ("tbinfo", tbinfo),
+                ("meminfo", meminfo),
+            ]
+        ],
+        repeat,
+    )
+
+    queue_output = queue.Queue()
+
+    def experiment():
+        readout_data(
+            io.BytesIO(message),
+            0,
+            queue_output,
+            faultlist,
+            goldenrun_data,
+            config_qemu,
+        )
+        return queue_output.get()
+
+    stages["readout_data"], output = time_stage(experiment, repeat)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        myfilter = tables.Filters(complevel=1, complib="zlib")
+        with tables.open_file(Path(tmpdir) / "benchmark.hdf5", "w") as f:
+            fault_group = f.create_group("/", "fault")
+            assembler_store = create_assembler_store(f, myfilter)
+            counter = iter(range(repeat))
+
+            def write():
+                exp_group = f.create_group(fault_group, f"experiment{next(counter)}")
+                process_experiment(
+                    f, exp_group, output, myfilter, assembler_store=assembler_store
+                )
+                f.flush()
+
+            stages["hdf5_write"], _ = time_stage(write, repeat)
+
+    results = {
+        stage: {
+            "median": statistics.median(durations),
+            "min": min(durations),
+            "max": max(durations),
+        }
+        for stage, durations in stages.items()
+    }
+    experiment_time = (
+        results["readout_data"]["median"] + results["hdf5_write"]["median"]
+    )
+    return results, 1 / experiment_time
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the python post processing on synthetic data"
+    )
+    for key, value in synthetic.DEFAULT_WORKLOAD.items():
+        parser.add_argument(
+            f"--{key.replace('_', '-')}",
+            type=type(value),
+            default=value,
+            help=f"Default {value}",
+        )
+    parser.add_argument(
+        "--ring-buffer",
+        action="store_true",
+        help="Benchmark with the ring buffer enabled, which skips filter_tb",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="Repetitions per stage. Default 10"
+    )
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_argument_parser().parse_args()
+
+    workload = {key: getattr(args, key) for key in synthetic.DEFAULT_WORKLOAD}
+    config_qemu = {"ring_buffer": args.ring_buffer}
+
+    results, experiments_per_second = run_benchmark(workload, config_qemu, args.repeat)
+
+    for stage, result in results.items():
+        print(f"{stage:<28}{result['median'] * 1e3:10.3f}ms")
+    print(f"{'experiments/s':<28}{experiments_per_second:10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": sys.version.split()[0],
+                    "workload": workload,
+                    "ring_buffer": args.ring_buffer,
+                    "repeat": args.repeat,
+                    "stages": results,
+                    "experiments_per_second": experiments_per_second,
+                },
+                f,
+                indent=4,
+            )
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark the reconstruction of complete experiment traces from their diffs
+to the goldenrun on synthetic data and check the result against the complete
+traces
+"""
+
+import argparse
+import json
+from pathlib import Path
+import sys
+import time
+
+import pandas as pd
+
+import synthetic
+from postprocessing import git_commit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "analysis"))
+
+from analysisfunctions import reconstruct_tables  # noqa: E402
+from faultclass import readout_tbexec, write_output_wrt_goldenrun  # noqa: E402
+
+
+def generate_traces(workload, num_experiments):
+    """
+    Return the goldenrun tbexec and the complete and diffed tbexec of each
+    experiment
+    """
+    tbs = synthetic.generate_tbs(workload)
+    golden = readout_tbexec(synthetic.generate_data(workload, tbs))
+    golden = golden.sort_values(by="pos", ignore_index=True)
+
+    traces = {}
+    diffs = {}
+    for seed in range(1, num_experiments + 1):
+        trace = readout_tbexec(synthetic.generate_data(workload, tbs, fault_seed=seed))
+        trace = trace.sort_values(by="pos", ignore_index=True)
+        traces[f"experiment{seed}"] = trace
+        diffs[f"experiment{seed}"] = pd.DataFrame(
+            write_output_wrt_goldenrun("tbexec", trace, {"tbexec": golden})
+        )
+    return golden, traces, diffs
+
+
+def reconstruct_naive(golden, diff, keyword):
+    """
+    Per value lookup as done by get_experiment_table_expanded before
+    """
+    idxs = set()
+    for value in diff[keyword]:
+        idxs.update(golden.index[golden[keyword] == value])
+    table = pd.concat([diff, golden.drop(list(idxs))])
+    return table.sort_values(keyword, ignore_index=True)
+
+
+def check(traces, reconstructed):
+    for name, trace in traces.items():
+        table = reconstructed[name][["pos", "tb"]].reset_index(drop=True)
+        if not table.astype("uint64").equals(trace[["pos", "tb"]].astype("uint64")):
+            raise ValueError(f"Reconstruction of {name} differs from the trace")
+
+
+def run_benchmark(workload, num_experiments):
+    golden, traces, diffs = generate_traces(workload, num_experiments)
+    results = {}
+
+    t0 = time.perf_counter()
+    reconstructed = {
+        name: reconstruct_naive(golden, diff, "pos") for name, diff in diffs.items()
+    }
+    results["naive"] = time.perf_counter() - t0
+    check(traces, reconstructed)
+
+    t0 = time.perf_counter()
+    reconstructed = {
+        name: reconstruct_tables(golden, diff.assign(experiment=name), ["pos"])
+        for name, diff in diffs.items()
+    }
+    results["per_experiment"] = time.perf_counter() - t0
+    check(traces, reconstructed)
+
+    t0 = time.perf_counter()
+    diff_table = pd.concat(
+        [diff.assign(experiment=name) for name, diff in diffs.items()],
+        ignore_index=True,
+    )
+    table = reconstruct_tables(golden, diff_table, ["pos"], list(diffs))
+    results["batch"] = time.perf_counter() - t0
+    check(traces, dict(list(table.groupby("experiment"))))
+
+    return results
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the reconstruction of experiment traces"
+    )
+    for key, value in synthetic.DEFAULT_WORKLOAD.items():
+        parser.add_argument(
+            f"--{key.replace('_', '-')}",
+            type=type(value),
+            default=value,
+            help=f"Default {value}",
+        )
+    parser.add_argument(
+        "--experiments",
+        type=int,
+        default=20,
+        help="Number of experiments. Default 20",
+    )
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_argument_parser().parse_args()
+
+    workload = {key: getattr(args, key) for key in synthetic.DEFAULT_WORKLOAD}
+    results = run_benchmark(workload, args.experiments)
+
+    for method, duration in results.items():
+        print(f"{method:<16}{duration:10.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": sys.version.split()[0],
+                    "workload": workload,
+                    "experiments": args.experiments,
+                    "results": results,
+                },
+                f,
+                indent=4,
+            )
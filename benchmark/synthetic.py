@@ -0,0 +1,196 @@
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Generate synthetic protobuf Data messages and goldenrun traces, so that the
+python post processing can be benchmarked without QEMU
+"""
+
+from pathlib import Path
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import protobuf.data_pb2 as data_pb2  # noqa: E402
+
+DEFAULT_WORKLOAD = {
+    # Number of distinct translation blocks
+    "tbs": 200,
+    # Length of the tb execution list
+    "tbexec": 10000,
+    # Number of memory info entries
+    "meminfo": 1000,
+    # Number of register dumps
+    "registers": 1,
+    # Number and length of memory dumps
+    "memdumps": 1,
+    "memdump_len": 256,
+    # Position in the execution list where faulted runs diverge from the
+    # goldenrun, relative to its length
+    "divergence": 0.5,
+    "arch": "arm",
+    "seed": 0,
+}
+
+MNEMONICS = ["movs", "ldr", "str", "adds", "cmp", "bne", "lsls", "eors"]
+
+REGISTER_COUNT = {"arm": 17, "riscv": 33, "aarch64": 33}
+# Values of faultclass.Register, not imported to keep the fake QEMU light
+REGISTER_TYPE = {"arm": 0, "riscv": 1, "aarch64": 2}
+
+
+def generate_tbs(workload):
+    """
+    Generate the translation blocks of the synthetic firmware. Each tb is a
+    tuple of base address, size and list of (address, mnemonic)
+    """
+    rng = random.Random(workload["seed"])
+    tbs = []
+    address = 0x08000000
+    for i in range(workload["tbs"]):
+        instructions = []
+        tb_address = address
+        for j in range(rng.randint(2, 12)):
+            instructions.append((address, rng.choice(MNEMONICS)))
+            address += rng.choice([2, 4])
+        tbs.append((tb_address, address - tb_address, instructions))
+        # Leave a gap between tbs
+        address += 0x10
+    return tbs
+
+
+def generate_data(workload, tbs, fault_seed=None, memorydumps=None):
+    """
+    Build a Data message as it is sent by the faultplugin. If a fault seed is
+    given, the run follows the goldenrun until the divergence point and then
+    takes a different path depending on the seed. Memory dumps are taken of
+    the given (address, length) regions or as configured in the workload
+    """
+    faulted = fault_seed is not None
+    rng = random.Random(workload["seed"])
+    faulted_rng = random.Random(fault_seed)
+    divergence = int(workload["tbexec"] * workload["divergence"])
+
+    data = data_pb2.Data()
+    data.architecture = workload["arch"]
+    data.end_point = 1
+    data.end_reason = "endpoint 1/1"
+
+    # Always start with the first tb, so it can be used as trigger address
+    tbexec = [0]
+    for pos in range(1, workload["tbexec"]):
+        tb = rng.randrange(len(tbs))
+        if faulted and pos >= divergence:
+            tb = faulted_rng.randrange(len(tbs))
+        tbexec.append(tb)
+
+    num_exec = [0] * len(tbs)
+    for tb in tbexec:
+        num_exec[tb] += 1
+
+    for tb, (tb_address, tb_size, instructions) in enumerate(tbs):
+        if num_exec[tb] == 0:
+            continue
+        tb_information = data.tb_informations.add()
+        tb_information.base_address = tb_address
+        tb_information.size = tb_size
+        tb_information.instruction_count = len(instructions)
+        tb_information.num_of_exec = num_exec[tb]
+        tb_information.assembler = "".join(
+            f"[ {address:8x} ]: {mnemonic} r0, r1 !!"
+            for address, mnemonic in instructions
+        )
+
+    # The plugin sends the execution list newest first
+    for pos, tb in enumerate(reversed(tbexec)):
+        tb_exec_order = data.tb_exec_orders.add()
+        tb_exec_order.tb_base_address = tbs[tb][0]
+        tb_exec_order.pos = len(tbexec) - 1 - pos
+
+    for i in range(workload["meminfo"]):
+        tb_address, tb_size, instructions = tbs[tbexec[i % len(tbexec)]]
+        mem_info = data.mem_infos.add()
+        mem_info.ins_address = rng.choice(instructions)[0]
+        mem_info.size = rng.choice([1, 2, 4])
+        mem_info.memmory_address = 0x20000000 + rng.randrange(0x1000)
+        mem_info.direction = rng.randrange(2)
+        mem_info.counter = 1
+        if faulted and i >= workload["meminfo"] * workload["divergence"]:
+            mem_info.counter = faulted_rng.randint(1, 3)
+
+    data.register_info.arch_type = REGISTER_TYPE[workload["arch"]]
+    for i in range(workload["registers"]):
+        register_dump = data.register_info.register_dumps.add()
+        register_dump.register_values.extend(
+            rng.getrandbits(32) for j in range(REGISTER_COUNT[workload["arch"]])
+        )
+        if faulted:
+            register_dump.register_values[0] ^= 1 << faulted_rng.randrange(32)
+        register_dump.pc = tbs[tbexec[-1]][0] if tbexec else 0
+        register_dump.tb_count = len(tbexec)
+
+    if memorydumps is None:
+        memorydumps = [
+            (0x20000000 + i * workload["memdump_len"], workload["memdump_len"])
+            for i in range(workload["memdumps"])
+        ]
+    for address, length in memorydumps:
+        mem_dump_info = data.mem_dump_infos.add()
+        mem_dump_info.address = address
+        mem_dump_info.len = length
+        dump = bytearray(rng.getrandbits(8) for j in range(length))
+        if faulted and dump:
+            dump[faulted_rng.randrange(len(dump))] ^= 0xFF
+        mem_dump_info.dumps.add().mem = bytes(dump)
+
+    if faulted:
+        faulted_data = data.faulted_datas.add()
+        faulted_data.trigger_address = tbs[0][0]
+        faulted_data.assembler = data.tb_informations[0].assembler
+
+    return data
+
+
+def build_goldenrun_data(data):
+    """
+    Convert a goldenrun Data message into the goldenrun_data the workers
+    receive from the controller
+    """
+    # Imported here, so that the fake QEMU does not need to load pandas
+    import pandas as pd
+
+    from faultclass import build_filters, build_instruction_map, connect_meminfo_tb
+    from faultclass import readout_meminfo, readout_registers
+    from faultclass import readout_tbexec, readout_tbinfo
+
+    tbinfo = readout_tbinfo(data)
+    tbexec = readout_tbexec(data).sort_values(by="pos")
+    registers = readout_registers(data)
+    meminfo = readout_meminfo(data)
+    connect_meminfo_tb(meminfo, tbinfo)
+
+    instructions = build_instruction_map(tbinfo)
+    goldenrun_data = {
+        "tbinfo": pd.DataFrame(tbinfo),
+        "tbexec": tbexec.reset_index(drop=True),
+        "instructions": instructions,
+        "filters": build_filters(instructions),
+        f"{data.architecture}registers": pd.DataFrame(registers),
+    }
+    if meminfo:
+        goldenrun_data["meminfo"] = pd.DataFrame(meminfo)
+    return goldenrun_data
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Emulate the experiments of a campaign with each mode of the unicorn emulation
+worker and check that all of them return the same results as a new engine per
+experiment, or as the run_unicorn of a reference build of the worker
+"""
+
+import argparse
+import importlib.util
+import json
+from pathlib import Path
+import sys
+import time
+
+import numpy
+import pandas as pd
+
+from postprocessing import git_commit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from controller import read_backup, read_elf_segments  # noqa: E402
+from faultclass import read_columns  # noqa: E402
+
+DEFAULT_WORKER = (
+    Path(__file__).resolve().parent.parent
+    / "emulation_worker/target/release/libemulation_worker.so"
+)
+
+
+def load_worker(path):
+    spec = importlib.util.spec_from_file_location(
+        "emulation_worker", Path(path).resolve()
+    )
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def read_table(table):
+    """
+    DataFrame of a table returned as packed columns or, by older builds of the
+    worker, as a list of records
+    """
+    if isinstance(table, dict):
+        return read_columns(table)
+    return pd.DataFrame(table)
+
+
+def sorted_records(frame, keys):
+    """
+    Records of a table in a defined order, the worker returns the entries of
+    hash maps in arbitrary order
+    """
+    if frame.empty:
+        return []
+    frame = frame.reindex(sorted(frame.columns), axis=1)
+    return frame.sort_values(keys).to_dict("records")
+
+
+def read_dump(dump):
+    """
+    Memory dump as bytes, older builds of the worker return lists of ints
+    """
+    if isinstance(dump, bytes):
+        return dump
+    return bytes(numpy.asarray(dump, numpy.uint8))
+
+
+def canonical(logs):
+    registers = read_table(logs["registerlist"])
+    return {
+        "endpoint": logs["endpoint"],
+        "end_reason": logs["end_reason"],
+        "tbexec": sorted_records(read_table(logs["tbexec"]), ["pos"]),
+        "tbinfo": sorted_records(pd.DataFrame(logs["tbinfo"]), ["id", "size"]),
+        "meminfo": sorted_records(read_table(logs["meminfo"]), ["address", "ins"]),
+        "registerlist": registers.reindex(sorted(registers.columns), axis=1)
+        .astype(numpy.uint64)
+        .values.tolist(),
+        "memdumplist": sorted(
+            (
+                memdump["address"],
+                memdump["len"],
+                [read_dump(dump) for dump in memdump["dumps"]],
+            )
+            for memdump in logs["memdumplist"]
+        ),
+    }
+
+
+def run_single(worker, pregoldenrun_data, fault_lists, config, threads):
+    return [
+        worker.run_unicorn(pregoldenrun_data, faults, config, 0, False)
+        for faults in fault_lists
+    ]
+
+
+def run_reused(worker, pregoldenrun_data, fault_lists, config, threads):
+    emulator = worker.Emulator(pregoldenrun_data, config, 0, False)
+    return [emulator.run(faults) for faults in fault_lists]
+
+
+def run_grouped(worker, pregoldenrun_data, fault_lists, config, threads):
+    emulator = worker.Emulator(pregoldenrun_data, config, 0, False)
+    return emulator.run_group(fault_lists)
+
+
+def run_batched(worker, pregoldenrun_data, fault_lists, config, threads):
+    results = [None] * len(fault_lists)
+    for position, logs in worker.run_unicorn_batch(
+        pregoldenrun_data, fault_lists, config, 0, False, threads
+    ):
+        results[position] = logs
+    return results
+
+
+MODES = {
+    "single": run_single,
+    "reused": run_reused,
+    "grouped": run_grouped,
+    "batched": run_batched,
+}
+
+
+def compare(expected, results):
+    """
+    Indexes of the experiments, whose results differ, with the differing keys
+    """
+    mismatches = {}
+    for i, (a, b) in enumerate(zip(expected, results)):
+        keys = [key for key in a if a[key] != b[key]]
+        if keys:
+            mismatches[i] = keys
+    return mismatches
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "hdf5file", help="Campaign with a backup, written in unicorn mode"
+    )
+    parser.add_argument(
+        "--worker",
+        default=DEFAULT_WORKER,
+        help="Emulation worker to check (default: release build of the tree)",
+    )
+    parser.add_argument(
+        "--reference",
+        help="Emulation worker, whose run_unicorn defines the expected results "
+        "(default: run_unicorn of the checked worker)",
+    )
+    parser.add_argument(
+        "--kernel", help="Firmware ELF file (default: kernel of the backup)"
+    )
+    parser.add_argument(
+        "--experiments",
+        type=int,
+        default=256,
+        help="Number of experiments, 0 for all (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="Threads of the batched mode, 0 for all cores (default: %(default)s)",
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_argument_parser().parse_args()
+
+    [faultlist, config, pregoldenrun_data, _] = read_backup(args.hdf5file, True)
+    pregoldenrun_data["memdumplist"] += read_elf_segments(
+        args.kernel or config["kernel"]
+    )
+    if args.experiments:
+        faultlist = faultlist[: args.experiments]
+    fault_lists = [experiment["faultlist"] for experiment in faultlist]
+
+    worker = load_worker(args.worker)
+    runs = [(mode, worker, run) for mode, run in MODES.items()]
+    if args.reference:
+        runs.insert(0, ("reference", load_worker(args.reference), run_single))
+
+    expected = None
+    results = {}
+    for mode, module, run in runs:
+        t0 = time.perf_counter()
+        logs = run(module, pregoldenrun_data, fault_lists, config, args.threads)
+        duration = time.perf_counter() - t0
+
+        logs = [canonical(experiment) for experiment in logs]
+        if expected is None:
+            expected = logs
+        mismatches = compare(expected, logs)
+        results[mode] = {
+            "seconds": duration,
+            "experiments_per_second": len(fault_lists) / duration,
+            "mismatches": mismatches,
+        }
+        print(
+            f"{mode:>10}: {duration:8.3f} s, "
+            f"{len(fault_lists) / duration:10.1f} experiments/s, "
+            f"{len(mismatches)} differing experiments"
+        )
+        for i, keys in list(mismatches.items())[:10]:
+            print(f"{'':>12}experiment {faultlist[i]['index']}: {', '.join(keys)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "experiments": len(fault_lists),
+                    "results": results,
+                },
+                f,
+                indent=4,
+            )
+
+    sys.exit(any(result["mismatches"] for result in results.values()))
@@ -20,6 +20,7 @@ import pandas
 from tqdm import tqdm
 
 from faultclass import build_filters
+from faultclass import group_instructions_by_tb
 
 logger = logging.getLogger(__name__)
 
@@ -29,19 +30,11 @@ def find_tb_info_row(tb_id, goldenrun_tb_info):
     return idx[0]
 
 
-def allign_fault_to_instruction(address, tbinfo_size, tbinfo_assembler, tbinfo_id):
-    asm_addresses = []
-    # Start searching for instruction addresses
-    split = tbinfo_assembler.split("[ ")
-    for sp in split[1:]:
-        # Find end of address
-        s = sp.split("]")
-        # Convert and append to list
-        asm_addresses.append(int("0x" + s[0].strip(), 0))
-    asm_addresses.append(tbinfo_id + tbinfo_size)
-    for i in range(0, len(asm_addresses) - 1, 1):
-        if address >= asm_addresses[i] and address < asm_addresses[i + 1]:
-            return asm_addresses[i]
+def allign_fault_to_instruction(address, tb_instructions):
+    asm_addresses, asm_sizes = tb_instructions
+    for asm_address, asm_size in zip(asm_addresses, asm_sizes):
+        if address >= asm_address and address < asm_address + asm_size:
+            return asm_address
 
 
 def calculate_lifespan_from_start(
@@ -49,10 +42,15 @@ def calculate_lifespan_from_start(
     fault_address,
     goldenrun_tb_exec,
     goldenrun_tb_info,
+    tb_instructions,
     trigger_occurrences,
 ):
     [idx, instruction_address] = find_fault(
-        fault_address, goldenrun_tb_exec, goldenrun_tb_info, trigger_occurrences
+        fault_address,
+        goldenrun_tb_exec,
+        goldenrun_tb_info,
+        tb_instructions,
+        trigger_occurrences,
     )
     tb_id = goldenrun_tb_exec.at[idx, "tb"]
     lifespan = 0
@@ -73,7 +71,11 @@ def calculate_lifespan_from_start(
 
 
 def find_fault(
-    fault_address, goldenrun_tb_exec, goldenrun_tb_info, trigger_occurrences
+    fault_address,
+    goldenrun_tb_exec,
+    goldenrun_tb_info,
+    tb_instructions,
+    trigger_occurrences,
 ):
     matching_tbs = goldenrun_tb_info.query(
         f"id <= {fault_address} & id + size > {fault_address}"
@@ -86,12 +88,8 @@ def find_fault(
     if trigger_occurrences > len(idx):
         return [-1, 0]
     idx = idx[trigger_occurrences - 1]
-    idtbinfo = find_tb_info_row(goldenrun_tb_exec.at[idx, "tb"], goldenrun_tb_info)
     ins = allign_fault_to_instruction(
-        fault_address,
-        goldenrun_tb_info.at[idtbinfo, "size"],
-        goldenrun_tb_info.at[idtbinfo, "assembler"],
-        goldenrun_tb_info.at[idtbinfo, "id"],
+        fault_address, tb_instructions[goldenrun_tb_exec.at[idx, "tb"]]
     )
     return [idx, ins]
 
@@ -104,11 +102,16 @@ def search_for_fault_location(
     fault_lifespan,
     goldenrun_tb_exec,
     goldenrun_tb_info,
+    tb_instructions,
     tb_start_end,
 ):
     logger.debug(f"Search trigger to fault INSN at 0x{fault_address:08x}")
     [idx, ins] = find_fault(
-        fault_address, goldenrun_tb_exec, goldenrun_tb_info, trigger_occurrences
+        fault_address,
+        goldenrun_tb_exec,
+        goldenrun_tb_info,
+        tb_instructions,
+        trigger_occurrences,
     )
     if idx < 0:
         return [-1, trigger_occurrences, fault_lifespan]
@@ -123,6 +126,7 @@ def search_for_fault_location(
                     fault_address,
                     goldenrun_tb_exec,
                     goldenrun_tb_info,
+                    tb_instructions,
                     trigger_occurrences,
                 )
                 fault_lifespan += lifespan_diff
@@ -205,7 +209,9 @@ def search_for_fault_location(
     return [ins, trigger_hitcounter, fault_lifespan]
 
 
-def calculate_trigger_addresses(fault_list, goldenrun_tb_exec, goldenrun_tb_info):
+def calculate_trigger_addresses(
+    fault_list, goldenrun_tb_exec, goldenrun_tb_info, goldenrun_instructions
+):
     """"""
     logger.info("Calculating trigger addresses")
 
@@ -225,7 +231,8 @@ def calculate_trigger_addresses(fault_list, goldenrun_tb_exec, goldenrun_tb_info
 
     # check every fault list
     cache_dict = dict()
-    lists = build_filters(goldenrun_tb_info)
+    tb_instructions = group_instructions_by_tb(goldenrun_instructions)
+    lists = build_filters(goldenrun_instructions)
     for list in lists:
         list = list.reverse()
     for faults in tqdm(fault_list, desc="Calculating trigger addresses"):
@@ -261,6 +268,7 @@ def calculate_trigger_addresses(fault_list, goldenrun_tb_exec, goldenrun_tb_info
                     fault.lifespan,
                     goldenrun_tb_exec,
                     goldenrun_tb_info,
+                    tb_instructions,
                     tb_start_end,
                 )
             d = dict()
@@ -19,16 +19,21 @@
 import argparse
 import hashlib
 import logging
-from multiprocessing import Manager, Process, Value
+from multiprocessing import Process, Queue, Value
+import os
 from pathlib import Path
 import psutil
+import queue
+import shutil
 import signal
 from statistics import mean
 import subprocess
 import sys
 import tables
+import tempfile
 import time
 
+import numpy
 import pandas as pd
 import prctl
 from tqdm import tqdm
@@ -43,14 +48,25 @@ except ModuleNotFoundError:
 
     pass
 
+from estimator import estimate_campaign
 from faultclass import detect_type, detect_model, Fault, Trigger
+from faultclass import build_filters, build_instruction_map
 from faultclass import python_worker, python_worker_unicorn
 from faultclass import Register
-from hdf5logger import hdf5collector
+from hdf5logger import create_filters, hdf5collector, process_telemetry
+from hdf5logger import TABLE_TYPES, read_assembler
 from goldenrun import run_goldenrun
+from resultqueue import ResultQueue
+from snapshot import create_start_snapshot
+from telemetry import Telemetry
+from util import mem_limit_calc
 
 clogger = logging.getLogger(__name__)
 
+TELEMETRY_REPORT_INTERVAL = 60
+# Maximum number of experiments emulated by one unicorn worker per thread
+UNICORN_BATCH_SIZE = 64
+
 stop_signal_received = Value("i", 0)
 
 
@@ -239,16 +255,6 @@ def build_fault_list(conf_list, combined_faults, ret_faults):
     return ret_int_faults
 
 
-def mem_limit_calc(mem_max, num_worker, queue_depth, time_max):
-    if mem_max > 1500000:
-        mem_estimate = mem_max * num_worker * 1.5 + queue_depth * mem_max
-    else:
-        mem_estimate = 1600000 * num_worker + queue_depth * mem_max
-    time_max = 1 + time_max / 120.0
-    mem_estimate = mem_estimate * time_max
-    return mem_estimate
-
-
 def get_system_ram():
     command = "cat /proc/meminfo"
     ps = subprocess.Popen(
@@ -440,10 +446,9 @@ def read_backup(hdf5_file, unicorn_emulation):
                 address = int(address, 16)
                 size = int(size)
                 address_key = (address << 64) + size
-                if address_key in memdumps:
-                    memdumps[address_key].append(dump.read()[0])
-                else:
-                    memdumps[address_key] = [list(dump.read()[0])]
+                # Kept as uint8 arrays, which are passed to the emulation
+                # worker as buffers
+                memdumps.setdefault(address_key, []).append(dump.read()[0])
 
             backup_pregoldenrun["memdumplist"] = []
             for k, dumps in memdumps.items():
@@ -481,13 +486,16 @@ def read_backup(hdf5_file, unicorn_emulation):
 
         backup_goldenrun["tbinfo"] = [
             {
-                "assembler": tb_info["assembler"].decode("utf-8"),
+                "assembler": assembler,
                 "id": tb_info["identity"],
                 "ins_count": tb_info["ins_count"],
                 "num_exec": tb_info["num_exec"],
                 "size": tb_info["size"],
             }
-            for tb_info in f_in.root.Goldenrun.tbinfo.iterrows()
+            for tb_info, assembler in zip(
+                f_in.root.Goldenrun.tbinfo.iterrows(),
+                read_assembler(f_in, f_in.root.Goldenrun.tbinfo),
+            )
         ]
 
         backup_goldenrun["tbexec"] = [
@@ -495,6 +503,23 @@ def read_backup(hdf5_file, unicorn_emulation):
             for tb_exec in f_in.root.Goldenrun.tbexeclist.iterrows()
         ]
 
+        # Backups created before the instruction map was stored need it to be
+        # rebuilt from tbinfo
+        if "instructions" in f_in.root.Goldenrun:
+            backup_goldenrun["instructions"] = [
+                {
+                    "tb": instruction["tb"],
+                    "address": instruction["address"],
+                    "size": instruction["size"],
+                    "mnemonic": instruction["mnemonic"].decode("utf-8"),
+                }
+                for instruction in f_in.root.Goldenrun.instructions.iterrows()
+            ]
+        else:
+            backup_goldenrun["instructions"] = build_instruction_map(
+                backup_goldenrun["tbinfo"]
+            ).to_dict("records")
+
         if backup_config["mem_info"]:
             backup_goldenrun["meminfo"] = [
                 {
@@ -510,6 +535,21 @@ def read_backup(hdf5_file, unicorn_emulation):
 
         backup_read_registers(backup_goldenrun, f_in.root.Goldenrun)
 
+        # Needed for the delta encoding of the experiment memory dumps
+        backup_goldenrun["memdumplist"] = [
+            {
+                "address": memdump["address"],
+                "len": memdump["length"],
+                "numdumps": memdump["numdumps"],
+                "dumps": f_in.root.Goldenrun.memdumps._f_get_child(
+                    "location_{:08x}_{:d}_{:d}".format(
+                        memdump["address"], memdump["length"], memdump["numdumps"]
+                    )
+                ).read(),
+            }
+            for memdump in f_in.root.Goldenrun.memdumps.memdumps.iterrows()
+        ]
+
         # Process expanded faults
         if (
             f_in.root.Backup.expanded_faults._v_nchildren
@@ -610,7 +650,108 @@ def get_not_simulated_faults(faultlist, simulated_faults):
     return missing_faultlist
 
 
-def controller(
+def read_elf_segments(kernel):
+    """
+    Memory dumps of the loadable segments of the kernel, which unicorn writes to
+    memory in addition to the memory dumps of the pregoldenrun
+    """
+    memdumps = []
+    with open(kernel, "rb") as f:
+        for segment in ELFFile(f).iter_segments():
+            if segment["p_type"] == "PT_LOAD":
+                segment_data = segment.data()
+                memdumps.append(
+                    {
+                        "address": segment["p_vaddr"],
+                        "len": len(segment_data),
+                        "numpdumps": 1,
+                        "dumps": [numpy.frombuffer(segment_data, numpy.uint8)],
+                    }
+                )
+    return memdumps
+
+
+def trigger_position(experiment):
+    """
+    Experiments with a single fault at the same trigger position only differ
+    after the trigger. None for experiments with multiple faults
+    """
+    if len(experiment["faultlist"]) != 1:
+        return None
+    fault = experiment["faultlist"][0]
+    return (fault.trigger.address, fault.trigger.hitcounter, fault.lifespan != 0)
+
+
+def sort_by_trigger_position(faultlist):
+    return sorted(
+        faultlist,
+        key=lambda experiment: (
+            trigger_position(experiment) is None,
+            trigger_position(experiment) or (),
+        ),
+    )
+
+
+def join_logger(p_logger, telemetry, queue_telemetry):
+    """
+    Wait for the logger to finish. The telemetry queue is read meanwhile, as
+    the logger can only exit after its timings are read
+    """
+    if telemetry is None:
+        p_logger.join()
+        return
+    while p_logger.is_alive():
+        telemetry.collect(queue_telemetry)
+        p_logger.join(timeout=0.1)
+
+
+def read_ram_usage(queue_ram_usage, mem_list):
+    for i in range(queue_ram_usage.qsize()):
+        try:
+            mem = queue_ram_usage.get_nowait()
+        except queue.Empty:
+            break
+        mem_list.append(mem)
+
+
+def join_worker(p_worker, telemetry, queue_telemetry, queue_ram_usage, mem_list):
+    """
+    Wait for a worker to finish. Its ram usage and timings are read meanwhile,
+    as the worker can only exit after they are written to the queue pipes
+    """
+    while p_worker.is_alive():
+        read_ram_usage(queue_ram_usage, mem_list)
+        if telemetry is not None:
+            telemetry.collect(queue_telemetry)
+        p_worker.join(timeout=0.1)
+
+
+def write_telemetry(hdf5path, telemetry, compressionlevel, compression):
+    myfilter = create_filters(compressionlevel, compression)["default"]
+    with tables.open_file(hdf5path, "a") as f:
+        if "Telemetry" in f.root:
+            f.root.Telemetry._f_remove(recursive=True)
+        telemetry_group = f.create_group(
+            "/", "Telemetry", "Group containing the latency of each pipeline stage"
+        )
+        process_telemetry(f, telemetry_group, telemetry, myfilter)
+
+
+def get_compression(args):
+    """
+    Return the complib per table type or None if zlib is used for all tables
+    """
+    if args.complib == "zlib" and not args.table_complib:
+        return None
+    return {"default": args.complib, **dict(args.table_complib or [])}
+
+
+def remove_start_snapshot(config_qemu):
+    if "snapshot_image" in config_qemu:
+        shutil.rmtree(Path(config_qemu.pop("snapshot_image")).parent)
+
+
+def run_campaign(
     args,
     hdf5mode,
     faultlist,
@@ -638,11 +779,19 @@ def controller(
     total_start_time = time.time()
 
     hdf5path = args.hdf5file
+    compression = get_compression(args)
+
+    # Results are pickled once by the worker and read directly by the logger.
+    # Results beyond the memory budget are spilled to disk instead of blocking
+    # the workers
+    queue_output = ResultQueue(args.queue_memory * 1024**2, args.spill_dir)
+    queue_ram_usage = Queue()
 
-    m = Manager()
-    m2 = Manager()
-    queue_output = m.Queue()
-    queue_ram_usage = m2.Queue()
+    telemetry = None
+    queue_telemetry = None
+    if args.telemetry:
+        telemetry = Telemetry()
+        queue_telemetry = Queue()
 
     prctl.set_name("Controller")
     prctl.set_proctitle("Python_Controller")
@@ -700,6 +849,20 @@ def controller(
         if not args.append:
             overwrite_faults = True
 
+    if config_qemu.get("start_snapshot", False) and "start" in config_qemu:
+        if unicorn_emulation:
+            clogger.warning("The start point snapshot is not used in Unicorn mode")
+        else:
+            clogger.info("Create start point snapshot")
+            directory = tempfile.mkdtemp(prefix="archie_snapshot_")
+            try:
+                config_qemu["snapshot_image"] = create_start_snapshot(
+                    config_qemu, directory
+                )
+            except BaseException:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+
     if goldenrun:
         [
             config_qemu["max_instruction_count"],
@@ -737,34 +900,48 @@ def controller(
             clogger.info("All faults are already simulated")
 
     if unicorn_emulation:
-        elffile = ELFFile(open(config_qemu["kernel"], "rb"))
-        for segment in elffile.iter_segments():
-            if segment["p_type"] == "PT_LOAD":
-                segment_data = segment.data()
-                pregoldenrun_data["memdumplist"].append(
-                    {
-                        "address": segment["p_vaddr"],
-                        "len": len(segment_data),
-                        "numpdumps": 1,
-                        "dumps": [list(segment_data)],
-                    }
-                )
+        pregoldenrun_data["memdumplist"] += read_elf_segments(config_qemu["kernel"])
 
-    p_logger = Process(
-        target=logger,
-        args=(
-            hdf5path,
-            hdf5mode,
-            queue_output,
-            len(faultlist),
-            stop_signal_received,
-            compressionlevel,
-            logger_postprocess,
-            log_config,
-            log_goldenrun,
-            overwrite_faults,
-        ),
+    # In estimate mode only the goldenrun and backup are logged, the faults are
+    # sampled after the logger finished
+    estimate_faultlist = None
+    if args.estimate:
+        estimate_faultlist = faultlist
+        faultlist = []
+        overwrite_faults = False
+
+    if unicorn_emulation:
+        # Unicorn emulates experiments with the same trigger position once up
+        # to the trigger, so they are scheduled together
+        faultlist = sort_by_trigger_position(faultlist)
+        unicorn_threads = config_qemu.get("unicorn_threads", 1) or os.cpu_count()
+        unicorn_batch_size = max(
+            1,
+            min(UNICORN_BATCH_SIZE * unicorn_threads, len(faultlist) // num_workers),
+        )
+
+    logger_args = (
+        hdf5path,
+        hdf5mode,
+        queue_output,
+        len(faultlist),
+        stop_signal_received,
+        compressionlevel,
+        logger_postprocess,
+        log_config,
+        log_goldenrun,
+        overwrite_faults,
     )
+    # Only passed if used, so that custom loggers do not need to support them
+    logger_kwargs = {}
+    if queue_telemetry is not None:
+        logger_kwargs["queue_telemetry"] = queue_telemetry
+    if compression is not None:
+        logger_kwargs["compression"] = compression
+    if args.dedup_memdumps:
+        logger_kwargs["dedup_memdumps"] = True
+
+    p_logger = Process(target=logger, args=logger_args, kwargs=logger_kwargs)
 
     p_logger.start()
 
@@ -785,6 +962,7 @@ def controller(
     keywords = [
         "tbexec",
         "tbinfo",
+        "instructions",
         "meminfo",
         "armregisters",
         "riscvregisters",
@@ -794,18 +972,23 @@ def controller(
         if keyword not in goldenrun_data:
             continue
         goldenrun_data[keyword] = pd.DataFrame(goldenrun_data[keyword])
+    # The filters of filter_tb only depend on the goldenrun, so they are built
+    # once for all workers
+    if "instructions" in goldenrun_data:
+        goldenrun_data["filters"] = build_filters(goldenrun_data["instructions"])
 
     # Handlers are used for a graceful exit, in case of a signal
     register_signal_handlers()
 
     itter = 0
+    telemetry_report_time = time.time()
     while 1:
         if stop_signal_received.value == 1:
             clogger.info(
                 "Stop signal received, finishing the current write operation..."
             )
 
-            p_logger.join()
+            join_logger(p_logger, telemetry, queue_telemetry)
 
             for p in p_list:
                 p["process"].kill()
@@ -819,29 +1002,33 @@ def controller(
         if (
             (
                 not args.enable_ram_mgmt
-                or mem_limit_calc(mem_max, len(p_list), queue_output.qsize(), time_max)
+                or mem_limit_calc(
+                    mem_max, len(p_list), queue_output.memory_usage() / 1024, time_max
+                )
                 < max_ram
             )
             and len(p_list) < num_workers
             and itter < len(faultlist)
-            and queue_output.qsize() < queuedepth
+            and (queuedepth is None or queue_output.qsize() < queuedepth)
         ):
             faults = faultlist[itter]
-            itter += 1
+            num_experiments = 1
 
             if unicorn_emulation:
+                experiments = faultlist[itter : itter + unicorn_batch_size]
+                num_experiments = len(experiments)
                 p = Process(
                     name=f"worker_{faults['index']}",
                     target=python_worker_unicorn,
                     args=(
-                        faults["faultlist"],
+                        experiments,
                         config_qemu,
-                        faults["index"],
                         queue_output,
                         engine_output,
                         pregoldenrun_data,
                         goldenrun_data,
                         True,
+                        queue_telemetry,
                     ),
                 )
             else:
@@ -859,11 +1046,23 @@ def controller(
                         queue_ram_usage,
                         qemu_pre,
                         qemu_post,
+                        queue_telemetry,
                     ),
                 )
+            itter += num_experiments
 
+            spawn_time = time.perf_counter()
             p.start()
-            p_list.append({"process": p, "start_time": time.time(), "faults": faults})
+            if telemetry is not None:
+                telemetry.add("spawn", time.perf_counter() - spawn_time)
+            p_list.append(
+                {
+                    "process": p,
+                    "start_time": time.time(),
+                    "faults": faults,
+                    "timeout": config_qemu["timeout"] * num_experiments,
+                }
+            )
             clogger.debug(f"Started worker {faults['index']}. Running: {len(p_list)}.")
             clogger.debug(f"Fault address: {faults['faultlist'][0].address}")
             clogger.debug(
@@ -872,9 +1071,13 @@ def controller(
         else:
             time.sleep(0.005)  # wait for workers to finish, scheduler can wait
 
-        for i in range(queue_ram_usage.qsize()):
-            mem = queue_ram_usage.get_nowait()
-            mem_list.append(mem)
+        read_ram_usage(queue_ram_usage, mem_list)
+
+        if telemetry is not None:
+            telemetry.collect(queue_telemetry)
+            if time.time() - telemetry_report_time > TELEMETRY_REPORT_INTERVAL:
+                telemetry_report_time = time.time()
+                clogger.info(telemetry.summary())
 
         if len(mem_list) > 6 * num_workers + 4:
             del mem_list[0 : len(mem_list) - 6 * num_workers + 4]
@@ -894,7 +1097,7 @@ def controller(
             # If gdb is used the timeout is not applicable
             if (
                 p["process"].is_alive()
-                and (time.time() - p["start_time"]) > config_qemu["timeout"]
+                and (time.time() - p["start_time"]) > p["timeout"]
                 and not config_qemu.get("gdb", False)
             ):
                 clogger.warning(f"Experiment {p['faults']['index']} ran into timeout")
@@ -913,7 +1116,9 @@ def controller(
                 else:
                     clogger.debug(f"{qemu_thread_name} not found to kill")
                 # Wait for worker process terminates
-                p["process"].join()
+                join_worker(
+                    p["process"], telemetry, queue_telemetry, queue_ram_usage, mem_list
+                )
 
             if p["process"].is_alive() is False:
                 # Recalculate moving average
@@ -925,9 +1130,34 @@ def controller(
                 p_list.pop(i)
 
     clogger.debug("{} experiments remaining in queue".format(queue_output.qsize()))
-    p_logger.join()
+    join_logger(p_logger, telemetry, queue_telemetry)
+    queue_output.close()
     clogger.debug("Done with qemu and logger, controller exit")
 
+    if telemetry is not None:
+        telemetry.collect(queue_telemetry)
+        clogger.info(telemetry.summary())
+        write_telemetry(hdf5path, telemetry, compressionlevel, compression)
+
+    if estimate_faultlist is not None and stop_signal_received.value == 0:
+        estimate_campaign(
+            estimate_faultlist,
+            config_qemu,
+            num_workers,
+            args.queue_memory * 1024**2,
+            compressionlevel,
+            args.estimate,
+            get_system_ram(),
+            engine_output,
+            pregoldenrun_data,
+            goldenrun_data,
+            qemu_pre,
+            qemu_post,
+            unicorn_emulation,
+            compression,
+        )
+        return config_qemu
+
     total_runtime = time.time() - total_start_time
     total_runtime_hh_mm_ss = time.strftime("%H:%M:%S", time.gmtime(total_runtime))
     clogger.info(f"Took {total_runtime_hh_mm_ss} to complete all experiments")
@@ -938,6 +1168,65 @@ def controller(
     return config_qemu
 
 
+def controller(
+    args,
+    hdf5mode,
+    faultlist,
+    config_qemu,
+    num_workers,
+    queuedepth,
+    compressionlevel,
+    missing_only,
+    goldenrun_only,
+    engine_output,
+    goldenrun=True,
+    logger=hdf5collector,
+    qemu_pre=None,
+    qemu_post=None,
+    logger_postprocess=None,
+    unicorn_emulation=False,
+):
+    """
+    Run the campaign with run_campaign. The start point snapshot is removed
+    afterwards, also if the campaign is aborted by an exception
+    """
+    try:
+        return run_campaign(
+            args,
+            hdf5mode,
+            faultlist,
+            config_qemu,
+            num_workers,
+            queuedepth,
+            compressionlevel,
+            missing_only,
+            goldenrun_only,
+            engine_output,
+            goldenrun,
+            logger,
+            qemu_pre,
+            qemu_post,
+            logger_postprocess,
+            unicorn_emulation,
+        )
+    finally:
+        remove_start_snapshot(config_qemu)
+
+
+def parse_table_complib(value):
+    table_type, _, complib = value.partition("=")
+    if table_type not in TABLE_TYPES:
+        raise argparse.ArgumentTypeError(
+            f"unknown table type {table_type}, choose from {', '.join(TABLE_TYPES)}"
+        )
+    if complib not in tables.filters.all_complibs:
+        raise argparse.ArgumentTypeError(
+            f"unknown complib {complib}, choose from "
+            f"{', '.join(tables.filters.all_complibs)}"
+        )
+    return table_type, complib
+
+
 def get_argument_parser():
     parser = argparse.ArgumentParser(
         description="Read args for qemu fault injection tool"
@@ -980,8 +1269,20 @@ def get_argument_parser():
     )
     parser.add_argument(
         "--queuedepth",
-        help="Maximum number of elements in queue before scheduler blocks start of new workers. This allows to control the memory usage, default is 15",
+        help="Deprecated, use --queue-memory. Maximum number of elements in queue before scheduler blocks start of new workers. Default no limit",
+        type=int,
+        required=False,
+    )
+    parser.add_argument(
+        "--queue-memory",
+        help="Memory in MiB for results waiting to be written to the hdf5 file. Further results are spilled to disk. Default 1024",
         type=int,
+        default=1024,
+        required=False,
+    )
+    parser.add_argument(
+        "--spill-dir",
+        help="Directory for results spilled to disk. Default is the system temporary directory",
         required=False,
     )
     parser.add_argument(
@@ -991,6 +1292,26 @@ def get_argument_parser():
         type=int,
         required=False,
     )
+    parser.add_argument(
+        "--complib",
+        help="Compression library of the hdf5 tables, e.g. zlib, blosc:lz4 or blosc2:zstd. Default zlib",
+        choices=tables.filters.all_complibs,
+        default="zlib",
+        required=False,
+    )
+    parser.add_argument(
+        "--table-complib",
+        help=f"Compression library for one table type, given as TYPE=COMPLIB. Can be used multiple times. Types: {', '.join(TABLE_TYPES)}",
+        type=parse_table_complib,
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--dedup-memdumps",
+        action="store_true",
+        help="Store each distinct memory dump only once in the hdf5 file, experiments reference the dumps by id",
+        required=False,
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -1009,6 +1330,19 @@ def get_argument_parser():
         action="store_true",
         required=False,
     )
+    parser.add_argument(
+        "--delta-encoding",
+        help="Store memory and register dumps of the experiments as difference to the goldenrun",
+        action="store_true",
+        required=False,
+    )
+    parser.add_argument(
+        "--start-snapshot",
+        help="Boot to the start point once, save a VM snapshot and resume all "
+        "experiments from it instead of booting each of them",
+        action="store_true",
+        required=False,
+    )
     parser.add_argument(
         "--overwrite",
         "-o",
@@ -1034,12 +1368,37 @@ def get_argument_parser():
         help="Use with caution, may lead to drastic performance decrease",
         action="store_true",
     )
+    parser.add_argument(
+        "--estimate",
+        help="Only run the goldenrun and a stratified sample of SAMPLES experiments "
+        "(default 20) to estimate runtime, output size and memory usage of the "
+        "campaign. The sample is not stored in the hdf5 file",
+        type=int,
+        nargs="?",
+        const=20,
+        metavar="SAMPLES",
+        required=False,
+    )
+    parser.add_argument(
+        "--telemetry",
+        action="store_true",
+        help="Measure the latency of each stage of the experiment pipeline, report it "
+        "periodically and store it in the Telemetry group of the hdf5 file",
+        required=False,
+    )
     parser.add_argument(
         "--unicorn",
         action="store_true",
         help="Enables emulation through unicorn engine instead of QEMU",
         required=False,
     )
+    parser.add_argument(
+        "--unicorn-threads",
+        type=int,
+        help="Number of emulation threads of each worker in unicorn mode, 0 for all "
+        "cores. Default 1",
+        required=False,
+    )
     return parser
 
 
@@ -1061,8 +1420,8 @@ def process_arguments(args):
         parguments["num_workers"] = 1
 
     parguments["queuedepth"] = args.queuedepth
-    if args.queuedepth is None:
-        parguments["queuedepth"] = 15
+    if args.queuedepth is not None:
+        clogger.warning("--queuedepth is deprecated, use --queue-memory instead")
 
     parguments["compressionlevel"] = args.compressionlevel
     if args.compressionlevel is None:
@@ -1134,10 +1493,19 @@ def process_arguments(args):
     qemu_conf["mem_info"] = faultlist.get("mem_info", False)
     qemu_conf["ring_buffer"] = faultlist.get("ring_buffer", True)
     qemu_conf["timeout"] = faultlist.get("timeout", 1200)
+    qemu_conf["delta_encoding"] = faultlist.get("delta_encoding", False)
+    qemu_conf["start_snapshot"] = faultlist.get("start_snapshot", False)
+    qemu_conf["unicorn_threads"] = faultlist.get("unicorn_threads", 1)
 
     # Command line argument takes precedence
     if args.disable_ring_buffer:
         qemu_conf["ring_buffer"] = False
+    if args.delta_encoding:
+        qemu_conf["delta_encoding"] = True
+    if args.start_snapshot:
+        qemu_conf["start_snapshot"] = True
+    if args.unicorn_threads is not None:
+        qemu_conf["unicorn_threads"] = args.unicorn_threads
 
     parguments["qemu_conf"] = qemu_conf
 
@@ -1,5 +1,4 @@
 use capstone::{prelude::BuildsCapstone, prelude::BuildsCapstoneExtraMode, Capstone};
-use pyo3::types::PyDict;
 use std::collections::HashMap;
 use std::sync::RwLockWriteGuard;
 use unicorn_engine::{
@@ -109,9 +108,9 @@ pub enum Architecture {
 }
 
 pub trait ArchitectureDependentOperations {
-    fn initialize_unicorn(&self) -> Unicorn<'_, ()>;
+    fn initialize_unicorn(&self) -> Unicorn<'static, ()>;
     fn initialize_cs_engine(&self) -> Capstone;
-    fn initialize_registers(&self, uc: &mut Unicorn<()>, registerdump: &PyDict);
+    fn initialize_registers(&self, uc: &mut Unicorn<()>, registerdump: &HashMap<String, u64>);
     fn dump_registers(
         &self,
         uc: &mut Unicorn<()>,
@@ -129,7 +128,7 @@ pub struct ArchitectureDependentOperator {
 }
 
 impl ArchitectureDependentOperations for ArchitectureDependentOperator {
-    fn initialize_unicorn(self: &ArchitectureDependentOperator) -> Unicorn<'_, ()> {
+    fn initialize_unicorn(self: &ArchitectureDependentOperator) -> Unicorn<'static, ()> {
         match self.architecture {
             Architecture::Aarch64 => {
                 Unicorn::new(Arch::ARM64, Mode::ARM).expect("failed to initialize Unicorn instance")
@@ -145,7 +144,7 @@ impl ArchitectureDependentOperations for ArchitectureDependentOperator {
     fn initialize_registers(
         self: &ArchitectureDependentOperator,
         uc: &mut Unicorn<()>,
-        registerdump: &PyDict,
+        registerdump: &HashMap<String, u64>,
     ) {
         let registers = match self.architecture {
             Architecture::Aarch64 => AARCH64_REGISTERS,
@@ -153,11 +152,8 @@ impl ArchitectureDependentOperations for ArchitectureDependentOperator {
             Architecture::Riscv64 => RISCV_REGISTERS,
         };
         for (name, reg) in registers {
-            uc.reg_write(
-                *reg,
-                registerdump.get_item(*name).unwrap().extract().unwrap(),
-            )
-            .unwrap();
+            uc.reg_write(*reg, *registerdump.get(*name).unwrap())
+                .unwrap();
         }
     }
 
@@ -0,0 +1,160 @@
+use log::warn;
+use std::collections::HashMap;
+use std::rc::Rc;
+use std::sync::RwLockWriteGuard;
+use unicorn_engine::{Context, Unicorn};
+
+use crate::hooks::add_single_step_hook;
+use crate::structs::{Logs, MemorySnapshots, State};
+
+// Granularity of the memory snapshots. Mappings are aligned to it on all architectures
+const PAGE_SIZE: u64 = 0x400;
+
+/// Save the pages touched by a write of size bytes at address to all memory snapshots, which do
+/// not hold them yet. Has to be called before the memory is written
+pub fn save_pages(
+    uc: &mut Unicorn<'_, ()>,
+    address: u64,
+    size: usize,
+    mut snapshots: RwLockWriteGuard<MemorySnapshots>,
+) {
+    if snapshots.is_empty() || size == 0 {
+        return;
+    }
+
+    let first_page = address & !(PAGE_SIZE - 1);
+    let last_page = address.saturating_add(size as u64 - 1) & !(PAGE_SIZE - 1);
+    for page in (first_page..=last_page).step_by(PAGE_SIZE as usize) {
+        if snapshots.iter().all(|pages| pages.contains_key(&page)) {
+            continue;
+        }
+        match uc.mem_read_as_vec(page, PAGE_SIZE as usize) {
+            Ok(data) => {
+                for pages in snapshots.iter_mut() {
+                    pages.entry(page).or_insert_with(|| data.clone());
+                }
+            }
+            Err(_) => warn!("Failed saving page 0x{page:x} to the memory snapshot"),
+        }
+    }
+}
+
+/// Write back the pages changed since the memory snapshot level was taken. Newer snapshots are
+/// dropped, the snapshot itself stays active
+pub fn restore_pages(
+    uc: &mut Unicorn<'_, ()>,
+    mut snapshots: RwLockWriteGuard<MemorySnapshots>,
+    level: usize,
+) {
+    let restored = snapshots.split_off(level);
+    // Newest first, so that the content of the oldest snapshot is written last
+    for pages in restored.iter().rev() {
+        for (page, data) in pages {
+            uc.mem_write(*page, data.as_slice())
+                .expect("failed restoring memory page");
+            // Translated code of the page is stale now
+            uc.ctl_remove_cache(*page, *page + data.len() as u64)
+                .unwrap();
+        }
+    }
+    snapshots.push(HashMap::new());
+}
+
+/// Emulation state at the start point or at the trigger of a fault, shared by all experiments
+/// emulated from there
+pub struct Checkpoint {
+    context: Context,
+    memory_level: usize,
+    last_tbid: u64,
+    last_tb_size: u32,
+    tbcounter: u64,
+    endpoints: HashMap<u64, u32>,
+    instruction_count: u64,
+    single_step: bool,
+    logs: Logs,
+}
+
+impl Checkpoint {
+    /// Save the current state and start a memory snapshot. The emulation has to be stopped
+    pub fn save(uc: &mut Unicorn<'_, ()>, state: &Rc<State>) -> Checkpoint {
+        let mut snapshots = state.memory_snapshots.write().unwrap();
+        let memory_level = snapshots.len();
+        snapshots.push(HashMap::new());
+
+        Checkpoint {
+            context: uc.context_init().expect("failed saving the CPU context"),
+            memory_level,
+            last_tbid: *state.last_tbid.read().unwrap(),
+            last_tb_size: *state.last_tb_size.read().unwrap(),
+            tbcounter: *state.tbcounter.read().unwrap(),
+            endpoints: state.endpoints.read().unwrap().clone(),
+            instruction_count: *state.instruction_count.read().unwrap(),
+            single_step: state.single_step_hook_handle.read().unwrap().is_some(),
+            logs: state.logs.clone(),
+        }
+    }
+
+    /// Number of instructions executed up to the checkpoint taken before the instruction at
+    /// address. Without single stepping, the block hook already counted the whole block
+    /// containing address, although only its instructions before address were executed
+    pub fn executed_instructions(
+        &self,
+        uc: &mut Unicorn<'_, ()>,
+        state: &Rc<State>,
+        address: u64,
+    ) -> usize {
+        let tbinfo = self.logs.tbinfo.read().unwrap();
+        let mut count: usize = tbinfo
+            .values()
+            .map(|tb| tb.ins_count as usize * tb.num_exec as usize)
+            .sum();
+
+        if self.single_step || address < self.last_tbid {
+            return count;
+        }
+        if let Some(tb) = tbinfo.get(&(self.last_tbid, self.last_tb_size as usize)) {
+            let code = uc
+                .mem_read_as_vec(self.last_tbid, (address - self.last_tbid) as usize)
+                .unwrap();
+            let executed = state
+                .cs_engine
+                .disasm_all(code.as_slice(), self.last_tbid)
+                .unwrap()
+                .len();
+            count -= (tb.ins_count as usize).saturating_sub(executed);
+        }
+        count
+    }
+
+    /// Reset the engine and the state to the checkpoint. The faults and the checkpoint mode are
+    /// left to the caller
+    pub fn restore(&self, uc: &mut Unicorn<'_, ()>, state: &Rc<State>) {
+        uc.context_restore(&self.context)
+            .expect("failed restoring the CPU context");
+        restore_pages(
+            uc,
+            state.memory_snapshots.write().unwrap(),
+            self.memory_level,
+        );
+
+        *state.last_tbid.write().unwrap() = self.last_tbid;
+        *state.last_tb_size.write().unwrap() = self.last_tb_size;
+        *state.reenter_address.write().unwrap() = None;
+        *state.tbcounter.write().unwrap() = self.tbcounter;
+        *state.endpoints.write().unwrap() = self.endpoints.clone();
+        state.live_faults.write().unwrap().clear();
+        *state.instruction_count.write().unwrap() = self.instruction_count;
+        state.logs.restore(&self.logs);
+
+        let mut single_step_hook_handle = state.single_step_hook_handle.write().unwrap();
+        match (self.single_step, *single_step_hook_handle) {
+            (true, None) => *single_step_hook_handle = Some(add_single_step_hook(uc, state)),
+            (false, Some(handle)) => {
+                uc.remove_hook(handle)
+                    .expect("failed removing single step hook");
+                *single_step_hook_handle = None;
+            }
+            _ => {}
+        }
+    }
+}
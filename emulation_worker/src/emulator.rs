@@ -0,0 +1,233 @@
+use log::{debug, error, info, warn};
+use std::rc::Rc;
+use std::time::{Duration, Instant};
+
+use unicorn_engine::unicorn_const::Permission;
+use unicorn_engine::{UcHookId, Unicorn};
+
+use crate::architecture::ArchitectureDependentOperations;
+use crate::checkpoint::Checkpoint;
+use crate::hooks::{initialize_fault_hook, initialize_hooks};
+use crate::structs::{CheckpointMode, Fault, Logs, State};
+use crate::Setup;
+
+/// Emulate from address until an endpoint or the instruction limit count is reached. Re-entering
+/// after an instruction fault restarts the limit with reenter_count
+fn emulate(
+    emu: &mut Unicorn<'_, ()>,
+    state_rc: &Rc<State>,
+    address: u64,
+    count: usize,
+    reenter_count: usize,
+) {
+    emu.emu_start(address, 0, 0, count)
+        .unwrap_or_else(|_| error!("failed to emulate code at 0x{:x}", emu.pc_read().unwrap()));
+
+    // Re-enter if a fault hook stopped emulation early to invalidate and replay the TB.
+    loop {
+        let reenter = state_rc.reenter_address.read().unwrap();
+        if let Some(addr) = *reenter {
+            drop(reenter);
+            *state_rc.reenter_address.write().unwrap() = None;
+            let thumb_bit = state_rc.arch_operator.get_thumb_bit(emu);
+            let reenter_addr = addr | thumb_bit;
+            info!("Re-entering emulation at 0x{:x}", reenter_addr);
+            emu.emu_start(reenter_addr, 0, 0, reenter_count)
+                .unwrap_or_else(|_| {
+                    error!("failed to emulate code at 0x{:x}", emu.pc_read().unwrap())
+                });
+        } else {
+            break;
+        }
+    }
+}
+
+fn dump_final_registers(emu: &mut Unicorn<'_, ()>, state_rc: &Rc<State>) {
+    state_rc.arch_operator.dump_registers(
+        emu,
+        state_rc.logs.registerlist.write().unwrap(),
+        *state_rc.tbcounter.read().unwrap(),
+    );
+}
+
+/// Unicorn engine holding the registers and memory of the pregoldenrun, which is reused for
+/// many experiments. Mappings, Capstone and the hooks are set up once, between experiments only
+/// the dirty pages and the CPU context are reset to the start point
+pub struct Emulator {
+    emu: Unicorn<'static, ()>,
+    state: Rc<State>,
+    start: Checkpoint,
+    start_address: u64,
+    max_instruction_count: usize,
+    fault_hooks: Vec<UcHookId>,
+}
+
+impl Emulator {
+    pub fn new(setup: &Setup) -> Emulator {
+        let arch_operator = &setup.arch_operator;
+        let mut emu = arch_operator.initialize_unicorn();
+
+        arch_operator.initialize_registers(&mut emu, &setup.registers);
+
+        for &(address, size) in &setup.memmaps {
+            debug!(
+                "Mapping memory at 0x{:x} size 0x{:x}",
+                address & (u64::MAX ^ 0xfff),
+                usize::max(size, 0x1000)
+            );
+            match emu.mem_map(
+                address & (u64::MAX ^ 0xfff),
+                usize::max(size, 0x1000),
+                Permission::ALL,
+            ) {
+                Ok(()) => {}
+                Err(unicorn_engine::unicorn_const::uc_error::MAP) => {
+                    warn!("Memory space is already mapped. Ignoring...")
+                }
+                Err(unicorn_engine::unicorn_const::uc_error::NOMEM) => {
+                    warn!("Memory space too big, cannot allocate. Ignoring...")
+                }
+                Err(err) => panic!("failed mapping memory: {err:?}"),
+            }
+        }
+
+        for (address, dump) in &setup.memdumps {
+            debug!("writing {:?} bytes to 0x{:x}", dump.len(), address);
+
+            emu.mem_write(*address, dump.as_slice())
+                .unwrap_or_else(|_| error!("failed to write dumped data at 0x{:X}", address));
+        }
+
+        let state = Rc::new(State::new(arch_operator));
+        initialize_hooks(&mut emu, &state, &setup.endpoints, &setup.memorydump)
+            .expect("failed initializing hooks");
+
+        // Memory snapshot level 0, holding the pages written since the start point
+        let start = Checkpoint::save(&mut emu, &state);
+        let start_address = setup.start_address | arch_operator.get_thumb_bit(&mut emu);
+
+        Emulator {
+            emu,
+            state,
+            start,
+            start_address,
+            max_instruction_count: setup.max_instruction_count,
+            fault_hooks: Vec::new(),
+        }
+    }
+
+    /// Reset the engine to the start point and replace the faults of the previous experiment
+    fn reset(&mut self, faults: &[Fault]) {
+        self.start.restore(&mut self.emu, &self.state);
+        *self.state.checkpoint_mode.write().unwrap() = CheckpointMode::Disabled;
+
+        for hook in self.fault_hooks.drain(..) {
+            self.emu
+                .remove_hook(hook)
+                .expect("failed removing fault hook");
+        }
+        self.state.faults.write().unwrap().clear();
+        self.fault_hooks = initialize_fault_hook(&mut self.emu, &self.state, faults)
+            .expect("failed initializing fault hooks");
+    }
+
+    /// Logs of the finished experiment, runtime is its emulation time
+    fn finish(&mut self, runtime: Duration) -> Logs {
+        dump_final_registers(&mut self.emu, &self.state);
+        info!("Finished emulation");
+        *self.state.logs.runtime.write().unwrap() = runtime;
+        self.state.logs.take()
+    }
+
+    pub fn run(&mut self, faults: &[Fault]) -> Logs {
+        let start = Instant::now();
+        self.reset(faults);
+
+        info!("Starting emulation at 0x{:x}", self.start_address);
+        emulate(
+            &mut self.emu,
+            &self.state,
+            self.start_address,
+            self.max_instruction_count,
+            self.max_instruction_count,
+        );
+        self.finish(start.elapsed())
+    }
+
+    /// Run a group of experiments and report the logs of each. Experiments with the same
+    /// trigger position are emulated once up to the trigger and resumed from this checkpoint. The
+    /// runtime of each experiment includes an equal share of the emulation up to the trigger
+    pub fn run_group(
+        &mut self,
+        fault_lists: &[Vec<Fault>],
+        group: &[usize],
+        report: &mut dyn FnMut(usize, Logs),
+    ) {
+        if group.len() == 1 {
+            report(group[0], self.run(&fault_lists[group[0]]));
+            return;
+        }
+
+        let start = Instant::now();
+        self.reset(&fault_lists[group[0]]);
+        info!(
+            "Starting emulation at 0x{:x} for {} experiments",
+            self.start_address,
+            group.len()
+        );
+        *self.state.checkpoint_mode.write().unwrap() = CheckpointMode::Requested;
+        emulate(
+            &mut self.emu,
+            &self.state,
+            self.start_address,
+            self.max_instruction_count,
+            self.max_instruction_count,
+        );
+
+        if *self.state.checkpoint_mode.read().unwrap() != CheckpointMode::Reached {
+            // The trigger is not reached, so none of the faults is applied
+            dump_final_registers(&mut self.emu, &self.state);
+            info!("Finished emulation without reaching the trigger");
+            *self.state.logs.runtime.write().unwrap() = start.elapsed() / group.len() as u32;
+            let logs = self.state.logs.take();
+            for &i in group {
+                report(i, logs.clone());
+            }
+            return;
+        }
+        // Memory snapshot level 1, dropped by the next reset
+        let checkpoint = Checkpoint::save(&mut self.emu, &self.state);
+        // The remaining budget of an experiment run from the start point at the trigger, so that
+        // grouped and ungrouped runs stop at the same instruction
+        let trigger = fault_lists[group[0]][0].trigger.address;
+        let executed = checkpoint.executed_instructions(&mut self.emu, &self.state, trigger);
+        let count = usize::max(self.max_instruction_count.saturating_sub(executed), 1);
+        let shared_runtime = start.elapsed() / group.len() as u32;
+
+        for &i in group {
+            let resume = Instant::now();
+            checkpoint.restore(&mut self.emu, &self.state);
+            *self.state.checkpoint_mode.write().unwrap() = CheckpointMode::Resumed;
+
+            let mut fault = fault_lists[i][0];
+            fault.trigger.hitcounter = 1;
+            self.state
+                .faults
+                .write()
+                .unwrap()
+                .insert(fault.trigger.address, fault);
+
+            let address =
+                fault.trigger.address | self.state.arch_operator.get_thumb_bit(&mut self.emu);
+            info!("Resuming emulation at 0x{:x}", address);
+            emulate(
+                &mut self.emu,
+                &self.state,
+                address,
+                count,
+                self.max_instruction_count,
+            );
+            report(i, self.finish(shared_runtime + resume.elapsed()));
+        }
+    }
+}
@@ -1,16 +1,26 @@
 use log::{debug, info};
 use num::{BigUint, ToPrimitive};
-use pyo3::types::{PyDict, PyList};
-use std::{collections::HashMap, io, rc::Rc};
+use std::{io, rc::Rc};
 use unicorn_engine::unicorn_const::{HookType, MemType};
-use unicorn_engine::Unicorn;
+use unicorn_engine::{UcHookId, Unicorn};
 
+use crate::checkpoint::save_pages;
+use crate::structs::CheckpointMode;
 use crate::{ArchitectureDependentOperations, Fault, FaultType, MemInfo, State};
 
 mod util;
 use util::{apply_model, calculate_fault_size, dump_memory, log_tb_exec, log_tb_info, undo_faults};
 
 fn block_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, size: u32, state: &Rc<State>) {
+    {
+        let mut checkpoint_mode = state.checkpoint_mode.write().unwrap();
+        if *checkpoint_mode == CheckpointMode::Resumed {
+            // Remainder of the block interrupted at the checkpoint, which is already logged
+            *checkpoint_mode = CheckpointMode::Disabled;
+            return;
+        }
+    }
+
     *state.last_tbid.write().unwrap() = address;
     *state.last_tb_size.write().unwrap() = size;
     *state.tbcounter.write().unwrap() += 1;
@@ -41,15 +51,7 @@ fn block_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, size: u32, state: &Rc<S
             && fault.trigger.address >= address
             && fault.trigger.address <= (address + size as u64)
         {
-            let state_rc = Rc::clone(state);
-            let single_step_hook_closure =
-                move |uc: &mut Unicorn<'_, ()>, address: u64, size: u32| {
-                    single_step_hook_cb(uc, address, size, &state_rc);
-                };
-            *single_step_hook_handle = Some(
-                uc.add_code_hook(u64::MIN, u64::MAX, single_step_hook_closure)
-                    .unwrap(),
-            );
+            *single_step_hook_handle = Some(add_single_step_hook(uc, state));
             return;
         }
     }
@@ -65,8 +67,7 @@ fn end_hook_cb(
     address: u64,
     size: u32,
     state: &Rc<State>,
-    first_endpoint: u64,
-    memorydump: &Vec<HashMap<&str, u64>>,
+    memorydump: &[(u64, u32)],
 ) {
     let mut endpoints = state.endpoints.write().unwrap();
 
@@ -79,6 +80,7 @@ fn end_hook_cb(
         *counter -= 1;
     } else {
         let mut endpoint = state.logs.endpoint.write().unwrap();
+        let first_endpoint = *state.first_endpoint.read().unwrap();
         *endpoint = (address == first_endpoint, address, 1);
         info!("Reached endpoint at 0x{address:x}");
 
@@ -89,11 +91,11 @@ fn end_hook_cb(
             single_step_hook_cb(uc, address, size, state);
         }
 
-        for dump_info in memorydump {
+        for (dump_address, length) in memorydump {
             dump_memory(
                 uc,
-                *(*dump_info).get("address").unwrap(),
-                *(*dump_info).get("length").unwrap() as u32,
+                *dump_address,
+                *length,
                 state.logs.memdumps.write().unwrap(),
             );
         }
@@ -103,6 +105,15 @@ fn end_hook_cb(
     }
 }
 
+pub fn add_single_step_hook(uc: &mut Unicorn<'_, ()>, state: &Rc<State>) -> UcHookId {
+    let state_rc = Rc::clone(state);
+    let single_step_hook_closure = move |uc: &mut Unicorn<'_, ()>, address: u64, size: u32| {
+        single_step_hook_cb(uc, address, size, &state_rc);
+    };
+    uc.add_code_hook(u64::MIN, u64::MAX, single_step_hook_closure)
+        .unwrap()
+}
+
 fn single_step_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, size: u32, state: &Rc<State>) {
     debug!(
         "Single step\taddr 0x{:x}\tinstructions {:?}",
@@ -115,6 +126,7 @@ fn single_step_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, size: u32, state:
         *instruction_count,
         state.faults.read().unwrap(),
         state.live_faults.write().unwrap(),
+        state.memory_snapshots.write().unwrap(),
     );
 
     if let Some(fault) = undone_fault {
@@ -150,6 +162,10 @@ fn mem_hook_cb(
 ) -> bool {
     let pc = uc.pc_read().unwrap();
 
+    if mem_type == MemType::WRITE {
+        save_pages(uc, address, size, state.memory_snapshots.write().unwrap());
+    }
+
     let mut meminfo = state.logs.meminfo.write().unwrap();
 
     if let Some(element) = meminfo.get_mut(&(address, pc)) {
@@ -175,10 +191,23 @@ fn mem_hook_cb(
 fn fault_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, _size: u32, state: &Rc<State>) {
     let mut faults = state.faults.write().unwrap();
 
-    let fault = faults.get_mut(&address).unwrap();
+    // Hooks of the faults of a previous experiment may still be called until they are deleted
+    let Some(fault) = faults.get_mut(&address) else {
+        return;
+    };
     if fault.trigger.hitcounter == 0 {
         return;
     }
+    if fault.trigger.hitcounter == 1 {
+        let mut checkpoint_mode = state.checkpoint_mode.write().unwrap();
+        if *checkpoint_mode == CheckpointMode::Requested {
+            // Stop before the instruction at the trigger, so that the state can be saved
+            info!("Reached the trigger at 0x{address:x}, saving checkpoint");
+            *checkpoint_mode = CheckpointMode::Reached;
+            uc.emu_stop().expect("failed stopping emulation");
+            return;
+        }
+    }
     fault.trigger.hitcounter -= 1;
     if fault.trigger.hitcounter >= 1 {
         return;
@@ -213,6 +242,12 @@ fn fault_hook_cb(uc: &mut Unicorn<'_, ()>, address: u64, _size: u32, state: &Rc<
                 0,
                 fault_size as usize - fault_data.len(),
             ));
+            save_pages(
+                uc,
+                fault.address,
+                fault_data.len(),
+                state.memory_snapshots.write().unwrap(),
+            );
             uc.mem_write(fault.address, fault_data.as_slice())
                 .expect("failed writing fault data to memory");
             if matches!(fault.r#type, FaultType::Instruction) {
@@ -304,29 +339,24 @@ fn initialize_block_hook(emu: &mut Unicorn<()>, state_rc: &Rc<State>) -> io::Res
     Ok(())
 }
 
-fn initialize_end_hook<'a, 'b: 'a>(
-    emu: &mut Unicorn<'a, ()>,
+fn initialize_end_hook(
+    emu: &mut Unicorn<()>,
     state_rc: &Rc<State>,
-    config: &PyDict,
-    first_endpoint: u64,
-    memorydump: &'b Vec<HashMap<&str, u64>>,
+    endpoints: &[(u64, u32)],
+    memorydump: &[(u64, u32)],
 ) -> io::Result<()> {
-    let config_endpoints: &PyList = config.get_item("end").unwrap().extract()?;
-    for obj in config_endpoints {
-        let end: &PyDict = obj.extract()?;
-        let address: u64 = end.get_item("address").unwrap().extract()?;
-        let counter: u32 = end.get_item("counter").unwrap().extract()?;
-
+    for &(address, counter) in endpoints {
         let state_rc = Rc::clone(state_rc);
 
-        let mut endpoints = state_rc.endpoints.write().unwrap();
-        endpoints.insert(address, counter);
-        drop(endpoints);
+        let mut state_endpoints = state_rc.endpoints.write().unwrap();
+        state_endpoints.insert(address, counter);
+        drop(state_endpoints);
 
         let state_rc = Rc::clone(&state_rc);
+        let memorydump = memorydump.to_vec();
 
         let end_hook_closure = move |uc: &mut Unicorn<'_, ()>, address: u64, size: u32| {
-            end_hook_cb(uc, address, size, &state_rc, first_endpoint, memorydump);
+            end_hook_cb(uc, address, size, &state_rc, &memorydump);
         };
         emu.add_code_hook(address, address, end_hook_closure)
             .expect("failed to add end hook");
@@ -335,11 +365,16 @@ fn initialize_end_hook<'a, 'b: 'a>(
     Ok(())
 }
 
-fn initialize_fault_hook(
+/// Add the faults of an experiment and their hooks. Returns the hooks to remove them after the
+/// experiment
+pub fn initialize_fault_hook(
     emu: &mut Unicorn<()>,
     state_rc: &Rc<State>,
-    faults: &Vec<Fault>,
-) -> io::Result<()> {
+    faults: &[Fault],
+) -> io::Result<Vec<UcHookId>> {
+    *state_rc.first_endpoint.write().unwrap() = faults[0].trigger.address;
+
+    let mut hooks = Vec::with_capacity(faults.len());
     for fault in faults {
         let state_rc = Rc::clone(state_rc);
 
@@ -352,28 +387,32 @@ fn initialize_fault_hook(
         let fault_hook_closure = move |uc: &mut Unicorn<'_, ()>, address: u64, size: u32| {
             fault_hook_cb(uc, address, size, &state_rc);
         };
-        emu.add_code_hook(
-            fault.trigger.address,
-            fault.trigger.address,
-            fault_hook_closure,
-        )
-        .expect("failed to add fault hook");
+        hooks.push(
+            emu.add_code_hook(
+                fault.trigger.address,
+                fault.trigger.address,
+                fault_hook_closure,
+            )
+            .expect("failed to add fault hook"),
+        );
+        // Blocks translated by a previous experiment do not call the new hook
+        emu.ctl_remove_cache(fault.trigger.address, fault.trigger.address + 1)
+            .unwrap();
     }
 
-    Ok(())
+    Ok(hooks)
 }
 
-pub fn initialize_hooks<'a, 'b: 'a>(
-    emu: &mut Unicorn<'a, ()>,
+/// Add the hooks, which are independent of the faults
+pub fn initialize_hooks(
+    emu: &mut Unicorn<()>,
     state_rc: &Rc<State>,
-    faults: &Vec<Fault>,
-    memorydump: &'b Vec<HashMap<&str, u64>>,
-    config: &PyDict,
+    endpoints: &[(u64, u32)],
+    memorydump: &[(u64, u32)],
 ) -> io::Result<()> {
     initialize_mem_hook(emu, state_rc)?;
     initialize_block_hook(emu, state_rc)?;
-    initialize_end_hook(emu, state_rc, config, faults[0].trigger.address, memorydump)?;
-    initialize_fault_hook(emu, state_rc, faults)?;
+    initialize_end_hook(emu, state_rc, endpoints, memorydump)?;
 
     Ok(())
 }
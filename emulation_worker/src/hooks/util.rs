@@ -1,4 +1,5 @@
-use crate::structs::{TbExecEntry, TbInfoBlock};
+use crate::checkpoint::save_pages;
+use crate::structs::{MemorySnapshots, TbExecEntry, TbInfoBlock};
 use crate::{Fault, FaultModel, FaultType, MemDump};
 use log::debug;
 use num::{BigUint, ToPrimitive};
@@ -70,6 +71,7 @@ pub fn undo_faults(
     instruction_count: u64,
     faults: RwLockReadGuard<HashMap<u64, Fault>>,
     mut live_faults: RwLockWriteGuard<PriorityQueue<(u64, BigUint), u64>>,
+    memory_snapshots: RwLockWriteGuard<MemorySnapshots>,
 ) -> Option<Fault> {
     if live_faults.is_empty() {
         return None;
@@ -93,6 +95,12 @@ pub fn undo_faults(
                 .expect("failed restoring register value");
         }
         FaultType::Data | FaultType::Instruction => {
+            save_pages(
+                uc,
+                fault.address,
+                prefault_data.to_bytes_le().len(),
+                memory_snapshots,
+            );
             uc.mem_write(fault.address, prefault_data.to_bytes_le().as_slice())
                 .expect("failed restoring memory value");
             if matches!(fault.r#type, FaultType::Instruction) {
@@ -1,16 +1,16 @@
-use log::{debug, error, info, warn, LevelFilter};
-use priority_queue::PriorityQueue;
+use log::LevelFilter;
 use pyo3::{
+    buffer::PyBuffer,
+    exceptions,
     prelude::*,
     types::{PyDict, PyList},
 };
-use std::collections::HashMap;
-use std::rc::Rc;
-use std::sync::RwLock;
+use std::collections::{HashMap, VecDeque};
+use std::sync::mpsc::{self, Receiver};
+use std::sync::{Arc, Mutex};
+use std::thread;
 use time::macros::format_description;
 
-use unicorn_engine::unicorn_const::Permission;
-
 mod architecture;
 use crate::architecture::{
     Architecture, ArchitectureDependentOperations, ArchitectureDependentOperator,
@@ -19,8 +19,12 @@ use crate::architecture::{
 mod structs;
 use crate::structs::{Fault, FaultModel, FaultType, Logs, MemDump, MemInfo, State};
 
+mod checkpoint;
+
+mod emulator;
+use crate::emulator::Emulator;
+
 mod hooks;
-use crate::hooks::initialize_hooks;
 
 fn setup_logging(index: u64, debug: bool) {
     let config = simplelog::ConfigBuilder::new()
@@ -43,11 +47,150 @@ fn setup_logging(index: u64, debug: bool) {
     };
     loggers.push(simplelog::SimpleLogger::new(log_level, config));
 
-    simplelog::CombinedLogger::init(loggers).unwrap();
+    // Only the first call of a process sets up the logger
+    let _ = simplelog::CombinedLogger::init(loggers);
+}
+
+/// Configuration and pregoldenrun state shared by all experiments of a call
+struct Setup {
+    arch_operator: ArchitectureDependentOperator,
+    registers: HashMap<String, u64>,
+    memmaps: Vec<(u64, usize)>,
+    memdumps: Vec<(u64, Vec<u8>)>,
+    endpoints: Vec<(u64, u32)>,
+    memorydump: Vec<(u64, u32)>,
+    start_address: u64,
+    max_instruction_count: usize,
+}
+
+impl Setup {
+    fn new(pregoldenrun_data: &PyDict, config: &PyDict) -> PyResult<Setup> {
+        let arch_str = pregoldenrun_data
+            .get_item("architecture")
+            .unwrap()
+            .extract()?;
+        let arch: Architecture = match arch_str {
+            "arm" => Architecture::Arm,
+            "riscv64" => Architecture::Riscv64,
+            "aarch64" => Architecture::Aarch64,
+            _ => panic!("Unsupported architecture!"),
+        };
+
+        let register_table_name = match arch_str {
+            arch_str if arch_str.starts_with("arm") => "armregisters",
+            arch_str if arch_str.starts_with("riscv") => "riscvregisters",
+            arch_str if arch_str.starts_with("aarch64") => "aarch64registers",
+            _ => panic!("Unsupported architecture!"),
+        };
+
+        let registerdumps: &PyList = pregoldenrun_data
+            .get_item(register_table_name)
+            .unwrap()
+            .extract()?;
+        let registers: HashMap<String, u64> = registerdumps.get_item(0).unwrap().extract()?;
+
+        let memmaplist: &PyList = pregoldenrun_data
+            .get_item("memmaplist")
+            .unwrap()
+            .extract()?;
+        let mut memmaps = Vec::with_capacity(memmaplist.len());
+        for obj in memmaplist.iter() {
+            let memmap: &PyDict = obj.extract()?;
+            let address: u64 = memmap.get_item("address").unwrap().extract()?;
+            let size: usize = memmap.get_item("size").unwrap().extract()?;
+            memmaps.push((address, size));
+        }
+
+        let memdumplist: &PyList = pregoldenrun_data
+            .get_item("memdumplist")
+            .unwrap()
+            .extract()?;
+        let mut memdumps = Vec::with_capacity(memdumplist.len());
+        for obj in memdumplist.iter() {
+            let memdump: &PyDict = obj.extract()?;
+            let address: u64 = memdump.get_item("address").unwrap().extract()?;
+            let dumps: &PyList = memdump.get_item("dumps").unwrap().extract()?;
+            // Memory images are bytes like objects, which are copied at once
+            let dump: PyBuffer<u8> = PyBuffer::get(dumps.get_item(0).unwrap())?;
+            memdumps.push((address, dump.to_vec(memdump.py())?));
+        }
+
+        let config_endpoints: &PyList = config.get_item("end").unwrap().extract()?;
+        let mut endpoints = Vec::with_capacity(config_endpoints.len());
+        for obj in config_endpoints.iter() {
+            let end: &PyDict = obj.extract()?;
+            let address: u64 = end.get_item("address").unwrap().extract()?;
+            let counter: u32 = end.get_item("counter").unwrap().extract()?;
+            endpoints.push((address, counter));
+        }
+
+        let memorydump: Vec<HashMap<String, u64>> = config
+            .get_item("memorydump")
+            .map_or_else(Vec::new, |obj| obj.extract().unwrap());
+        let memorydump = memorydump
+            .iter()
+            .map(|dump| (dump["address"], dump["length"] as u32))
+            .collect();
+
+        let start: HashMap<String, u64> = config.get_item("start").unwrap().extract()?;
+
+        let max_instruction_count: usize = config
+            .get_item("max_instruction_count")
+            .unwrap()
+            .extract()?;
+
+        Ok(Setup {
+            arch_operator: ArchitectureDependentOperator { architecture: arch },
+            registers,
+            memmaps,
+            memdumps,
+            endpoints,
+            memorydump,
+            start_address: *start.get("address").unwrap(),
+            max_instruction_count,
+        })
+    }
+}
+
+/// Experiments with a single fault at the same trigger position only differ after the trigger
+fn trigger_position(faults: &[Fault]) -> Option<(u64, u32, bool)> {
+    match faults {
+        [fault] => Some((
+            fault.trigger.address,
+            fault.trigger.hitcounter,
+            fault.lifespan != 0,
+        )),
+        _ => None,
+    }
+}
+
+/// Group the experiments by trigger position. Groups are split into parts of at most
+/// max_size experiments
+fn group_by_trigger_position(fault_lists: &[Vec<Fault>], max_size: usize) -> Vec<Vec<usize>> {
+    let mut groups: Vec<Vec<usize>> = Vec::new();
+    let mut positions: HashMap<(u64, u32, bool), usize> = HashMap::new();
+    for (i, faults) in fault_lists.iter().enumerate() {
+        match trigger_position(faults) {
+            Some(position) => {
+                let group = *positions.entry(position).or_insert_with(|| {
+                    groups.push(Vec::new());
+                    groups.len() - 1
+                });
+                groups[group].push(i);
+            }
+            None => groups.push(vec![i]),
+        }
+    }
+
+    groups
+        .iter()
+        .flat_map(|group| group.chunks(max_size).map(<[usize]>::to_vec))
+        .collect()
 }
 
 #[pyfunction]
 fn run_unicorn(
+    py: Python,
     pregoldenrun_data: &PyDict,
     faults: Vec<Fault>,
     config: &PyDict,
@@ -56,155 +199,147 @@ fn run_unicorn(
 ) -> PyResult<PyObject> {
     setup_logging(index, engine_output);
 
-    let arch_str = pregoldenrun_data
-        .get_item("architecture")
-        .unwrap()
-        .extract()?;
-    let arch: Architecture = match arch_str {
-        "arm" => Architecture::Arm,
-        "riscv64" => Architecture::Riscv64,
-        "aarch64" => Architecture::Aarch64,
-        _ => panic!("Unsupported architecture!"),
-    };
+    let setup = Setup::new(pregoldenrun_data, config)?;
+    let logs = py.allow_threads(|| Emulator::new(&setup).run(&faults));
+    Ok(logs.to_object(py))
+}
 
-    let memorydump: Vec<HashMap<&str, u64>> = config
-        .get_item("memorydump")
-        .map_or_else(Vec::new, |obj| obj.extract().unwrap());
+/// Unicorn engine kept alive between calls, so that the setup of the engine is paid once for
+/// all experiments of a worker
+#[pyclass(unsendable, name = "Emulator")]
+struct PyEmulator {
+    emulator: Emulator,
+}
 
-    let arch_operator = ArchitectureDependentOperator { architecture: arch };
-    let emu = &mut arch_operator.initialize_unicorn();
+#[pymethods]
+impl PyEmulator {
+    #[new]
+    fn new(
+        pregoldenrun_data: &PyDict,
+        config: &PyDict,
+        index: u64,
+        engine_output: bool,
+    ) -> PyResult<PyEmulator> {
+        setup_logging(index, engine_output);
 
-    let register_table_name = match arch_str {
-        arch_str if arch_str.starts_with("arm") => "armregisters",
-        arch_str if arch_str.starts_with("riscv") => "riscvregisters",
-        arch_str if arch_str.starts_with("aarch64") => "aarch64registers",
-        _ => panic!("Unsupported architecture!"),
-    };
+        let setup = Setup::new(pregoldenrun_data, config)?;
+        Ok(PyEmulator {
+            emulator: Emulator::new(&setup),
+        })
+    }
 
-    let registerdumps: &PyList = pregoldenrun_data
-        .get_item(register_table_name)
-        .unwrap()
-        .extract()?;
-    arch_operator.initialize_registers(emu, registerdumps.get_item(0).unwrap().extract()?);
-
-    let start: HashMap<String, u64> = config.get_item("start").unwrap().extract()?;
-    let start_address = *start.get("address").unwrap() | arch_operator.get_thumb_bit(emu);
-
-    let memmaplist: &PyList = pregoldenrun_data
-        .get_item("memmaplist")
-        .unwrap()
-        .extract()?;
-
-    for obj in memmaplist.iter() {
-        let memmap: &PyDict = obj.extract()?;
-        let address: u64 = memmap.get_item("address").unwrap().extract()?;
-        let size: usize = memmap.get_item("size").unwrap().extract()?;
-        debug!(
-            "Mapping memory at 0x{:x} size 0x{:x}",
-            address & (u64::MAX ^ 0xfff),
-            usize::max(size, 0x1000)
-        );
-        match emu.mem_map(
-            address & (u64::MAX ^ 0xfff),
-            usize::max(size, 0x1000),
-            Permission::ALL,
-        ) {
-            Ok(()) => {}
-            Err(unicorn_engine::unicorn_const::uc_error::MAP) => {
-                warn!("Memory space is already mapped. Ignoring...")
-            }
-            Err(unicorn_engine::unicorn_const::uc_error::NOMEM) => {
-                warn!("Memory space too big, cannot allocate. Ignoring...")
-            }
-            Err(err) => panic!("failed mapping memory: {err:?}"),
-        }
+    /// Run a single experiment from the start point
+    fn run(&mut self, py: Python, faults: Vec<Fault>) -> PyObject {
+        self.emulator.run(&faults).to_object(py)
     }
 
-    let memdumplist: &PyList = pregoldenrun_data
-        .get_item("memdumplist")
-        .unwrap()
-        .extract()?;
-    for obj in memdumplist.iter() {
-        let memdump: &PyDict = obj.extract()?;
-        let address: u64 = memdump.get_item("address").unwrap().extract()?;
-        let dumps: &PyList = memdump.get_item("dumps").unwrap().extract()?;
-        let dump: Vec<u8> = dumps.get_item(0).unwrap().extract()?;
-        debug!("writing {:?} bytes to 0x{:x}", dump.len(), address);
-
-        emu.mem_write(address, dump.as_slice())
-            .unwrap_or_else(|_| error!("failed to write dumped data at 0x{:X}", address));
+    /// Run the experiments of fault_lists, sharing the emulation up to the trigger. The logs are
+    /// returned in the order of fault_lists
+    fn run_group(&mut self, py: Python, fault_lists: Vec<Vec<Fault>>) -> Vec<PyObject> {
+        let mut results: Vec<Option<PyObject>> = vec![None; fault_lists.len()];
+        for group in group_by_trigger_position(&fault_lists, usize::MAX) {
+            self.emulator
+                .run_group(&fault_lists, &group, &mut |position, logs| {
+                    results[position] = Some(logs.to_object(py));
+                });
+        }
+        results.into_iter().map(Option::unwrap).collect()
     }
+}
 
-    let logs = Logs {
-        meminfo: RwLock::new(HashMap::new()),
-        endpoint: RwLock::new((false, 0, 0)),
-        tbinfo: RwLock::new(HashMap::new()),
-        tbexec: RwLock::new(Vec::new()),
-        registerlist: RwLock::new(Vec::new()),
-        memdumps: RwLock::new(HashMap::new()),
-    };
+/// Iterator over the (position, logs) of the experiments of run_unicorn_batch in the order they
+/// finish
+#[pyclass]
+struct BatchResults {
+    receiver: Mutex<Receiver<(usize, Logs)>>,
+    remaining: usize,
+}
 
-    let state = State {
-        last_tbid: RwLock::new(0),
-        last_tb_size: RwLock::new(0),
-        reenter_address: RwLock::new(None),
-        tbcounter: RwLock::new(0),
-        endpoints: RwLock::new(HashMap::new()),
-        faults: RwLock::new(HashMap::new()),
-        live_faults: RwLock::new(PriorityQueue::new()),
-        instruction_count: RwLock::new(0),
-        single_step_hook_handle: RwLock::new(None),
-        cs_engine: arch_operator.initialize_cs_engine(),
-        arch_operator: arch_operator.clone(),
-        logs,
-    };
+#[pymethods]
+impl BatchResults {
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
 
-    let state_rc: Rc<State> = Rc::new(state);
-    initialize_hooks(emu, &state_rc, &faults, &memorydump, config)
-        .expect("failed initializing hooks");
-
-    let max_instruction_count: usize = config
-        .get_item("max_instruction_count")
-        .unwrap()
-        .extract()?;
-
-    info!("Starting emulation at 0x{:x}", start_address);
-    emu.emu_start(start_address, 0, 0, max_instruction_count)
-        .unwrap_or_else(|_| error!("failed to emulate code at 0x{:x}", emu.pc_read().unwrap()));
-
-    // Re-enter if a fault hook stopped emulation early to invalidate and replay the TB.
-    loop {
-        let reenter = state_rc.reenter_address.read().unwrap();
-        if let Some(addr) = *reenter {
-            drop(reenter);
-            *state_rc.reenter_address.write().unwrap() = None;
-            let thumb_bit = arch_operator.get_thumb_bit(emu);
-            let reenter_addr = addr | thumb_bit;
-            info!("Re-entering emulation at 0x{:x}", reenter_addr);
-            emu.emu_start(reenter_addr, 0, 0, max_instruction_count)
-                .unwrap_or_else(|_| {
-                    error!("failed to emulate code at 0x{:x}", emu.pc_read().unwrap())
-                });
-        } else {
-            break;
+    fn __next__(mut slf: PyRefMut<'_, Self>) -> PyResult<Option<(usize, PyObject)>> {
+        if slf.remaining == 0 {
+            return Ok(None);
+        }
+        let py = slf.py();
+        let receiver = &slf.receiver;
+        let result = py.allow_threads(|| receiver.lock().unwrap().recv());
+        match result {
+            Ok((position, logs)) => {
+                slf.remaining -= 1;
+                Ok(Some((position, logs.to_object(py))))
+            }
+            Err(_) => Err(exceptions::PyRuntimeError::new_err(
+                "emulation thread terminated unexpectedly",
+            )),
         }
     }
+}
 
-    {
-        let state = Rc::clone(&state_rc);
-        state.arch_operator.dump_registers(
-            emu,
-            state.logs.registerlist.write().unwrap(),
-            *state.tbcounter.read().unwrap(),
-        );
+/// Run the experiments of fault_lists on a pool of threads, each with its own Unicorn engine.
+/// The setup is parsed once and the GIL is only held while the results are converted
+#[pyfunction]
+fn run_unicorn_batch(
+    pregoldenrun_data: &PyDict,
+    fault_lists: Vec<Vec<Fault>>,
+    config: &PyDict,
+    index: u64,
+    engine_output: bool,
+    threads: usize,
+) -> PyResult<BatchResults> {
+    setup_logging(index, engine_output);
+
+    let setup = Arc::new(Setup::new(pregoldenrun_data, config)?);
+    let threads = if threads == 0 {
+        thread::available_parallelism().map_or(1, usize::from)
+    } else {
+        threads
+    };
+    // Parts of large groups are run in parallel, so that all threads have work
+    let max_size = usize::max(fault_lists.len().div_ceil(threads), 1);
+    let groups = group_by_trigger_position(&fault_lists, max_size);
+
+    let (sender, receiver) = mpsc::channel();
+    let remaining = fault_lists.len();
+    let num_threads = usize::min(threads, groups.len());
+    let groups = Arc::new(Mutex::new(VecDeque::from(groups)));
+    let fault_lists = Arc::new(fault_lists);
+    for _ in 0..num_threads {
+        let setup = Arc::clone(&setup);
+        let groups = Arc::clone(&groups);
+        let fault_lists = Arc::clone(&fault_lists);
+        let sender = sender.clone();
+        thread::spawn(move || {
+            // Each thread reuses its engine for all of its groups
+            let mut emulator = Emulator::new(&setup);
+            loop {
+                let group = groups.lock().unwrap().pop_front();
+                let Some(group) = group else {
+                    break;
+                };
+                emulator.run_group(&fault_lists, &group, &mut |position, logs| {
+                    // The receiver is only dropped if the results are not needed anymore
+                    let _ = sender.send((position, logs));
+                });
+            }
+        });
     }
-    info!("Finished emulation");
 
-    Python::with_gil(|py| Ok(state_rc.logs.to_object(py)))
+    Ok(BatchResults {
+        receiver: Mutex::new(receiver),
+        remaining,
+    })
 }
 
 #[pymodule]
 fn emulation_worker(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(run_unicorn, m)?)?;
+    m.add_function(wrap_pyfunction!(run_unicorn_batch, m)?)?;
+    m.add_class::<BatchResults>()?;
+    m.add_class::<PyEmulator>()?;
     Ok(())
 }
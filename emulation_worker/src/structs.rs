@@ -1,16 +1,18 @@
-use crate::ArchitectureDependentOperator;
+use crate::{ArchitectureDependentOperations, ArchitectureDependentOperator};
 use capstone::Capstone;
 use num::BigUint;
 use priority_queue::PriorityQueue;
 use pyo3::{
     exceptions,
     prelude::*,
-    types::{PyDict, PyList},
+    types::{PyBytes, PyDict, PyList},
 };
 use std::collections::HashMap;
 use std::sync::RwLock;
+use std::time::Duration;
 use unicorn_engine::UcHookId;
 
+#[derive(Clone)]
 pub struct MemInfo {
     pub ins: u64,
     pub counter: u32,
@@ -20,20 +22,6 @@ pub struct MemInfo {
     pub size: usize,
 }
 
-impl ToPyObject for MemInfo {
-    fn to_object(&self, py: Python<'_>) -> PyObject {
-        let dict = PyDict::new(py);
-        dict.set_item("ins", self.ins).unwrap();
-        dict.set_item("counter", self.counter).unwrap();
-        dict.set_item("direction", self.direction).unwrap();
-        dict.set_item("address", self.address).unwrap();
-        dict.set_item("tbid", self.tbid).unwrap();
-        dict.set_item("size", self.size).unwrap();
-
-        dict.to_object(py)
-    }
-}
-
 #[derive(Debug, Clone, Copy)]
 pub enum FaultModel {
     Set0,
@@ -90,6 +78,7 @@ pub struct Fault {
     pub num_bytes: u32,
 }
 
+#[derive(Clone)]
 pub struct TbInfoBlock {
     pub id: u64,
     pub size: u32,
@@ -111,21 +100,13 @@ impl ToPyObject for TbInfoBlock {
     }
 }
 
+#[derive(Clone)]
 pub struct TbExecEntry {
     pub tb: u64,
     pub pos: u64,
 }
 
-impl ToPyObject for TbExecEntry {
-    fn to_object(&self, py: Python<'_>) -> PyObject {
-        let dict = PyDict::new(py);
-        dict.set_item("tb", self.tb).unwrap();
-        dict.set_item("pos", self.pos).unwrap();
-
-        dict.to_object(py)
-    }
-}
-
+#[derive(Clone)]
 pub struct MemDump {
     pub address: u64,
     pub len: u32,
@@ -138,12 +119,29 @@ impl ToPyObject for MemDump {
         dict.set_item("address", self.address).unwrap();
         dict.set_item("len", self.len).unwrap();
         dict.set_item("numdumps", self.dumps.len()).unwrap();
-        dict.set_item("dumps", self.dumps.to_object(py)).unwrap();
+        let dumps = PyList::new(py, self.dumps.iter().map(|dump| PyBytes::new(py, dump)));
+        dict.set_item("dumps", dumps).unwrap();
 
         dict.to_object(py)
     }
 }
 
+/// Table as dict of columns. Each column is packed into the bytes of native endian u64 values,
+/// so that it is read with numpy.frombuffer instead of creating an object per record
+fn columns_to_object(py: Python<'_>, columns: Vec<(&str, Vec<u64>)>) -> PyObject {
+    let dict = PyDict::new(py);
+    for (name, values) in columns {
+        let data: Vec<u8> = values
+            .iter()
+            .flat_map(|value| value.to_ne_bytes())
+            .collect();
+        dict.set_item(name, PyBytes::new(py, &data)).unwrap();
+    }
+
+    dict.to_object(py)
+}
+
+#[derive(Default)]
 pub struct Logs {
     pub meminfo: RwLock<HashMap<(u64, u64), MemInfo>>,
     pub endpoint: RwLock<(bool, u64, u32)>,
@@ -151,6 +149,8 @@ pub struct Logs {
     pub tbexec: RwLock<Vec<TbExecEntry>>,
     pub registerlist: RwLock<Vec<HashMap<String, u64>>>,
     pub memdumps: RwLock<HashMap<u64, MemDump>>,
+    /// Emulation time of the experiment
+    pub runtime: RwLock<Duration>,
 }
 
 impl ToPyObject for Logs {
@@ -158,19 +158,34 @@ impl ToPyObject for Logs {
         let dict = PyDict::new(py);
 
         let meminfo = self.meminfo.read().unwrap();
-        let meminfo_list = PyList::new(py, meminfo.values());
-
-        dict.set_item("meminfo", meminfo_list.to_object(py))
+        let column =
+            |field: fn(&MemInfo) -> u64| -> Vec<u64> { meminfo.values().map(field).collect() };
+        let meminfo_columns = vec![
+            ("ins", column(|info| info.ins)),
+            ("counter", column(|info| info.counter as u64)),
+            ("direction", column(|info| info.direction as u64)),
+            ("address", column(|info| info.address)),
+            ("tbid", column(|info| info.tbid)),
+            ("size", column(|info| info.size as u64)),
+        ];
+        dict.set_item("meminfo", columns_to_object(py, meminfo_columns))
             .unwrap();
 
         let tbinfo = self.tbinfo.read().unwrap();
         let tbinfo_list = PyList::new(py, tbinfo.values());
         dict.set_item("tbinfo", tbinfo_list.to_object(py)).unwrap();
 
-        let mut tbexec = self.tbexec.write().unwrap();
-        tbexec.remove(0);
-        let tbexec_list = PyList::new(py, tbexec.as_slice());
-        dict.set_item("tbexec", tbexec_list.to_object(py)).unwrap();
+        // The first entry is skipped, its position is not valid
+        let tbexec = self.tbexec.read().unwrap();
+        let tbexec_columns = vec![
+            ("tb", tbexec.iter().skip(1).map(|entry| entry.tb).collect()),
+            (
+                "pos",
+                tbexec.iter().skip(1).map(|entry| entry.pos).collect(),
+            ),
+        ];
+        dict.set_item("tbexec", columns_to_object(py, tbexec_columns))
+            .unwrap();
 
         let endpoint = self.endpoint.read().unwrap();
         if endpoint.2 == 1 {
@@ -182,30 +197,124 @@ impl ToPyObject for Logs {
         dict.set_item("endpoint", if endpoint.0 { 1 } else { 0 })
             .unwrap();
 
+        // All dumps have the same registers, sorted for a stable column order
         let registerlist = self.registerlist.read().unwrap();
-        dict.set_item("registerlist", registerlist.to_object(py))
+        let mut registers: Vec<&String> = registerlist
+            .first()
+            .map_or_else(Vec::new, |dump| dump.keys().collect());
+        registers.sort();
+        let register_columns = registers
+            .iter()
+            .map(|name| {
+                let values = registerlist.iter().map(|dump| dump[*name]).collect();
+                (name.as_str(), values)
+            })
+            .collect();
+        dict.set_item("registerlist", columns_to_object(py, register_columns))
             .unwrap();
 
         let memdumps = self.memdumps.read().unwrap();
         let memdump_list = PyList::new(py, memdumps.values());
         dict.set_item("memdumplist", memdump_list).unwrap();
 
+        dict.set_item("runtime", self.runtime.read().unwrap().as_secs_f64())
+            .unwrap();
+
         dict.to_object(py)
     }
 }
 
+impl Clone for Logs {
+    fn clone(&self) -> Logs {
+        Logs {
+            meminfo: RwLock::new(self.meminfo.read().unwrap().clone()),
+            endpoint: RwLock::new(*self.endpoint.read().unwrap()),
+            tbinfo: RwLock::new(self.tbinfo.read().unwrap().clone()),
+            tbexec: RwLock::new(self.tbexec.read().unwrap().clone()),
+            registerlist: RwLock::new(self.registerlist.read().unwrap().clone()),
+            memdumps: RwLock::new(self.memdumps.read().unwrap().clone()),
+            runtime: RwLock::new(*self.runtime.read().unwrap()),
+        }
+    }
+}
+
+impl Logs {
+    /// Move all records out, leaving empty logs
+    pub fn take(&self) -> Logs {
+        Logs {
+            meminfo: RwLock::new(std::mem::take(&mut *self.meminfo.write().unwrap())),
+            endpoint: RwLock::new(std::mem::take(&mut *self.endpoint.write().unwrap())),
+            tbinfo: RwLock::new(std::mem::take(&mut *self.tbinfo.write().unwrap())),
+            tbexec: RwLock::new(std::mem::take(&mut *self.tbexec.write().unwrap())),
+            registerlist: RwLock::new(std::mem::take(&mut *self.registerlist.write().unwrap())),
+            memdumps: RwLock::new(std::mem::take(&mut *self.memdumps.write().unwrap())),
+            runtime: RwLock::new(std::mem::take(&mut *self.runtime.write().unwrap())),
+        }
+    }
+
+    /// Replace all records by the ones of logs
+    pub fn restore(&self, logs: &Logs) {
+        *self.meminfo.write().unwrap() = logs.meminfo.read().unwrap().clone();
+        *self.endpoint.write().unwrap() = *logs.endpoint.read().unwrap();
+        *self.tbinfo.write().unwrap() = logs.tbinfo.read().unwrap().clone();
+        *self.tbexec.write().unwrap() = logs.tbexec.read().unwrap().clone();
+        *self.registerlist.write().unwrap() = logs.registerlist.read().unwrap().clone();
+        *self.memdumps.write().unwrap() = logs.memdumps.read().unwrap().clone();
+        *self.runtime.write().unwrap() = *logs.runtime.read().unwrap();
+    }
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum CheckpointMode {
+    Disabled,
+    // Stop before the fault is applied
+    Requested,
+    // Stopped at the trigger
+    Reached,
+    // Resumed at the trigger, the first block has already been logged
+    Resumed,
+}
+
+// Original content of the pages written since each memory snapshot was taken
+pub type MemorySnapshots = Vec<HashMap<u64, Vec<u8>>>;
+
 pub struct State {
     pub last_tbid: RwLock<u64>,
     pub last_tb_size: RwLock<u32>,
     pub reenter_address: RwLock<Option<u64>>,
     pub tbcounter: RwLock<u64>,
     pub endpoints: RwLock<HashMap<u64, u32>>,
+    pub first_endpoint: RwLock<u64>,
     pub faults: RwLock<HashMap<u64, Fault>>,
     pub live_faults: RwLock<PriorityQueue<(u64, BigUint), u64>>,
     pub instruction_count: RwLock<u64>,
     pub single_step_hook_handle: RwLock<Option<UcHookId>>,
+    pub checkpoint_mode: RwLock<CheckpointMode>,
+    pub memory_snapshots: RwLock<MemorySnapshots>,
     pub cs_engine: Capstone,
     pub arch_operator: ArchitectureDependentOperator,
 
     pub logs: Logs,
 }
+
+impl State {
+    pub fn new(arch_operator: &ArchitectureDependentOperator) -> State {
+        State {
+            last_tbid: RwLock::new(0),
+            last_tb_size: RwLock::new(0),
+            reenter_address: RwLock::new(None),
+            tbcounter: RwLock::new(0),
+            endpoints: RwLock::new(HashMap::new()),
+            first_endpoint: RwLock::new(0),
+            faults: RwLock::new(HashMap::new()),
+            live_faults: RwLock::new(PriorityQueue::new()),
+            instruction_count: RwLock::new(0),
+            single_step_hook_handle: RwLock::new(None),
+            checkpoint_mode: RwLock::new(CheckpointMode::Disabled),
+            memory_snapshots: RwLock::new(Vec::new()),
+            cs_engine: arch_operator.initialize_cs_engine(),
+            arch_operator: arch_operator.clone(),
+            logs: Logs::default(),
+        }
+    }
+}
@@ -0,0 +1,327 @@
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Process, Queue
+import os
+from pathlib import Path
+import pickle
+import queue
+import tempfile
+import time
+
+import numpy
+import tables
+from tqdm import tqdm
+
+from faultclass import python_worker, python_worker_unicorn
+from hdf5logger import create_assembler_store, create_filters, leaf_table_type
+from hdf5logger import process_experiment
+from util import mem_limit_calc
+
+logger = logging.getLogger(__name__)
+
+
+def select_sample(faultlist, num_samples):
+    """
+    Select a stratified sample of the faultlist. Strata are the fault type and
+    model combinations, each stratum gets at least one experiment and the
+    remaining experiments are distributed proportionally
+    """
+    strata = {}
+    for faultconfig in faultlist:
+        key = tuple((fault.type, fault.model) for fault in faultconfig["faultlist"])
+        strata.setdefault(key, []).append(faultconfig)
+
+    sample = []
+    for entries in strata.values():
+        num = round(num_samples * len(entries) / len(faultlist))
+        num = min(max(num, 1), len(entries))
+        # Spread the sample evenly over the stratum, the faultlist is ordered by
+        # address, so this covers the whole fault range
+        positions = numpy.unique(numpy.linspace(0, len(entries) - 1, num).round())
+        sample += [entries[int(pos)] for pos in positions]
+
+    return sample, len(strata)
+
+
+def run_sample(
+    sample,
+    config_qemu,
+    engine_output,
+    pregoldenrun_data,
+    goldenrun_data,
+    qemu_pre,
+    qemu_post,
+    unicorn_emulation,
+):
+    """
+    Run the sampled experiments one after another and measure their runtime,
+    memory usage and the size of their output when transferred to the logger
+    """
+    queue_output = Queue()
+    queue_ram_usage = Queue()
+
+    results = []
+    for faults in tqdm(sample, desc="Running sample experiments"):
+        if unicorn_emulation:
+            p = Process(
+                name=f"worker_{faults['index']}",
+                target=python_worker_unicorn,
+                args=(
+                    [faults],
+                    config_qemu,
+                    queue_output,
+                    engine_output,
+                    pregoldenrun_data,
+                    goldenrun_data,
+                ),
+            )
+        else:
+            p = Process(
+                name=f"worker_{faults['index']}",
+                target=python_worker,
+                args=(
+                    faults["faultlist"],
+                    config_qemu,
+                    faults["index"],
+                    queue_output,
+                    engine_output,
+                    goldenrun_data,
+                    False,
+                    queue_ram_usage,
+                    qemu_pre,
+                    qemu_post,
+                ),
+            )
+
+        start_time = time.time()
+        p.start()
+        try:
+            exp = queue_output.get(timeout=config_qemu["timeout"])
+        except queue.Empty:
+            logger.warning(f"Sample experiment {faults['index']} ran into timeout")
+            p.terminate()
+            p.join()
+            results.append({"runtime": config_qemu["timeout"], "output": None})
+            continue
+        p.join()
+        runtime = time.time() - start_time
+
+        ram_usage = 0
+        while True:
+            try:
+                ram_usage = max(ram_usage, queue_ram_usage.get_nowait())
+            except queue.Empty:
+                break
+
+        results.append(
+            {
+                "runtime": runtime,
+                "ram_usage": ram_usage,
+                "transfer_size": len(pickle.dumps(exp)),
+                "output": exp,
+            }
+        )
+
+    return results
+
+
+def measure_output(results, compressionlevel, compression=None):
+    """
+    Write the sample outputs into a temporary hdf5 file and return the logger
+    time, the bytes on disk per table and the growth of the file
+    """
+    table_sizes = {}
+    write_time = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hdf5path = Path(tmpdir) / "estimate.hdf5"
+        myfilter = create_filters(compressionlevel, compression)
+
+        # Size of a file without experiments, so that only the growth per
+        # experiment is extrapolated
+        emptypath = Path(tmpdir) / "empty.hdf5"
+        with tables.open_file(emptypath, "w") as f:
+            f.create_group("/", "fault", "Group containing fault results")
+        empty_size = os.path.getsize(emptypath)
+
+        with tables.open_file(hdf5path, "w", max_group_width=65536) as f:
+            fault_group = f.create_group("/", "fault", "Group containing fault results")
+            assembler_store = create_assembler_store(f, myfilter["default"])
+            for i, result in enumerate(results):
+                if result["output"] is None:
+                    continue
+                t0 = time.time()
+                exp_group = f.create_group(fault_group, f"experiment{i}")
+                process_experiment(
+                    f,
+                    exp_group,
+                    result["output"],
+                    myfilter,
+                    assembler_store=assembler_store,
+                )
+                f.flush()
+                write_time += time.time() - t0
+
+        with tables.open_file(hdf5path, "r") as f:
+            for node in f.walk_nodes("/", "Leaf"):
+                name = leaf_table_type(node)
+                table_sizes[name] = table_sizes.get(name, 0) + node.size_on_disk
+
+        file_size = os.path.getsize(hdf5path) - empty_size
+
+    return write_time, table_sizes, file_size
+
+
+def format_bytes(num_bytes):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}TiB"
+
+
+def estimate_campaign(
+    faultlist,
+    config_qemu,
+    num_workers,
+    queue_memory,
+    compressionlevel,
+    num_samples,
+    system_ram,
+    engine_output,
+    pregoldenrun_data,
+    goldenrun_data,
+    qemu_pre=None,
+    qemu_post=None,
+    unicorn_emulation=False,
+    compression=None,
+):
+    """
+    Run a stratified sample of the faultlist and extrapolate runtime, output
+    size and peak memory usage of the whole campaign
+    """
+    if not faultlist:
+        logger.info("No faults to estimate")
+        return {}
+
+    sample, num_strata = select_sample(faultlist, num_samples)
+    logger.info(
+        f"Estimating campaign of {len(faultlist)} experiments from {len(sample)} "
+        f"samples in {num_strata} fault type/model strata"
+    )
+
+    results = run_sample(
+        sample,
+        config_qemu,
+        engine_output,
+        pregoldenrun_data,
+        goldenrun_data,
+        qemu_pre,
+        qemu_post,
+        unicorn_emulation,
+    )
+    finished = [result for result in results if result["output"] is not None]
+    num_timeouts = len(results) - len(finished)
+
+    write_time, table_sizes, file_size = measure_output(
+        results, compressionlevel, compression
+    )
+
+    runtime_mean = numpy.mean([result["runtime"] for result in results])
+    num_experiments = len(faultlist)
+    scale = num_experiments / max(len(finished), 1)
+
+    # Workers and logger run in parallel, the slower one limits the campaign
+    worker_time = runtime_mean * num_experiments / num_workers
+    logger_time = write_time * scale
+    logger_throughput = len(finished) / write_time if write_time else float("inf")
+
+    table_bytes = {name: size * scale for name, size in table_sizes.items()}
+    output_bytes = file_size * scale
+
+    ram_usage = max((result["ram_usage"] for result in finished), default=0)
+    transfer_size = numpy.mean([result["transfer_size"] for result in finished] or [0])
+    # Worker memory usage is reported in KiB
+    # The result queue holds at most queue_memory bytes, the rest is spilled
+    queued_bytes = min(queue_memory, num_experiments * transfer_size)
+    peak_memory = mem_limit_calc(ram_usage, num_workers, queued_bytes / 1024, 0) * 1024
+    spill_bytes = 0
+    if logger_time > worker_time:
+        spill_bytes = num_experiments * transfer_size * (1 - worker_time / logger_time)
+        spill_bytes = max(0, spill_bytes - queue_memory)
+
+    estimate = {
+        "experiments": num_experiments,
+        "samples": len(results),
+        "timeouts": num_timeouts,
+        "experiment_runtime": runtime_mean,
+        "wall_time": max(worker_time, logger_time),
+        "logger_throughput": logger_throughput,
+        "output_bytes": output_bytes,
+        "table_bytes": table_bytes,
+        "peak_memory": peak_memory,
+        "spill_bytes": spill_bytes,
+    }
+
+    report = (
+        f"Campaign estimate for {num_experiments} experiments with "
+        f"{num_workers} workers:\n"
+        f"\tmean experiment runtime:\t{runtime_mean:.3f}s\n"
+        f"\testimated wall time:\t\t"
+        f"{time.strftime('%H:%M:%S', time.gmtime(estimate['wall_time']))}"
+        f" ({'logger' if logger_time > worker_time else 'workers'} bound)\n"
+        f"\tlogger throughput:\t\t{logger_throughput:.1f} experiments/s\n"
+        f"\testimated output size:\t\t{format_bytes(output_bytes)}\n"
+        f"\testimated peak memory:\t\t{format_bytes(peak_memory)}\n"
+        f"\testimated peak spill:\t\t{format_bytes(spill_bytes)}"
+    )
+    for name, size in sorted(table_bytes.items(), key=lambda item: -item[1]):
+        report += f"\n\t\t{name}:\t{format_bytes(size)}"
+    logger.info(report)
+
+    if num_timeouts:
+        logger.warning(
+            f"{num_timeouts}/{len(results)} sample experiments ran into the "
+            f"timeout of {config_qemu['timeout']}s"
+        )
+    if peak_memory > system_ram * 1024:
+        logger.warning(
+            "Estimated peak memory exceeds the system memory, reduce the number "
+            "of workers or the queue memory"
+        )
+
+    table_total = sum(table_bytes.values())
+    if table_total:
+        tbexec_share = table_bytes.get("tbexeclist", 0) / table_total
+        meminfo_share = table_bytes.get("meminfo", 0) / table_total
+        if not config_qemu["ring_buffer"] and tbexec_share > 0.5:
+            logger.info(
+                f"tbexeclist makes up {tbexec_share:.0%} of the output, enabling "
+                f"the ring buffer would reduce it to the last 100 entries"
+            )
+        if config_qemu["mem_info"] and meminfo_share > 0.5:
+            logger.info(
+                f"meminfo makes up {meminfo_share:.0%} of the output, consider "
+                f"disabling mem_info if memory accesses are not analysed"
+            )
+    if not config_qemu["mem_info"]:
+        logger.info(
+            "mem_info is disabled and therefore not part of this estimate, "
+            "enabling it increases runtime and output size"
+        )
+
+    return estimate
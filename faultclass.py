@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from enum import IntEnum
+import hashlib
 import logging
 from multiprocessing import Process
 import os
@@ -23,12 +24,16 @@ import signal
 import subprocess
 import time
 
+import numpy
 import pandas as pd
 import prctl
 
 import protobuf.control_pb2 as control_pb2
 import protobuf.data_pb2 as data_pb2
 import protobuf.fault_pb2 as fault_pb2
+from snapshot import copy_snapshot, qemu_system_arguments, resumes_from_snapshot
+from snapshot import snapshot_arguments
+from telemetry import send_timings, stage_timer
 from util import gather_process_ram_usage
 
 TB_EXEC_LIST_CHUNK_SIZE = 10000
@@ -36,7 +41,7 @@ TB_EXEC_LIST_CHUNK_SIZE = 10000
 logger = logging.getLogger(__name__)
 qlogger = logging.getLogger("QEMU-" + __name__)
 
-run_unicorn = None
+run_unicorn_batch = None
 
 
 def detect_type(fault_type):
@@ -199,9 +204,11 @@ def run_qemu(
     qemu_output,
     index,
     qemu_custom_paths=None,
+    snapshot_image=None,
 ):
     """
-    This function calls qemu with the required arguments.
+    This function calls qemu with the required arguments. If snapshot_image
+    is given, QEMU resumes from the start point saved in it
     """
     ps = None
     try:
@@ -214,20 +221,15 @@ def run_qemu(
         qemustring = [
             config_qemu["qemu"],
             "-plugin", f"{config_qemu['plugin']},control={control},config={config},data={data}",
-            "-M", config_qemu["machine"],
-            "-monitor", "none",
         ]
         # fmt: on
         if qemu_output is True:
             qemustring += ["-d", "plugin"]
         if qemu_custom_paths is not None:
             qemustring += shlex.split(qemu_custom_paths)
-        if config_qemu["bios"] != "":
-            qemustring += ["-bios", config_qemu["bios"]]
-        if config_qemu["kernel"] != "":
-            qemustring += ["-kernel", config_qemu["kernel"]]
-        if config_qemu["additional_qemu_args"] != "":
-            qemustring += shlex.split(config_qemu["additional_qemu_args"])
+        qemustring += qemu_system_arguments(config_qemu)
+        if snapshot_image is not None:
+            qemustring += snapshot_arguments(snapshot_image)
         if "gdb" in config_qemu and config_qemu["gdb"] is True:
             qemustring += ["-S", "-s"]
 
@@ -268,7 +270,7 @@ def readout_tbinfo(data_protobuf):
     return tb_list
 
 
-def write_output_wrt_goldenrun(keyword, data, goldenrun_data):
+def diff_to_goldenrun(keyword, data, goldenrun_data):
     """
     Panda dataframes for performance reasons. Naive implementation is too slow
     for larger datasets. golden_data twice concated to only get the diff
@@ -284,7 +286,154 @@ def write_output_wrt_goldenrun(keyword, data, goldenrun_data):
         data = [data, goldenrun_data[keyword], goldenrun_data[keyword]]
         data = pd.concat(data).drop_duplicates(keep=False)
 
-    return data.to_dict("records")
+    return data
+
+
+def write_output_wrt_goldenrun(keyword, data, goldenrun_data):
+    """
+    Same as diff_to_goldenrun, but returns the diff as list of records
+    """
+    return diff_to_goldenrun(keyword, data, goldenrun_data).to_dict("records")
+
+
+def read_columns(columns):
+    """
+    Build a DataFrame from the columns returned by the emulation worker, each
+    packed as bytes of uint64 values. As for a DataFrame of Python ints, the
+    columns are int64 unless a value does not fit
+    """
+    data = {}
+    for name, packed in columns.items():
+        column = numpy.frombuffer(packed, numpy.uint64)
+        if (column <= numpy.iinfo(numpy.int64).max).all():
+            column = column.astype(numpy.int64)
+        data[name] = column
+    return pd.DataFrame(data)
+
+
+def encode_memdump_deltas(memdumplist, golden_memdumplist):
+    """
+    Replace the memory dumps, which have a counterpart at the same address in
+    the goldenrun, by the (offset, value) pairs that differ from it. Returns
+    the remaining memory dumps and the deltas
+    """
+    golden_dumps = {
+        (memdump["address"], memdump["len"]): memdump["dumps"]
+        for memdump in golden_memdumplist
+    }
+
+    remaining = []
+    memdumpdeltas = {"locations": [], "deltas": []}
+    for memdump in memdumplist:
+        golden = golden_dumps.get((memdump["address"], memdump["len"]))
+        if golden is None or len(golden) == 0:
+            remaining.append(memdump)
+            continue
+
+        location = len(memdumpdeltas["locations"])
+        memdumpdeltas["locations"].append(
+            {
+                "address": memdump["address"],
+                "len": memdump["len"],
+                "numdumps": memdump["numdumps"],
+            }
+        )
+        for i, dump in enumerate(memdump["dumps"]):
+            # Additional dumps are compared to the last goldenrun dump
+            golden_dump = numpy.asarray(golden[min(i, len(golden) - 1)], numpy.uint8)
+            dump = numpy.asarray(dump, numpy.uint8)
+            offsets = numpy.flatnonzero(dump != golden_dump)
+            memdumpdeltas["deltas"].extend(
+                {"location": location, "dump": i, "offset": offset, "value": value}
+                for offset, value in zip(offsets.tolist(), dump[offsets].tolist())
+            )
+    return remaining, memdumpdeltas
+
+
+def encode_register_deltas(registerlist, golden_registers):
+    """
+    Encode each register dump as bitmask of the registers that differ from the
+    goldenrun dump at the same position and the values of these registers.
+    Bit i of the mask refers to the i-th entry of registers
+    """
+    golden_registers = pd.DataFrame(golden_registers)
+    registers = list(golden_registers.columns)
+    golden_values = golden_registers.to_numpy(dtype=numpy.uint64)
+
+    deltas = []
+    dumps = pd.DataFrame(registerlist, columns=registers).to_numpy(dtype=numpy.uint64)
+    for i, values in enumerate(dumps):
+        if i < len(golden_values):
+            changed = values != golden_values[i]
+        else:
+            changed = numpy.ones(len(registers), dtype=bool)
+        mask = sum(1 << int(bit) for bit in numpy.flatnonzero(changed))
+        deltas.append({"dump": i, "mask": mask, "values": values[changed].tolist()})
+    return {"registers": registers, "deltas": deltas}
+
+
+def encode_deltas(output, goldenrun_data, regtype):
+    """
+    Replace the memory and register dumps of the output by their deltas to the
+    goldenrun
+    """
+    if output.get("memdumplist") and goldenrun_data.get("memdumplist"):
+        output["memdumplist"], output["memdumpdeltas"] = encode_memdump_deltas(
+            output["memdumplist"], goldenrun_data["memdumplist"]
+        )
+        if not output["memdumplist"]:
+            del output["memdumplist"]
+
+    keyword = f"{regtype}registers"
+    if keyword in output and keyword in goldenrun_data:
+        output["registerdeltas"] = encode_register_deltas(
+            output.pop(keyword), goldenrun_data[keyword]
+        )
+        output["registerdeltas"]["architecture"] = regtype
+
+
+def hash_registers(registerlist):
+    """
+    Hash of the register dumps as 64 bit integer, the register dicts of all
+    dumps have the same keys. The dumps can also be given as DataFrame
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    values = pd.DataFrame(registerlist).to_numpy(dtype=numpy.uint64)
+    digest.update(numpy.ascontiguousarray(values).tobytes())
+    return int.from_bytes(digest.digest(), "little")
+
+
+def hash_memdumps(memdumplist):
+    """
+    Hash of the memory dumps of all locations as 64 bit integer
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for memdump in memdumplist:
+        digest.update(
+            numpy.array([memdump["address"], memdump["len"]], numpy.uint64).tobytes()
+        )
+        for dump in memdump["dumps"]:
+            digest.update(bytes(dump))
+    return int.from_bytes(digest.digest(), "little")
+
+
+def count_instructions(tblist):
+    """
+    Number of executed instructions, only known if tbinfo is collected
+    """
+    return sum(tb["ins_count"] * tb["num_exec"] for tb in tblist)
+
+
+def build_outcome(instruction_count, registerlist, memdumplist, runtime):
+    """
+    Summary of an experiment stored in the campaign wide outcome table
+    """
+    return {
+        "instruction_count": instruction_count,
+        "runtime": runtime,
+        "register_hash": hash_registers(registerlist),
+        "memdump_hash": hash_memdumps(memdumplist),
+    }
 
 
 def readout_tbexec(data_protobuf):
@@ -312,28 +461,64 @@ def readout_tbexec(data_protobuf):
     return pdtbexeclist
 
 
-def build_filters(tbinfogolden):
+def build_instruction_map(tbinfo):
     """
-    Build for each tb in tbinfo a filter
+    Parse the assembler strings of tbinfo once and build a table containing
+    each instruction with its address, size, owning tb and mnemonic
     """
-    filter_return = []
-    # Each assembler string
-    for tb in tbinfogolden["assembler"]:
-        tb_filter = []
+    if not isinstance(tbinfo, pd.DataFrame):
+        tbinfo = pd.DataFrame(tbinfo, columns=["id", "size", "assembler"])
+
+    instructions = []
+    for tb_id, tb_size, assembler in zip(
+        tbinfo["id"], tbinfo["size"], tbinfo["assembler"]
+    ):
         # remove first split, as it is empty
-        split = tb.split("[ ")
-        # For each line
-        for sp in split[1:]:
-            # select address
-            s = sp.split("]")
-            # Add to filter
-            tb_filter.append(int("0x" + s[0].strip(), 0))
-        # Sort addresses
-        tb_filter.sort()
-        # Reverse list so that last element is first
-        tb_filter.reverse()
-        # Append to filter list
-        filter_return.append(tb_filter)
+        lines = [line.split("]", 1) for line in assembler.split("[ ")[1:]]
+        addresses = [int(line[0], 16) for line in lines]
+        if not addresses:
+            continue
+
+        sizes = list(numpy.diff(addresses))
+        # calculate the last instr size
+        sizes.append(tb_size - (addresses[-1] - addresses[0]))
+
+        for line, address, size in zip(lines, addresses, sizes):
+            mnemonic = line[1].lstrip(":").split() if len(line) == 2 else []
+            instructions.append(
+                {
+                    "tb": int(tb_id),
+                    "address": address,
+                    "size": int(size),
+                    "mnemonic": mnemonic[0] if mnemonic else "",
+                }
+            )
+
+    instructions = pd.DataFrame(
+        instructions, columns=["tb", "address", "size", "mnemonic"]
+    )
+    return instructions.drop_duplicates(subset=["tb", "address"], ignore_index=True)
+
+
+def group_instructions_by_tb(instructions):
+    """
+    Map each tb of the instruction map to the addresses and sizes of its
+    instructions
+    """
+    return {
+        tb: (group["address"].tolist(), group["size"].tolist())
+        for tb, group in instructions.groupby("tb", sort=False)
+    }
+
+
+def build_filters(instructions):
+    """
+    Build for each tb in the instruction map a filter
+    """
+    filter_return = []
+    for addresses, _ in group_instructions_by_tb(instructions).values():
+        # Sort addresses and reverse list so that last element is first
+        filter_return.append(sorted(addresses, reverse=True))
     # Filter list for length of filter, so that the longest one is tested first
     filter_return.sort(key=len)
     filter_return.reverse()
@@ -410,11 +595,11 @@ def filter_function(tbexecpd, filt, tbinfopd):
         decrese_tb_info_element(f, len(idx), tbinfopd)
 
 
-def filter_tb(tbexeclist, tbinfo, tbexecgolden, tbinfogolden, id_num):
+def filter_tb(tbexeclist, tbinfo, tbexecgolden, filtersgolden, id_num):
     """
-    First create filter list, then find start of filter, then call recursive filter
+    Find the start of each filter of the goldenrun, built once by build_filters,
+    then call recursive filter
     """
-    filters = build_filters(tbinfogolden)
     tbexecpd = tbexeclist
     # Sort and re-index tb exec list
     tbexecpd.sort_values(by=["pos"], ascending=False, inplace=True)
@@ -422,11 +607,12 @@ def filter_tb(tbexeclist, tbinfo, tbexecgolden, tbinfogolden, id_num):
     tbexecpd["tb-1"] = tbexecpd["tb"].shift(periods=-1, fill_value=0)
     # Generate pandas frame for tbinfo
     tbinfopd = pd.DataFrame(tbinfo)
-    for filt in filters:
+    for filt in filtersgolden:
         # Only if filter has more than one element
         if len(filt) > 1:
-            # Perform search and invalidation of found matches
-            filter_function(tbexecpd, filt, tbinfopd)
+            # Perform search and invalidation of found matches, on a copy as
+            # the filter is reversed in place
+            filter_function(tbexecpd, list(filt), tbinfopd)
 
     diff = len(tbexecpd)
     # Search found filter matches
@@ -497,9 +683,9 @@ def readout_memdump(protobuf_msg):
         memdumpdict = {}
         memdumpdict["address"] = mem_dump_info.address
         memdumpdict["len"] = mem_dump_info.len
-        memdumpdict["dumps"] = []
-
-        memdumpdict["dumps"] = [list(dump.mem) for dump in mem_dump_info.dumps]
+        memdumpdict["dumps"] = [
+            numpy.frombuffer(dump.mem, numpy.uint8) for dump in mem_dump_info.dumps
+        ]
         n_dumps = len(memdumpdict["dumps"])
 
         memdumpdict["numdumps"] = n_dumps
@@ -574,12 +760,17 @@ def readout_data(
     queue_ram_usage=None,
     qemu_post=None,
     qemu_pre_data=None,
+    timings=None,
+    start_time=None,
 ):
     """
     This function will permanently try to read data from data pipe
     Furthermore it then builds the internal representation, which is collected
-    by the process writing to hdf 5 file
+    by the process writing to hdf 5 file. start_time is the start of the
+    emulation, it defaults to the start of the readout
     """
+    if start_time is None:
+        start_time = time.time()
     tblist = []
     pdtbexeclist = None
     memlist = []
@@ -592,6 +783,7 @@ def readout_data(
     meminfo = 0
     endpoint = 0
     end_reason = ""
+    instruction_count = 0
     max_ram_usage = 0
     regtype = None
 
@@ -599,7 +791,12 @@ def readout_data(
 
     # Load data from the pipe
     data_protobuf = data_pb2.Data()
-    data_protobuf.ParseFromString(pipe.read())
+    with stage_timer(timings, "qemu"):
+        data = pipe.read()
+    runtime = time.time() - start_time
+    with stage_timer(timings, "parse"):
+        data_protobuf.ParseFromString(data)
+    del data
 
     # Process loaded information
     output = {}
@@ -610,6 +807,9 @@ def readout_data(
     if len(data_protobuf.tb_informations) != 0:
         tbinfo = 1
         tblist = readout_tbinfo(data_protobuf)
+        # filter_tb drops the tbs of the goldenrun, so count the instructions
+        # of the complete run
+        instruction_count = count_instructions(tblist)
 
     if len(data_protobuf.mem_infos) != 0:
         meminfo = 1
@@ -633,13 +833,14 @@ def readout_data(
             if config_qemu["ring_buffer"]:
                 pdtbexeclist = pdtbexeclist.iloc[::-1]
             else:
-                [pdtbexeclist, tblist] = filter_tb(
-                    pdtbexeclist,
-                    tblist,
-                    goldenrun_data["tbexec"],
-                    goldenrun_data["tbinfo"],
-                    index,
-                )
+                with stage_timer(timings, "filter_tb"):
+                    [pdtbexeclist, tblist] = filter_tb(
+                        pdtbexeclist,
+                        tblist,
+                        goldenrun_data["tbexec"],
+                        goldenrun_data["filters"],
+                        index,
+                    )
 
     output["memdumplist"] = []
     if len(data_protobuf.mem_dump_infos) != 0:
@@ -682,22 +883,36 @@ def readout_data(
         if keyword.endswith("registers"):
             output[keyword] = data.to_dict("records")
         else:
-            output[keyword] = write_output_wrt_goldenrun(keyword, data, goldenrun_data)
+            with stage_timer(timings, "diff"):
+                output[keyword] = write_output_wrt_goldenrun(
+                    keyword, data, goldenrun_data
+                )
 
     output["index"] = index
     output["faultlist"] = faultlist
     output["endpoint"] = endpoint
     output["end_reason"] = end_reason
     output["architecture"] = data_protobuf.architecture
+    output["outcome"] = build_outcome(
+        instruction_count, registerlist, memdumplist, runtime
+    )
 
     if len(memmaplist) != 0:
         output["memmaplist"] = memmaplist
 
+    if goldenrun_data and config_qemu.get("delta_encoding", False):
+        with stage_timer(timings, "diff"):
+            encode_deltas(output, goldenrun_data, regtype)
+
     max_ram_usage = gather_process_ram_usage(queue_ram_usage, max_ram_usage)
 
     if callable(qemu_post):
         output = qemu_post(qemu_pre_data, output)
-    queue_output.put(output)
+    if timings is not None:
+        # Used by the logger to measure the time spent in the queue
+        output["queue_put_time"] = time.time()
+    with stage_timer(timings, "queue_put"):
+        queue_output.put(output)
 
     max_ram_usage = gather_process_ram_usage(queue_ram_usage, max_ram_usage)
 
@@ -760,7 +975,8 @@ def configure_qemu(control, config_qemu, num_faults, memorydump_list, index):
     control_message.tb_info = config_qemu["tb_info"]
     control_message.mem_info = config_qemu["mem_info"]
 
-    if "start" in config_qemu:
+    # Runs resumed from the snapshot are already at the start point
+    if "start" in config_qemu and not resumes_from_snapshot(config_qemu, index):
         control_message.has_start = True
         control_message.start_address = (config_qemu["start"])["address"]
         control_message.start_counter = (config_qemu["start"])["counter"]
@@ -808,11 +1024,13 @@ def python_worker(
     queue_ram_usage=None,
     qemu_pre=None,
     qemu_post=None,
+    queue_telemetry=None,
 ):
     """
     Qemu worker creates qemu controller, fills the pipes and collects the
     output of qemu
     """
+    timings = {} if queue_telemetry is not None else None
 
     # Setup qemu python part
     p_qemu = None
@@ -823,12 +1041,19 @@ def python_worker(
         t0 = time.time()
         if change_nice:
             os.nice(19)
-        paths = create_fifos()
+        with stage_timer(timings, "create_fifos"):
+            paths = create_fifos()
         if callable(qemu_pre):
             [qemu_pre_data, qemu_custom_paths] = qemu_pre()
         else:
             qemu_pre_data = None
             qemu_custom_paths = None
+        snapshot_image = None
+        if resumes_from_snapshot(config_qemu, index):
+            with stage_timer(timings, "copy_snapshot"):
+                snapshot_image = copy_snapshot(
+                    config_qemu, os.path.dirname(paths["control"])
+                )
         p_qemu = Process(
             target=run_qemu,
             args=(
@@ -839,6 +1064,7 @@ def python_worker(
                 engine_output,
                 index,
                 qemu_custom_paths,
+                snapshot_image,
             ),
         )
 
@@ -854,7 +1080,10 @@ def python_worker(
             memorydump = None
         logger.debug("Start configuring")
 
-        configure_qemu(control_fifo, config_qemu, len(fault_list), memorydump, index)
+        with stage_timer(timings, "configure_qemu"):
+            configure_qemu(
+                control_fifo, config_qemu, len(fault_list), memorydump, index
+            )
 
         logger.debug("Started QEMU")
         # Write faults to config pipe
@@ -875,6 +1104,8 @@ def python_worker(
             queue_ram_usage,
             qemu_post=qemu_post,
             qemu_pre_data=qemu_pre_data,
+            timings=timings,
+            start_time=t0,
         )
 
         if timeout_raised:
@@ -882,6 +1113,8 @@ def python_worker(
             p_qemu.terminate()
 
         p_qemu.join()
+        if snapshot_image is not None:
+            os.remove(snapshot_image)
         delete_fifos()
 
         logger.debug(
@@ -891,6 +1124,7 @@ def python_worker(
         )
         if queue_ram_usage is not None:
             queue_ram_usage.put(mem)
+        send_timings(queue_telemetry, index, timings)
     except KeyboardInterrupt:
         p_qemu.terminate()
         p_qemu.join()
@@ -898,19 +1132,25 @@ def python_worker(
 
 
 def python_worker_unicorn(
-    fault_list,
+    experiments,
     config_qemu,
-    index,
     queue_output,
     engine_output,
     pregoldenrun_data,
     goldenrun_data,
     change_nice=False,
+    queue_telemetry=None,
 ):
-    global run_unicorn
+    """
+    Emulate a list of experiments with unicorn on config_qemu["unicorn_threads"]
+    threads. Experiments with a single fault at the same trigger position share
+    the emulation up to the trigger. The results are processed in the order the
+    experiments finish, while the remaining ones are still emulated
+    """
+    global run_unicorn_batch
 
     # load unicorn module on demand
-    if not run_unicorn:
+    if not run_unicorn_batch:
         import importlib.util
         from pathlib import Path
 
@@ -925,44 +1165,87 @@ def python_worker_unicorn(
         mod = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(mod)
 
-        run_unicorn = mod.run_unicorn
+        run_unicorn_batch = mod.run_unicorn_batch
 
     t0 = time.time()
     if change_nice:
         os.nice(19)
 
-    logs = run_unicorn(pregoldenrun_data, fault_list, config_qemu, index, engine_output)
-    logger.info(f"Ended unicorn for exp {index}! Took {time.time() - t0}")
+    results = run_unicorn_batch(
+        pregoldenrun_data,
+        [experiment["faultlist"] for experiment in experiments],
+        config_qemu,
+        experiments[0]["index"],
+        engine_output,
+        config_qemu.get("unicorn_threads", 1),
+    )
 
-    output = {}
+    for position, logs in results:
+        t1 = time.time()
+        # Measured by the emulation worker, the experiments are emulated in
+        # parallel to the processing of the previous results
+        emulation_time = logs["runtime"]
+        experiment = experiments[position]
+        index = experiment["index"]
+        timings = {"unicorn": emulation_time} if queue_telemetry is not None else None
+
+        output = {}
+
+        # The tables are returned as columns and passed to the logger as
+        # DataFrames, which it writes at once
+        for memdump in logs["memdumplist"]:
+            memdump["dumps"] = [
+                numpy.frombuffer(dump, numpy.uint8) for dump in memdump["dumps"]
+            ]
+        registers = read_columns(logs["registerlist"]).astype(numpy.uint64)
+
+        output["index"] = index
+        output["faultlist"] = experiment["faultlist"]
+        output["endpoint"] = logs["endpoint"]
+        output["end_reason"] = logs["end_reason"]
+        output["memdumplist"] = logs["memdumplist"]
+        output["meminfo"] = read_columns(logs["meminfo"])
+        output["outcome"] = build_outcome(
+            count_instructions(logs["tbinfo"]),
+            registers,
+            logs["memdumplist"],
+            emulation_time,
+        )
 
-    output["index"] = index
-    output["faultlist"] = fault_list
-    output["endpoint"] = logs["endpoint"]
-    output["end_reason"] = logs["end_reason"]
-    output["memdumplist"] = logs["memdumplist"]
-    output["meminfo"] = logs["meminfo"]
-
-    pdtbexeclist = pd.DataFrame(logs["tbexec"])
-    [pdtbexeclist, tblist] = filter_tb(
-        pdtbexeclist,
-        logs["tbinfo"],
-        goldenrun_data["tbexec"],
-        goldenrun_data["tbinfo"],
-        index,
-    )
-    output["tbexec"] = write_output_wrt_goldenrun(
-        "tbexec", pdtbexeclist, goldenrun_data
-    )
-    output["tbinfo"] = write_output_wrt_goldenrun("tbinfo", tblist, goldenrun_data)
+        pdtbexeclist = read_columns(logs["tbexec"])
+        with stage_timer(timings, "filter_tb"):
+            [pdtbexeclist, tblist] = filter_tb(
+                pdtbexeclist,
+                logs["tbinfo"],
+                goldenrun_data["tbexec"],
+                goldenrun_data["filters"],
+                index,
+            )
+        with stage_timer(timings, "diff"):
+            output["tbexec"] = diff_to_goldenrun("tbexec", pdtbexeclist, goldenrun_data)
+            output["tbinfo"] = write_output_wrt_goldenrun(
+                "tbinfo", tblist, goldenrun_data
+            )
+
+        regtype = pregoldenrun_data["architecture"]
+        output[f"{regtype}registers"] = registers
+
+        if config_qemu.get("delta_encoding", False):
+            with stage_timer(timings, "diff"):
+                encode_deltas(output, goldenrun_data, regtype)
 
-    regtype = pregoldenrun_data["architecture"]
-    output[f"{regtype}registers"] = pd.DataFrame(
-        logs["registerlist"], dtype="UInt64"
-    ).to_dict("records")
+        if timings is not None:
+            output["queue_put_time"] = time.time()
+        with stage_timer(timings, "queue_put"):
+            queue_output.put(output)
+        send_timings(queue_telemetry, index, timings)
 
-    queue_output.put(output)
+        logger.info(
+            "Python worker for experiment {} done. Took {}s".format(
+                index, emulation_time + time.time() - t1
+            )
+        )
 
     logger.info(
-        "Python worker for experiment {} done. Took {}s".format(index, time.time() - t0)
+        f"Ended unicorn for {len(experiments)} experiments! Took {time.time() - t0}"
     )
@@ -17,13 +17,14 @@
 import copy
 import logging
 from multiprocessing import Queue
-import numpy
 
 import pandas as pd
 from tqdm import tqdm
 
 from calculate_trigger import calculate_trigger_addresses
 from faultclass import Fault
+from faultclass import build_instruction_map
+from faultclass import group_instructions_by_tb
 from faultclass import python_worker
 
 logger = logging.getLogger(__name__)
@@ -52,6 +53,10 @@ def run_goldenrun(
         goldenrun_config["max_instruction_count"] = config_qemu["max_instruction_count"]
     if "memorydump" in config_qemu:
         goldenrun_config["memorydump"] = config_qemu["memorydump"]
+    # The goldenrun resumes from the same snapshot as the experiments, so that
+    # both count from the same point
+    if "snapshot_image" in config_qemu:
+        goldenrun_config["snapshot_image"] = config_qemu["snapshot_image"]
 
     def run_experiment(experiment, config, faultconfig):
         logger.info(f"{experiment['type']} started...")
@@ -79,16 +84,22 @@ def run_goldenrun(
             )
 
         logger.info(f"{experiment['type']} successfully finished.")
-        data_queue.put(experiment["data"])
 
         if experiment["type"] != "goldenrun":
+            data_queue.put(experiment["data"])
             return experiment["data"]
 
-        tbexec = pd.DataFrame(experiment["data"]["tbexec"])
+        # Parse the assembler of the goldenrun once, all later stages work on
+        # the resulting instruction map
         tbinfo = pd.DataFrame(experiment["data"]["tbinfo"])
-        process_wildcard_faults(faultconfig, tbexec, tbinfo)
-        process_single_faults(faultconfig, tbexec, tbinfo)
-        calculate_trigger_addresses(faultconfig, tbexec, tbinfo)
+        instructions = build_instruction_map(tbinfo)
+        experiment["data"]["instructions"] = instructions.to_dict("records")
+        data_queue.put(experiment["data"])
+
+        tbexec = pd.DataFrame(experiment["data"]["tbexec"])
+        process_wildcard_faults(faultconfig, tbexec, tbinfo, instructions)
+        process_single_faults(faultconfig, tbexec, instructions)
+        calculate_trigger_addresses(faultconfig, tbexec, tbinfo, instructions)
         faultconfig = checktriggers_in_tb(faultconfig, experiment["data"])
 
         if "end" in config_qemu:
@@ -201,7 +212,7 @@ def checktriggers_in_tb(faultconfig, data):
     return faultconfig
 
 
-def generate_wildcard_faults(fault, tbexec, tbinfo):
+def generate_wildcard_faults(fault, tbexec, tbinfo, tb_instructions):
     # Initialize list of TBs used during fault generation
     tb_start = tbinfo["id"].copy()
     tb_start.index = tbinfo["id"]
@@ -223,7 +234,6 @@ def generate_wildcard_faults(fault, tbexec, tbinfo):
     wildcard_range_end_reached = False
     wildcard_local_active = False
 
-    tbinfo_tb_indexed = tbinfo.set_index("id")
     for tb in tqdm(tbexec["tb"], leave=False):
         tb_hitcounters_analyzed = False
         # Instruction-specific hitcounters
@@ -234,16 +244,7 @@ def generate_wildcard_faults(fault, tbexec, tbinfo):
         tb_hitcounters.at[tb, "hitcounter"] += 1
 
         # Iterate over instructions in the translation block
-        tb_info_asm = tbinfo_tb_indexed.at[tb, "assembler"]
-        tb_info_total_size = tbinfo_tb_indexed.at[tb, "size"]
-
-        tb_info_asm = [
-            int(instr.split("]")[0], 16) for instr in tb_info_asm.split("[ ")[1:]
-        ]
-        tb_info_size = list(numpy.diff(tb_info_asm))
-        tb_info_size.append(
-            tb_info_total_size - sum(tb_info_size)
-        )  # calculate the last instr size
+        tb_info_asm, tb_info_size = tb_instructions[tb]
 
         for idx, instr in enumerate(tb_info_asm):
             # Evaluate start and stop conditions (global)
@@ -378,7 +379,7 @@ def generate_wildcard_faults(fault, tbexec, tbinfo):
     return wildcard_faults
 
 
-def process_wildcard_faults(faultconfig, tbexec, tbinfo):
+def process_wildcard_faults(faultconfig, tbexec, tbinfo, instructions):
     logger.info("Identifying and processing wildcard faults")
 
     # Construct index base from last fault entry
@@ -395,13 +396,17 @@ def process_wildcard_faults(faultconfig, tbexec, tbinfo):
         logger.info("No wildcard fault")
         return
 
+    tb_instructions = group_instructions_by_tb(instructions)
+
     pbar = tqdm(total=n_wildcard_faults, desc="Processing wildcards")
     for faultentry in faultconfig:
         expanded_faults = []
 
         for fault in faultentry["faultlist"]:
             if fault.wildcard:
-                wildcard_faults += generate_wildcard_faults(fault, tbexec, tbinfo)
+                wildcard_faults += generate_wildcard_faults(
+                    fault, tbexec, tbinfo, tb_instructions
+                )
 
                 # The wildcard fault entry has been expanded, mark it for
                 # removal
@@ -426,43 +431,34 @@ def process_wildcard_faults(faultconfig, tbexec, tbinfo):
         faultconfig.append(new_fault_entry)
 
 
-def process_single_faults(faultconfig, tbexec, tbinfo):
+def process_single_faults(faultconfig, tbexec, instructions):
+    # Instruction sizes of all instructions in executed TBs, first tb in
+    # execution order wins if an address is part of multiple TBs
+    executed = pd.DataFrame({"tb": tbexec["tb"].unique()}).merge(instructions, on="tb")
+    instruction_sizes = executed.drop_duplicates(subset="address").set_index("address")[
+        "size"
+    ]
+
     remove_list = []
     for faultentry in faultconfig:
         for fault in faultentry["faultlist"]:
             if not isinstance(fault.mask, dict):
                 continue
 
-            tbinfo_tb_indexed = tbinfo.set_index("id")
-            for tb in tqdm(tbexec["tb"], leave=False):
-                tb_info_asm = tbinfo_tb_indexed.at[tb, "assembler"]
-                tb_info_total_size = tbinfo_tb_indexed.at[tb, "size"]
-
-                tb_info_asm = [
-                    int(instr.split("]")[0], 16)
-                    for instr in tb_info_asm.split("[ ")[1:]
-                ]
-                if fault.address not in tb_info_asm:
-                    continue
-
-                tb_info_size = list(numpy.diff(tb_info_asm))
-                tb_info_size.append(
-                    tb_info_total_size - sum(tb_info_size)
-                )  # calculate the last instr size
-
-                fault_idx = tb_info_asm.index(fault.address)
+            if fault.address not in instruction_sizes.index:
+                continue
 
-                try:
-                    fault.mask = fault.mask[str(tb_info_size[fault_idx])]
-                    fault.num_bytes = tb_info_size[fault_idx]
-                except (ValueError, KeyError):
-                    logger.info(
-                        f"No matching fault mask could be found for fault entry {faultentry['index']}, "
-                        f"removing the fault entry..."
-                    )
-                    remove_list.append(faultentry)
+            instruction_size = int(instruction_sizes.at[fault.address])
 
-                break
+            try:
+                fault.mask = fault.mask[str(instruction_size)]
+                fault.num_bytes = instruction_size
+            except (ValueError, KeyError):
+                logger.info(
+                    f"No matching fault mask could be found for fault entry {faultentry['index']}, "
+                    f"removing the fault entry..."
+                )
+                remove_list.append(faultentry)
 
     for faultentry in remove_list:
         faultconfig.remove(faultentry)
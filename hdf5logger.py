@@ -14,18 +14,88 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import partial
+import hashlib
 import queue
 import signal
 import logging
 import time
 
 import numpy
+import pandas as pd
 import prctl
 import tables
 from tqdm import tqdm
 
+from telemetry import bucket_upper_bound, send_timings, stage_timer
+
 logger = logging.getLogger(__name__)
 
+# Seconds the logger waits for new results before checking the stop signal
+QUEUE_TIMEOUT = 0.1
+
+# Table types with a configurable compression and the experiment keywords
+# they are written from
+TABLE_TYPES = {
+    "tbexec": ["tbexec"],
+    "meminfo": ["meminfo"],
+    "memdumps": ["memdumplist", "memdumpdeltas"],
+    "registers": [
+        "armregisters",
+        "riscvregisters",
+        "aarch64registers",
+        "registerdeltas",
+    ],
+}
+
+
+def create_filters(compressionlevel, compression=None):
+    """
+    Build the hdf5 filters per experiment keyword. compression maps "default"
+    and the table types to a complib of PyTables, e.g. "zlib", "blosc:lz4" or
+    "blosc2:zstd". Byte shuffling is enabled for all of them
+    """
+    compression = compression or {}
+    default = compression.get("default", "zlib")
+
+    filters = {
+        "default": tables.Filters(
+            complevel=compressionlevel, complib=default, shuffle=True
+        )
+    }
+    for table_type, keywords in TABLE_TYPES.items():
+        table_filter = tables.Filters(
+            complevel=compressionlevel,
+            complib=compression.get(table_type, default),
+            shuffle=True,
+        )
+        for keyword in keywords:
+            filters[keyword] = table_filter
+    return filters
+
+
+def get_filter(myfilter, keyword):
+    """
+    Return the filter of the keyword if myfilter was created by create_filters,
+    otherwise the same filter is used for all tables
+    """
+    if isinstance(myfilter, dict):
+        return myfilter.get(keyword, myfilter["default"])
+    return myfilter
+
+
+def leaf_table_type(node):
+    """
+    Name under which the size of a leaf of an experiment is accounted. The
+    leaves of the memory dump groups and of the assembler store are accounted
+    together
+    """
+    if node._v_parent._v_name in ["memdumps", "Memdumps"]:
+        return "memdumps"
+    if node._v_parent._v_name == "Assembler":
+        return "assembler"
+    return node.name
+
 
 def register_signal_handlers():
     """
@@ -41,6 +111,19 @@ class translation_block_exec_table(tables.IsDescription):
     pos = tables.UInt64Col()
 
 
+class translation_block_table(tables.IsDescription):
+    identity = tables.UInt64Col()
+    size = tables.UInt64Col()
+    ins_count = tables.UInt64Col()
+    num_exec = tables.UInt64Col()
+    assembler_id = tables.UInt64Col()
+
+
+class translation_block_faulted_table(tables.IsDescription):
+    faultaddress = tables.UInt64Col()
+    assembler_id = tables.UInt64Col()
+
+
 class memory_information_table(tables.IsDescription):
     insaddr = tables.Int64Col()
     tbid = tables.UInt64Col()
@@ -201,18 +284,330 @@ class memmap_table(tables.IsDescription):
     size = tables.UInt64Col()
 
 
+class memory_dump_delta_table(tables.IsDescription):
+    location = tables.UInt64Col()
+    dump = tables.UInt64Col()
+    offset = tables.UInt64Col()
+    value = tables.UInt8Col()
+
+
+class content_store_table(tables.IsDescription):
+    id = tables.UInt64Col()
+    digest = tables.StringCol(32)
+    offset = tables.UInt64Col()
+    length = tables.UInt64Col()
+
+
+class memory_dump_reference_table(tables.IsDescription):
+    location = tables.UInt64Col()
+    dump = tables.UInt64Col()
+    id = tables.UInt64Col()
+
+
 binary_atom = tables.UInt8Atom()
 
 
-def process_tb_faulted(f, group, tbfaulted_list, myfilter):
-    assembler_size = max(
-        (len(tbfaulted["assembly"]) for tbfaulted in tbfaulted_list), default=1
+# The campaign wide tables use signed columns, as PyTables can not query
+# 64 bit unsigned columns in kernel. Unsigned values are stored as their two's
+# complement
+class outcome_table(tables.IsDescription):
+    index = tables.Int64Col()
+    experiment = tables.StringCol(32)
+    end_reason = tables.UInt32Col()
+    endpoint = tables.Int32Col()
+    instruction_count = tables.Int64Col()
+    runtime = tables.Float64Col()
+    register_hash = tables.Int64Col()
+    memdump_hash = tables.Int64Col()
+
+
+class fault_parameter_table(tables.IsDescription):
+    index = tables.Int64Col()
+    trigger_address = tables.Int64Col()
+    trigger_hitcounter = tables.Int64Col()
+    fault_address = tables.Int64Col()
+    fault_type = tables.UInt8Col()
+    fault_model = tables.UInt8Col()
+    fault_lifespan = tables.Int64Col()
+    fault_mask_upper = tables.Int64Col()
+    fault_mask = tables.Int64Col()
+    fault_num_bytes = tables.UInt8Col()
+    fault_wildcard = tables.BoolCol()
+
+
+# Columns of the campaign wide tables with an index for the queries
+OUTCOME_INDEXES = ["index", "end_reason", "endpoint"]
+FAULT_PARAMETER_INDEXES = [
+    "index",
+    "trigger_address",
+    "fault_address",
+    "fault_type",
+    "fault_model",
+]
+
+
+def to_signed(value):
+    """
+    Two's complement of an unsigned 64 bit value
+    """
+    value = int(value)
+    return value - 2**64 if value >= 2**63 else value
+
+
+def remove_experiment_rows(table):
+    """
+    Remove the rows of the experiments from a campaign wide table, but keep the
+    goldenruns
+    """
+    goldenruns = table.read_where("index < 0")
+    table.truncate(0)
+    if len(goldenruns):
+        table.append(goldenruns)
+    table.flush()
+
+
+def create_indexes(table, columns):
+    """
+    Create the column indexes, existing indexes are updated by PyTables on
+    every flush
+    """
+    for column in columns:
+        if not table.cols._f_col(column).is_indexed:
+            table.cols._f_col(column).create_index()
+
+
+def iter_logged_runs(f):
+    """
+    Index and group of the runs already in the file, the pregoldenrun and
+    goldenrun have the indexes -2 and -1
+    """
+    for index, name in [(-2, "Pregoldenrun"), (-1, "Goldenrun")]:
+        if name in f.root:
+            yield index, f.root._f_get_child(name)
+    if "fault" in f.root:
+        for group in f.root.fault._f_iter_nodes("Group"):
+            yield int(group._v_name[len("experiment") :]), group
+
+
+class OutcomeTable:
+    """
+    Campaign wide table with one row per run, so that the results of a
+    campaign can be summarized without opening every experiment group. The end
+    reasons are stored as codes into the end_reasons attribute
+    """
+
+    def __init__(self, f, myfilter):
+        if "Outcomes" in f.root:
+            self.table = f.root.Outcomes
+            self.end_reasons = list(self.table.attrs.end_reasons)
+        else:
+            self.table = f.create_table(
+                "/",
+                "Outcomes",
+                outcome_table,
+                "Outcome of each experiment of the campaign",
+                filters=myfilter,
+            )
+            self.table.attrs.end_reasons = []
+            self.end_reasons = []
+            self.backfill(f)
+
+    def backfill(self, f):
+        """
+        Add the runs of a file written by an older version. Only the end
+        reason and endpoint are known for them, the other columns are 0
+        """
+        for index, group in iter_logged_runs(f):
+            if "faults" not in group:
+                continue
+            attrs = group.faults.attrs
+            exp = {"end_reason": str(attrs.end_reason), "endpoint": int(attrs.endpoint)}
+            self.append(index, group._v_name, exp)
+        self.table.flush()
+
+    def add(self, index, name, exp):
+        self.append(index, name, exp)
+        self.table.flush()
+
+    def append(self, index, name, exp):
+        if exp["end_reason"] not in self.end_reasons:
+            self.end_reasons.append(exp["end_reason"])
+            self.table.attrs.end_reasons = self.end_reasons
+
+        outcome = exp.get("outcome", {})
+        row = self.table.row
+        row["index"] = index
+        row["experiment"] = name
+        row["end_reason"] = self.end_reasons.index(exp["end_reason"])
+        row["endpoint"] = exp["endpoint"]
+        row["instruction_count"] = outcome.get("instruction_count", 0)
+        row["runtime"] = outcome.get("runtime", 0)
+        row["register_hash"] = to_signed(outcome.get("register_hash", 0))
+        row["memdump_hash"] = to_signed(outcome.get("memdump_hash", 0))
+        row.append()
+
+    def summary(self):
+        """
+        Number of experiments per end reason
+        """
+        codes = self.table.read_where("index >= 0", field="end_reason")
+        counts = numpy.bincount(codes, minlength=len(self.end_reasons))
+        return {
+            reason: int(count)
+            for reason, count in zip(self.end_reasons, counts)
+            if count
+        }
+
+
+class FaultParameterTable:
+    """
+    Campaign wide table with the parameters of all faults and the index of
+    their experiment. The analysis queries it instead of the faults tables of
+    the experiment groups
+    """
+
+    def __init__(self, f, myfilter):
+        if "FaultParameters" in f.root:
+            self.table = f.root.FaultParameters
+        else:
+            self.table = f.create_table(
+                "/",
+                "FaultParameters",
+                fault_parameter_table,
+                "Parameters of the faults of all experiments",
+                filters=myfilter,
+            )
+            self.backfill(f)
+
+    def backfill(self, f):
+        """
+        Add the faults of the experiments of a file written by an older version
+        """
+        row = self.table.row
+        for index, group in iter_logged_runs(f):
+            if index < 0 or "faults" not in group:
+                continue
+            for fault in group.faults.iterrows():
+                row["index"] = index
+                for column in group.faults.colnames:
+                    if self.table.coltypes[column] == "int64":
+                        row[column] = to_signed(fault[column])
+                    else:
+                        row[column] = fault[column]
+                row.append()
+        self.table.flush()
+
+    def add(self, index, faultlist):
+        row = self.table.row
+        for fault in faultlist:
+            row["index"] = index
+            row["trigger_address"] = to_signed(fault.trigger.address)
+            row["trigger_hitcounter"] = to_signed(fault.trigger.hitcounter)
+            row["fault_address"] = to_signed(fault.address)
+            row["fault_type"] = fault.type
+            row["fault_model"] = fault.model
+            row["fault_lifespan"] = to_signed(fault.lifespan)
+            row["fault_mask_upper"] = to_signed((fault.mask >> 64) & (pow(2, 64) - 1))
+            row["fault_mask"] = to_signed(fault.mask & (pow(2, 64) - 1))
+            row["fault_num_bytes"] = fault.num_bytes
+            row["fault_wildcard"] = fault.wildcard
+            row.append()
+        self.table.flush()
+
+
+class ContentStore:
+    """
+    Campaign wide store of distinct binary data in a group of the root, e.g.,
+    memory dumps or assembler strings. The entries are concatenated in the
+    data array and found by the blake2b digest of their content, so every
+    distinct entry is only stored once
+    """
+
+    def __init__(self, f, name, title, myfilter):
+        if name in f.root:
+            group = f.root._f_get_child(name)
+            self.index = group.index
+            self.data = group.data
+        else:
+            group = f.create_group("/", name, title)
+            self.index = f.create_table(
+                group,
+                "index",
+                content_store_table,
+                "Position of each distinct entry in data",
+                filters=myfilter,
+            )
+            self.data = f.create_earray(
+                group, "data", binary_atom, (0,), filters=myfilter
+            )
+        self.ids = {row["digest"]: row["id"] for row in self.index.iterrows()}
+
+    def add(self, content):
+        """
+        Store the content (bytes) if it is not yet known and return its id
+        """
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest().encode()
+        if digest in self.ids:
+            return self.ids[digest]
+
+        content_id = len(self.ids)
+        row = self.index.row
+        row["id"] = content_id
+        row["digest"] = digest
+        row["offset"] = self.data.nrows
+        row["length"] = len(content)
+        row.append()
+        self.data.append(numpy.frombuffer(content, dtype=numpy.uint8))
+        self.ids[digest] = content_id
+        return content_id
+
+    def flush(self):
+        self.index.flush()
+        self.data.flush()
+
+
+def create_memdump_store(f, myfilter):
+    return ContentStore(
+        f, "Memdumps", "Group containing the distinct memory dumps", myfilter
+    )
+
+
+def create_assembler_store(f, myfilter):
+    return ContentStore(
+        f,
+        "Assembler",
+        "Group containing the distinct assembler strings of translation blocks",
+        myfilter,
     )
 
-    class translation_block_faulted_table(tables.IsDescription):
-        faultaddress = tables.UInt64Col()
-        assembler = tables.StringCol(assembler_size)
 
+def read_contents(f, name, ids):
+    """
+    Return the entries of the content store name for the given ids
+    """
+    group = f.root._f_get_child(name)
+    # The ids of the store are its row numbers
+    rows = group.index.read_coordinates(numpy.asarray(ids, dtype=numpy.int64))
+    data = group.data
+    return [
+        data[row["offset"] : row["offset"] + row["length"]].tobytes() for row in rows
+    ]
+
+
+def read_assembler(f, table):
+    """
+    Return the assembler strings of a tbinfo or tbfaulted table, files written
+    before the assembler store contain them directly
+    """
+    if "assembler" in table.colnames:
+        return [assembler.decode("utf-8") for assembler in table.col("assembler")]
+    return [
+        assembler.decode("utf-8")
+        for assembler in read_contents(f, "Assembler", table.col("assembler_id"))
+    ]
+
+
+def process_tb_faulted(f, group, tbfaulted_list, myfilter, assembler_store):
     tbfaultedtable = f.create_table(
         group,
         "tbfaulted",
@@ -224,12 +619,25 @@ def process_tb_faulted(f, group, tbfaulted_list, myfilter):
     tbfaultedrow = tbfaultedtable.row
     for tbfaulted in tbfaulted_list:
         tbfaultedrow["faultaddress"] = tbfaulted["faultaddress"]
-        tbfaultedrow["assembler"] = tbfaulted["assembly"]
+        tbfaultedrow["assembler_id"] = assembler_store.add(
+            tbfaulted["assembly"].encode("utf-8")
+        )
         tbfaultedrow.append()
     tbfaultedtable.flush()
     tbfaultedtable.close()
 
 
+def append_frame(table, frame, columns=None):
+    """
+    Append all rows of a DataFrame at once instead of row by row. columns maps
+    the table columns to the columns of the frame, by default they are equal
+    """
+    rows = numpy.empty(len(frame), dtype=table.dtype)
+    for name in rows.dtype.names:
+        rows[name] = frame[columns.get(name, name) if columns else name].to_numpy()
+    table.append(rows)
+
+
 def process_riscv_registers(f, group, riscvregister_list, myfilter):
     riscvregistertable = f.create_table(
         group,
@@ -239,6 +647,9 @@ def process_riscv_registers(f, group, riscvregister_list, myfilter):
         expectedrows=(len(riscvregister_list)),
         filters=myfilter,
     )
+    if isinstance(riscvregister_list, pd.DataFrame):
+        append_frame(riscvregistertable, riscvregister_list)
+        riscvregister_list = []
     riscvregsrow = riscvregistertable.row
     for regs in riscvregister_list:
         riscvregsrow["pc"] = regs["pc"]
@@ -259,6 +670,9 @@ def process_arm_registers(f, group, armregisters_list, myfilter):
         expectedrows=(len(armregisters_list)),
         filters=myfilter,
     )
+    if isinstance(armregisters_list, pd.DataFrame):
+        append_frame(armregisterstable, armregisters_list)
+        armregisters_list = []
     armregsrow = armregisterstable.row
     for regs in armregisters_list:
         armregsrow["pc"] = regs["pc"]
@@ -280,6 +694,9 @@ def process_aarch64_registers(f, group, aarch64registers_list, myfilter):
         expectedrows=(len(aarch64registers_list)),
         filters=myfilter,
     )
+    if isinstance(aarch64registers_list, pd.DataFrame):
+        append_frame(aarch64registerstable, aarch64registers_list)
+        aarch64registers_list = []
     aarch64mregsrow = aarch64registerstable.row
     for regs in aarch64registers_list:
         aarch64mregsrow["pc"] = regs["pc"]
@@ -323,6 +740,115 @@ def process_dumps(f, group, memdumplist, myfilter):
     memdumpstable.close()
 
 
+def process_dumps_deduplicated(f, group, memdumplist, myfilter, memdump_store):
+    """
+    Same as process_dumps, but the dumps are stored in the memdump_store and
+    the experiment only references their ids
+    """
+    memdumpsgroup = f.create_group(group, "memdumps")
+    memdumpstable = f.create_table(
+        memdumpsgroup,
+        "memdumps",
+        memory_dump_table,
+        "Table containing description about the dumps, that are saved in /Memdumps.",
+        expectedrows=(len(memdumplist)),
+        filters=myfilter,
+    )
+    referencetable = f.create_table(
+        memdumpsgroup,
+        "references",
+        memory_dump_reference_table,
+        "Ids of the dumps in /Memdumps",
+        expectedrows=sum(memdump["numdumps"] for memdump in memdumplist),
+        filters=myfilter,
+    )
+    memdumpsrow = memdumpstable.row
+    referencerow = referencetable.row
+    locations = set()
+    for memdump in memdumplist:
+        location = (memdump["address"], memdump["len"], memdump["numdumps"])
+        if location in locations:
+            continue
+        memdumpsrow["address"] = memdump["address"]
+        memdumpsrow["length"] = memdump["len"]
+        memdumpsrow["numdumps"] = memdump["numdumps"]
+        memdumpsrow.append()
+        for i, dump in enumerate(memdump["dumps"]):
+            referencerow["location"] = len(locations)
+            referencerow["dump"] = i
+            referencerow["id"] = memdump_store.add(
+                numpy.asarray(dump, dtype=numpy.uint8).tobytes()
+            )
+            referencerow.append()
+        locations.add(location)
+    memdumpstable.flush()
+    memdumpstable.close()
+    referencetable.flush()
+    referencetable.close()
+    memdump_store.flush()
+
+
+def process_memdump_deltas(f, group, memdumpdeltas, myfilter):
+    deltatable = f.create_table(
+        group,
+        "memdumpdeltas",
+        memory_dump_delta_table,
+        "Bytes of the memory dumps that differ from the goldenrun",
+        expectedrows=len(memdumpdeltas["deltas"]),
+        filters=myfilter,
+    )
+    # Locations as (address, length, numdumps), referenced by their position
+    deltatable.attrs.locations = numpy.array(
+        [
+            (location["address"], location["len"], location["numdumps"])
+            for location in memdumpdeltas["locations"]
+        ],
+        dtype=numpy.uint64,
+    ).reshape(-1, 3)
+    deltarow = deltatable.row
+    for delta in memdumpdeltas["deltas"]:
+        deltarow["location"] = delta["location"]
+        deltarow["dump"] = delta["dump"]
+        deltarow["offset"] = delta["offset"]
+        deltarow["value"] = delta["value"]
+        deltarow.append()
+    deltatable.flush()
+    deltatable.close()
+
+
+def process_register_deltas(f, group, registerdeltas, myfilter):
+    # Sized for the dump with the most changed registers
+    values_size = max(
+        [len(delta["values"]) for delta in registerdeltas["deltas"]] + [1]
+    )
+
+    class register_delta_table(tables.IsDescription):
+        dump = tables.UInt64Col()
+        mask = tables.UInt64Col()
+        values = tables.UInt64Col(shape=(values_size,))
+
+    deltatable = f.create_table(
+        group,
+        "registerdeltas",
+        register_delta_table,
+        "Registers that differ from the goldenrun and their values",
+        expectedrows=len(registerdeltas["deltas"]),
+        filters=myfilter,
+    )
+    deltatable.attrs.architecture = registerdeltas["architecture"]
+    deltatable.attrs.registers = registerdeltas["registers"]
+    deltarow = deltatable.row
+    for delta in registerdeltas["deltas"]:
+        values = numpy.zeros(values_size, dtype=numpy.uint64)
+        values[: len(delta["values"])] = delta["values"]
+        deltarow["dump"] = delta["dump"]
+        deltarow["mask"] = delta["mask"]
+        deltarow["values"] = values
+        deltarow.append()
+    deltatable.flush()
+    deltatable.close()
+
+
 def process_memmap(f, group, memmaplist, myfilter):
     _memmap_table = f.create_table(
         group,
@@ -370,16 +896,7 @@ def process_faults(f, group, faultlist, endpoint, end_reason, myfilter, name="fa
     faulttable.close()
 
 
-def process_tbinfo(f, group, tbinfolist, myfilter):
-    assembler_size = max((len(tbinfo["assembler"]) for tbinfo in tbinfolist), default=1)
-
-    class translation_block_table(tables.IsDescription):
-        identity = tables.UInt64Col()
-        size = tables.UInt64Col()
-        ins_count = tables.UInt64Col()
-        num_exec = tables.UInt64Col()
-        assembler = tables.StringCol(assembler_size)
-
+def process_tbinfo(f, group, tbinfolist, myfilter, assembler_store):
     tbinfotable = f.create_table(
         group,
         "tbinfo",
@@ -394,12 +911,44 @@ def process_tbinfo(f, group, tbinfolist, myfilter):
         tbinforow["size"] = tbinfo["size"]
         tbinforow["ins_count"] = tbinfo["ins_count"]
         tbinforow["num_exec"] = tbinfo["num_exec"]
-        tbinforow["assembler"] = tbinfo["assembler"]
+        tbinforow["assembler_id"] = assembler_store.add(
+            tbinfo["assembler"].encode("utf-8")
+        )
         tbinforow.append()
     tbinfotable.flush()
     tbinfotable.close()
 
 
+def process_instructions(f, group, instructionlist, myfilter):
+    mnemonic_size = max(
+        (len(instruction["mnemonic"]) for instruction in instructionlist), default=1
+    )
+
+    class instruction_table(tables.IsDescription):
+        tb = tables.UInt64Col()
+        address = tables.UInt64Col()
+        size = tables.UInt64Col()
+        mnemonic = tables.StringCol(max(mnemonic_size, 1))
+
+    instructiontable = f.create_table(
+        group,
+        "instructions",
+        instruction_table,
+        "Instruction map containing each instruction parsed from tbinfo",
+        expectedrows=(len(instructionlist)),
+        filters=myfilter,
+    )
+    instructionrow = instructiontable.row
+    for instruction in instructionlist:
+        instructionrow["tb"] = instruction["tb"]
+        instructionrow["address"] = instruction["address"]
+        instructionrow["size"] = instruction["size"]
+        instructionrow["mnemonic"] = instruction["mnemonic"]
+        instructionrow.append()
+    instructiontable.flush()
+    instructiontable.close()
+
+
 def process_tbexec(f, group, tbexeclist, myfilter):
     tbexectable = f.create_table(
         group,
@@ -409,6 +958,9 @@ def process_tbexec(f, group, tbexeclist, myfilter):
         expectedrows=(len(tbexeclist)),
         filters=myfilter,
     )
+    if isinstance(tbexeclist, pd.DataFrame):
+        append_frame(tbexectable, tbexeclist)
+        tbexeclist = []
     tbexecrow = tbexectable.row
     for tbexec in tbexeclist:
         tbexecrow["tb"] = tbexec["tb"]
@@ -427,6 +979,9 @@ def process_memory_info(f, group, meminfolist, myfilter):
         expectedrows=(len(meminfolist)),
         filters=myfilter,
     )
+    if isinstance(meminfolist, pd.DataFrame):
+        append_frame(meminfotable, meminfolist, {"insaddr": "ins"})
+        meminfolist = []
     meminforow = meminfotable.row
     for meminfo in meminfolist:
         meminforow["insaddr"] = meminfo["ins"]
@@ -558,6 +1113,123 @@ def process_backup(f, configgroup, exp, myfilter, stop_signal):
         )
 
 
+def process_telemetry(f, group, telemetry, myfilter):
+    stage_size = max((len(stage) for stage in telemetry.stages), default=1)
+
+    class stage_table(tables.IsDescription):
+        stage = tables.StringCol(stage_size)
+        count = tables.UInt64Col()
+        total = tables.Float64Col()
+        mean = tables.Float64Col()
+        min = tables.Float64Col()
+        max = tables.Float64Col()
+        p50 = tables.Float64Col()
+        p90 = tables.Float64Col()
+        p99 = tables.Float64Col()
+
+    class histogram_table(tables.IsDescription):
+        stage = tables.StringCol(stage_size)
+        upper_bound = tables.Float64Col()
+        count = tables.UInt64Col()
+
+    stagetable = f.create_table(
+        group, "stages", stage_table, "Latency per stage in seconds", filters=myfilter
+    )
+    histogramtable = f.create_table(
+        group,
+        "histogram",
+        histogram_table,
+        "Latency histogram per stage with power of two buckets",
+        filters=myfilter,
+    )
+    stagerow = stagetable.row
+    histogramrow = histogramtable.row
+    for stage, statistics in telemetry.stages.items():
+        stagerow["stage"] = stage
+        stagerow["count"] = statistics.count
+        stagerow["total"] = statistics.total
+        stagerow["mean"] = statistics.mean()
+        stagerow["min"] = statistics.min
+        stagerow["max"] = statistics.max
+        stagerow["p50"] = statistics.percentile(50)
+        stagerow["p90"] = statistics.percentile(90)
+        stagerow["p99"] = statistics.percentile(99)
+        stagerow.append()
+
+        for bucket, count in enumerate(statistics.histogram):
+            if count == 0:
+                continue
+            histogramrow["stage"] = stage
+            histogramrow["upper_bound"] = bucket_upper_bound(bucket)
+            histogramrow["count"] = count
+            histogramrow.append()
+    stagetable.flush()
+    stagetable.close()
+    histogramtable.flush()
+    histogramtable.close()
+
+
+def process_experiment(
+    f,
+    exp_group,
+    exp,
+    myfilter,
+    logger_postprocess=None,
+    memdump_store=None,
+    assembler_store=None,
+):
+    """
+    Write all tables of one experiment into its group. If a memdump_store is
+    given, the memory dumps are deduplicated. The assembler strings are added
+    to the assembler_store, which is opened from the file if not given
+    """
+    if assembler_store is None:
+        assembler_store = create_assembler_store(f, get_filter(myfilter, "default"))
+
+    dumps_fn = process_dumps
+    if memdump_store is not None:
+        dumps_fn = partial(process_dumps_deduplicated, memdump_store=memdump_store)
+
+    datasets = []
+    datasets.append(
+        (partial(process_tbinfo, assembler_store=assembler_store), "tbinfo")
+    )
+    datasets.append((process_instructions, "instructions"))
+    datasets.append((process_tbexec, "tbexec"))
+    datasets.append((process_memory_info, "meminfo"))
+    datasets.append((dumps_fn, "memdumplist"))
+    datasets.append((process_memmap, "memmaplist"))
+    datasets.append((process_arm_registers, "armregisters"))
+    datasets.append((process_riscv_registers, "riscvregisters"))
+    datasets.append((process_aarch64_registers, "aarch64registers"))
+    datasets.append(
+        (partial(process_tb_faulted, assembler_store=assembler_store), "tbfaulted")
+    )
+    datasets.append((process_memdump_deltas, "memdumpdeltas"))
+    datasets.append((process_register_deltas, "registerdeltas"))
+
+    for fn_ptr, keyword in datasets:
+        if keyword not in exp:
+            continue
+        fn_ptr(f, exp_group, exp[keyword], get_filter(myfilter, keyword))
+    assembler_store.flush()
+
+    defaultfilter = get_filter(myfilter, "default")
+
+    # safe fault config
+    process_faults(
+        f,
+        exp_group,
+        exp["faultlist"],
+        exp["endpoint"],
+        exp["end_reason"],
+        defaultfilter,
+    )
+
+    if callable(logger_postprocess):
+        logger_postprocess(f, exp_group, exp, defaultfilter)
+
+
 def hdf5collector(
     hdf5path,
     mode,
@@ -569,6 +1241,9 @@ def hdf5collector(
     log_goldenrun=True,
     log_config=False,
     overwrite_faults=False,
+    queue_telemetry=None,
+    compression=None,
+    dedup_memdumps=False,
 ):
     register_signal_handlers()
 
@@ -579,7 +1254,7 @@ def hdf5collector(
         fault_group = f.root.fault
     else:
         fault_group = f.create_group("/", "fault", "Group containing fault results")
-    myfilter = tables.Filters(complevel=compressionlevel, complib="zlib")
+    myfilter = create_filters(compressionlevel, compression)
     t0 = time.time()
     tmp = "{}".format(num_exp)
     groupname = "experiment{:0" + "{}".format(len(tmp)) + "d}"
@@ -593,14 +1268,28 @@ def hdf5collector(
             total=f.root.fault._v_nchildren,
         ):
             n._f_remove(recursive=True)
+        if "Memdumps" in f.root:
+            f.root.Memdumps._f_remove(recursive=True)
+
+    memdump_store = None
+    if dedup_memdumps:
+        memdump_store = create_memdump_store(f, myfilter["memdumplist"])
+    # Kept when overwriting the faults, as the Goldenrun references it
+    assembler_store = create_assembler_store(f, myfilter["default"])
+    outcomes = OutcomeTable(f, myfilter["default"])
+    fault_parameters = FaultParameterTable(f, myfilter["default"])
+    if overwrite_faults:
+        remove_experiment_rows(outcomes.table)
+        remove_experiment_rows(fault_parameters.table)
 
     pbar = tqdm(total=num_exp, desc="Simulating faults", disable=not num_exp)
     while num_exp > 0 or log_goldenrun or log_pregoldenrun or log_config:
         if stop_signal.value == 1:
             break
-        # readout queue and get next output from qemu. Will block
+        # readout queue and get next output from qemu. Will block until the
+        # timeout to check the stop signal regularly
         try:
-            exp = queue_output.get_nowait()
+            exp = queue_output.get(timeout=QUEUE_TIMEOUT)
         except queue.Empty:
             continue
 
@@ -612,8 +1301,8 @@ def hdf5collector(
         )
         t0 = t1
         # create experiment group in file
-        if exp["index"] >= 0:
-            index = exp["index"]
+        index = exp["index"]
+        if index >= 0:
             while groupname.format(index) in fault_group:
                 index = index + 1
             exp_group = f.create_group(fault_group, groupname.format(index))
@@ -649,38 +1338,44 @@ def hdf5collector(
                 "/", "Backup", "Group containing backup and run information"
             )
 
-            process_backup(f, exp_group, exp, myfilter, stop_signal)
+            process_backup(f, exp_group, exp, myfilter["default"], stop_signal)
             log_config = False
             continue
         else:
             continue
 
-        datasets = []
-        datasets.append((process_tbinfo, "tbinfo"))
-        datasets.append((process_tbexec, "tbexec"))
-        datasets.append((process_memory_info, "meminfo"))
-        datasets.append((process_dumps, "memdumplist"))
-        datasets.append((process_memmap, "memmaplist"))
-        datasets.append((process_arm_registers, "armregisters"))
-        datasets.append((process_riscv_registers, "riscvregisters"))
-        datasets.append((process_aarch64_registers, "aarch64registers"))
-        datasets.append((process_tb_faulted, "tbfaulted"))
-
-        for fn_ptr, keyword in datasets:
-            if keyword not in exp:
-                continue
-            fn_ptr(f, exp_group, exp[keyword], myfilter)
-
-        # safe fault config
-        process_faults(
-            f, exp_group, exp["faultlist"], exp["endpoint"], exp["end_reason"], myfilter
-        )
+        timings = None
+        if queue_telemetry is not None and "queue_put_time" in exp:
+            timings = {"queue_transfer": time.time() - exp["queue_put_time"]}
+
+        with stage_timer(timings, "hdf5_write"):
+            process_experiment(
+                f,
+                exp_group,
+                exp,
+                myfilter,
+                logger_postprocess,
+                # Goldenrun and pregoldenrun are kept complete for the backup
+                memdump_store if exp["index"] >= 0 else None,
+                assembler_store,
+            )
+        if index >= -2:
+            outcomes.add(index, exp_group._v_name, exp)
+        if index >= 0:
+            fault_parameters.add(index, exp["faultlist"])
 
-        if callable(logger_postprocess):
-            logger_postprocess(f, exp_group, exp, myfilter)
+        send_timings(queue_telemetry, exp["index"], timings)
 
         del exp
 
     pbar.close()
+    create_indexes(outcomes.table, OUTCOME_INDEXES)
+    create_indexes(fault_parameters.table, FAULT_PARAMETER_INDEXES)
+    summary = outcomes.summary()
+    if summary:
+        logger.info(
+            "Outcome of the experiments: "
+            + ", ".join(f"{reason}: {count}" for reason, count in summary.items())
+        )
     f.close()
     logger.debug("Data Logging done")
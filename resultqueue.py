@@ -0,0 +1,141 @@
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Queue, Value
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ResultQueue:
+    """
+    Queue between workers and logger that limits the bytes held in memory.
+    Results are pickled by the worker, if the queued bytes exceed the budget
+    the result is written to a segment file in the spill directory and only
+    its path is queued. The logger reads the segment later, so workers never
+    block on a slow logger.
+
+    A worker process can only exit after its queued results are written to
+    the pipe, which blocks while the pipe is full. Therefore the consuming
+    process reads the pipe in a thread into a local buffer as soon as results
+    arrive, the memory budget also covers the results in this buffer.
+    """
+
+    def __init__(self, memory_budget, spill_dir=None):
+        self.memory_budget = memory_budget
+        # Created on the first spill, so that unused queues leave no trace
+        self.spill_dir = os.path.join(
+            spill_dir or tempfile.gettempdir(), f"archie_spill_{uuid.uuid4().hex}"
+        )
+        self.queue = Queue()
+        # Results put, but not yet returned by get
+        self.pending = Value("q", 0)
+        self.queued_bytes = Value("q", 0)
+        self.spilled_bytes = Value("q", 0)
+        self.buffer = None
+        self.reader_pid = None
+
+    def start_reader(self):
+        """
+        Start the thread reading the pipe in the calling process
+        """
+        self.buffer = queue.SimpleQueue()
+        self.reader_pid = os.getpid()
+        threading.Thread(
+            target=self.read_pipe, name="ResultQueueReader", daemon=True
+        ).start()
+
+    def read_pipe(self):
+        while True:
+            self.buffer.put(self.queue.get())
+
+    def put(self, obj):
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.pending.get_lock():
+            self.pending.value += 1
+
+        with self.queued_bytes.get_lock():
+            # At least one result is always kept in memory
+            in_memory = (
+                self.queued_bytes.value + len(data) <= self.memory_budget
+                or self.queued_bytes.value == 0
+            )
+            if in_memory:
+                self.queued_bytes.value += len(data)
+
+        if in_memory:
+            self.queue.put(data)
+            return
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Unique name, workers are forked processes whose PIDs get reused
+        fd, path = tempfile.mkstemp(dir=self.spill_dir, prefix="segment_")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self.spilled_bytes.get_lock():
+            self.spilled_bytes.value += len(data)
+        logger.debug(f"Spilled {len(data)} bytes to {path}")
+        self.queue.put(path)
+
+    def get(self, block=True, timeout=None):
+        if self.reader_pid != os.getpid():
+            self.start_reader()
+        item = self.buffer.get(block, timeout)
+        with self.pending.get_lock():
+            self.pending.value -= 1
+
+        if isinstance(item, bytes):
+            with self.queued_bytes.get_lock():
+                self.queued_bytes.value -= len(item)
+            return pickle.loads(item)
+
+        with open(item, "rb") as f:
+            data = f.read()
+        os.remove(item)
+        with self.spilled_bytes.get_lock():
+            self.spilled_bytes.value -= len(data)
+        return pickle.loads(data)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self):
+        return self.pending.value
+
+    def memory_usage(self):
+        """
+        Bytes of results currently held in memory
+        """
+        return self.queued_bytes.value
+
+    def spilled(self):
+        """
+        Bytes of results currently spilled to disk
+        """
+        return self.spilled_bytes.value
+
+    def close(self):
+        """
+        Remove the spill directory including segments that were not read
+        """
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
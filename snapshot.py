@@ -0,0 +1,245 @@
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import shlex
+import socket
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+# Name of the VM snapshot taken at the start point
+SNAPSHOT_NAME = "archie_start"
+# Seconds to wait for QEMU to reach the start point
+SNAPSHOT_TIMEOUT = 600
+
+
+def qemu_system_arguments(config_qemu):
+    """
+    Arguments describing the emulated system. They have to be identical for
+    the run creating the snapshot and the runs loading it
+    """
+    arguments = ["-M", config_qemu["machine"], "-monitor", "none"]
+    if config_qemu["bios"] != "":
+        arguments += ["-bios", config_qemu["bios"]]
+    if config_qemu["kernel"] != "":
+        arguments += ["-kernel", config_qemu["kernel"]]
+    if config_qemu["additional_qemu_args"] != "":
+        arguments += shlex.split(config_qemu["additional_qemu_args"])
+    return arguments
+
+
+def snapshot_arguments(image):
+    """
+    Arguments to resume QEMU from the start point snapshot in image
+    """
+    return [
+        "-drive",
+        f"if=none,id=archie_snapshot,format=qcow2,file={image}",
+        "-loadvm",
+        SNAPSHOT_NAME,
+    ]
+
+
+def resumes_from_snapshot(config_qemu, index):
+    """
+    All runs with a start point, i.e., all except the pregoldenrun, are
+    resumed from the snapshot if one was created
+    """
+    return "snapshot_image" in config_qemu and "start" in config_qemu and index != -2
+
+
+def copy_snapshot(config_qemu, directory):
+    """
+    QEMU locks the image and loadvm needs it writable, so every run gets its
+    own copy. A qcow2 overlay cannot be used, as the internal snapshot is only
+    found in the image it was saved to. The copy shares the data blocks with
+    the original on filesystems supporting reflinks (e.g., btrfs or xfs),
+    otherwise the unused parts of the image are left as holes
+    """
+    image = os.path.join(directory, "start.qcow2")
+    subprocess.run(
+        [
+            "cp",
+            "--reflink=auto",
+            "--sparse=always",
+            config_qemu["snapshot_image"],
+            image,
+        ],
+        check=True,
+    )
+    return image
+
+
+def get_qemu_img(config_qemu):
+    if "qemu_img" in config_qemu:
+        return config_qemu["qemu_img"]
+    qemu_img = os.path.join(os.path.dirname(config_qemu["qemu"]), "qemu-img")
+    if os.path.isfile(qemu_img):
+        return qemu_img
+    return "qemu-img"
+
+
+def connect_unix_socket(path, process, deadline):
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"QEMU exited with {process.returncode}")
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(max(deadline - time.time(), 1))
+            sock.connect(path)
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.time() > deadline:
+                raise TimeoutError(f"QEMU did not open {path}")
+            time.sleep(0.05)
+
+
+def gdb_send(sock, packet):
+    checksum = sum(packet.encode()) % 256
+    sock.sendall(f"${packet}#{checksum:02x}".encode())
+
+
+def gdb_receive(sock):
+    """
+    Receive a packet of the gdb remote serial protocol and acknowledge it
+    """
+    data = bytearray()
+    while not data.startswith(b"$"):
+        data = bytearray(sock.recv(1))
+        if not data:
+            raise ConnectionError("gdb connection closed")
+    while not data.endswith(b"#"):
+        data += sock.recv(1)
+    # Checksum
+    sock.recv(2)
+    sock.sendall(b"+")
+    return data[1:-1].decode()
+
+
+def gdb_command(sock, packet):
+    """
+    Send a packet and return the reply. Console output is skipped
+    """
+    gdb_send(sock, packet)
+    while True:
+        reply = gdb_receive(sock)
+        if not reply.startswith("O") or reply == "OK":
+            return reply
+
+
+def gdb_wait_stop(sock, packet):
+    reply = gdb_command(sock, packet)
+    if reply[:1] in ("W", "X"):
+        raise RuntimeError("QEMU exited before the start point was reached")
+    if reply[:1] not in ("T", "S"):
+        raise RuntimeError(f"Unexpected gdb reply {reply}")
+
+
+def run_to_start(sock, address, counter):
+    """
+    Continue the halted guest until address was executed counter times. As
+    gdb does, the breakpoint is stepped over before continuing
+    """
+    location = f"{address:x},4"
+    if gdb_command(sock, f"Z0,{location}") != "OK":
+        raise RuntimeError(f"Could not set a breakpoint at 0x{address:x}")
+    gdb_wait_stop(sock, "c")
+    for _ in range(counter - 1):
+        gdb_command(sock, f"z0,{location}")
+        gdb_wait_stop(sock, "s")
+        gdb_command(sock, f"Z0,{location}")
+        gdb_wait_stop(sock, "c")
+    gdb_command(sock, f"z0,{location}")
+
+
+def qmp_command(qmp, command, arguments=None):
+    message = {"execute": command}
+    if arguments is not None:
+        message["arguments"] = arguments
+    qmp.write(json.dumps(message).encode() + b"\n")
+    qmp.flush()
+    while True:
+        line = qmp.readline()
+        if not line:
+            raise ConnectionError("QMP connection closed")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(f"QMP {command} failed: {reply['error']['desc']}")
+        if "return" in reply:
+            return reply["return"]
+
+
+def create_start_snapshot(config_qemu, directory):
+    """
+    Boot the system once to the start point and save the VM state into a
+    qcow2 image in directory. The guest is halted at the start point through
+    the gdb stub and the snapshot is taken through QMP
+    """
+    image = os.path.join(directory, "start.qcow2")
+    gdb_path = os.path.join(directory, "gdb.sock")
+    qmp_path = os.path.join(directory, "qmp.sock")
+    subprocess.run(
+        [get_qemu_img(config_qemu), "create", "-q", "-f", "qcow2", image, "1M"],
+        check=True,
+    )
+
+    # fmt: off
+    qemustring = [
+        config_qemu["qemu"],
+        *qemu_system_arguments(config_qemu),
+        "-drive", f"if=none,id=archie_snapshot,format=qcow2,file={image}",
+        "-gdb", f"unix:{gdb_path},server=on,wait=off",
+        "-qmp", f"unix:{qmp_path},server=on,wait=off",
+        "-S",
+    ]
+    # fmt: on
+
+    t0 = time.time()
+    deadline = t0 + SNAPSHOT_TIMEOUT
+    ps = subprocess.Popen(
+        qemustring, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with connect_unix_socket(gdb_path, ps, deadline) as gdb:
+            run_to_start(
+                gdb, config_qemu["start"]["address"], config_qemu["start"]["counter"]
+            )
+            with connect_unix_socket(qmp_path, ps, deadline) as sock:
+                qmp = sock.makefile("rwb")
+                # Greeting
+                qmp.readline()
+                qmp_command(qmp, "qmp_capabilities")
+                output = qmp_command(
+                    qmp,
+                    "human-monitor-command",
+                    {"command-line": f"savevm {SNAPSHOT_NAME}"},
+                )
+                if output.strip():
+                    raise RuntimeError(f"savevm failed: {output.strip()}")
+                qmp_command(qmp, "quit")
+        ps.wait(timeout=max(deadline - time.time(), 1))
+    finally:
+        if ps.poll() is None:
+            ps.kill()
+            ps.wait()
+
+    logger.info(f"Created start point snapshot in {time.time() - t0:.2f}s")
+    return image
@@ -0,0 +1,134 @@
+# Copyright (c) 2021 Florian Andreas Hauschild
+# Copyright (c) 2021 Fraunhofer AISEC
+# Fraunhofer-Gesellschaft zur Foerderung der angewandten Forschung e.V.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+import math
+import queue
+import time
+
+# Histogram buckets are powers of two in microseconds, bucket 0 collects
+# everything below 1us and the last bucket everything above ~71min
+NUM_BUCKETS = 33
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Measure the duration of the enclosed block and add it to timings. Does
+    nothing if telemetry is disabled (timings is None)
+    """
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - t0
+
+
+def send_timings(queue_telemetry, index, timings):
+    """
+    Forward the timings of one experiment to the controller
+    """
+    if queue_telemetry is None or not timings:
+        return
+    queue_telemetry.put({"index": index, "timings": timings})
+
+
+def bucket_upper_bound(bucket):
+    """
+    Upper bound of a histogram bucket in seconds
+    """
+    return 2**bucket * 1e-6
+
+
+class StageStatistics:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.histogram = [0] * NUM_BUCKETS
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+
+        if duration < 1e-6:
+            bucket = 0
+        else:
+            bucket = min(math.floor(math.log2(duration * 1e6)) + 1, NUM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Approximate the percentile by the upper bound of the histogram bucket
+        it falls into
+        """
+        threshold = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= threshold:
+                return min(bucket_upper_bound(bucket), self.max)
+        return self.max
+
+
+class Telemetry:
+    """
+    Aggregate the stage timings of all experiments into per stage statistics
+    and histograms
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, duration):
+        if stage not in self.stages:
+            self.stages[stage] = StageStatistics()
+        self.stages[stage].add(duration)
+
+    def add_timings(self, timings):
+        for stage, duration in timings.items():
+            self.add(stage, duration)
+
+    def collect(self, queue_telemetry):
+        """
+        Read all timings currently in the telemetry queue
+        """
+        for i in range(queue_telemetry.qsize()):
+            try:
+                self.add_timings(queue_telemetry.get_nowait()["timings"])
+            except queue.Empty:
+                break
+
+    def summary(self):
+        lines = ["Stage latencies (mean / p50 / p99 / max):"]
+        for stage, statistics in self.stages.items():
+            lines.append(
+                f"\t{stage:<16}{statistics.count:>8}x "
+                f"{statistics.mean() * 1e3:10.3f}ms "
+                f"{statistics.percentile(50) * 1e3:10.3f}ms "
+                f"{statistics.percentile(99) * 1e3:10.3f}ms "
+                f"{statistics.max * 1e3:10.3f}ms"
+            )
+        return "\n".join(lines)
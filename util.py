@@ -27,3 +27,17 @@ def gather_process_ram_usage(queue_ram_usage, max_ram_usage):
         max_ram_usage = process_ram_usage
 
     return max_ram_usage
+
+
+def mem_limit_calc(mem_max, num_worker, queue_memory, time_max):
+    """
+    Estimate the memory usage in KiB of num_worker workers and queue_memory
+    KiB of results waiting for the logger
+    """
+    if mem_max > 1500000:
+        mem_estimate = mem_max * num_worker * 1.5 + queue_memory
+    else:
+        mem_estimate = 1600000 * num_worker + queue_memory
+    time_max = 1 + time_max / 120.0
+    mem_estimate = mem_estimate * time_max
+    return mem_estimate